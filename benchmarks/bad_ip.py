@@ -0,0 +1,77 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	micro-benchmark: the old bad_ip_check (parse + linear scan of config.bad_ip per address) against ip_filter.
+#	timing only, tests/test_ip_filter.py checks the results.
+#
+#	usage: benchmarks/bad_ip.py [-n networks] [-a addresses]
+
+import argparse
+from ipaddress import ip_address, ip_network, IPv4Address
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import ip_filter
+
+
+# what device-to-netbox.py did before ip_filter
+def old_bad_ip_check(bad_ip, ip_check):
+	for bad_net in bad_ip:
+		if ip_address(ip_check) in ip_network(bad_net):
+			return(True)
+	return(False)
+
+
+def make_networks(count):
+	networks = ['fe80::/10', 'fd00::/8', '10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16', '127.0.0.0/8', '128.0.0.0/16', '169.254.0.0/16']
+	while len(networks) < count:
+		networks.append(str(ip_network(str(IPv4Address(random.getrandbits(32))) + "/" + str(random.randint(16, 30)), strict=False)))
+	return(networks)
+
+
+def make_interfaces_ip(count):
+	interfaces_ip = {}
+	for index in range(count):
+		interface = "ge-0/0/" + str(index // 10) + "." + str(index % 10)
+		interfaces_ip.setdefault(interface, {'ipv4': {}})['ipv4'][str(IPv4Address(random.getrandbits(32)))] = {'prefix_length': 30}
+	return(interfaces_ip)
+
+
+def timed(function):
+	start = time.perf_counter()
+	result = function()
+	return(time.perf_counter() - start, result)
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-n', '--networks',		type=int, default=2000, help='Networks in the exclusion list')
+	parser.add_argument('-a', '--addresses',	type=int, default=2000, help='Addresses to check')
+	args = parser.parse_args()
+
+	random.seed(1)
+	networks = make_networks(args.networks)
+	interfaces_ip = make_interfaces_ip(args.addresses)
+	addresses = [ip for interface in interfaces_ip.values() for ip in interface['ipv4']]
+
+	old_time, old_result = timed(lambda: [old_bad_ip_check(networks, ip) for ip in addresses])
+	compile_time, compiled = timed(lambda: ip_filter.compile_ip_ranges(networks))
+	new_time, new_result = timed(lambda: [ip_filter.ip_in_ranges(compiled, ip) for ip in addresses])
+	batch_time, (good, bad) = timed(lambda: ip_filter.filter_interfaces_ip(compiled, interfaces_ip))
+
+	print(str(len(networks)) + " networks, " + str(len(addresses)) + " addresses, " + str(sum(new_result)) + " excluded")
+	print("")
+	print("\told bad_ip_check:\t%.4fs" % old_time)
+	print("\tcompile:\t\t%.4fs" % compile_time)
+	print("\tip_in_ranges:\t\t%.4fs" % new_time)
+	print("\tfilter_interfaces_ip:\t%.4fs" % batch_time)
+	print("")
+	print("\tspeedup:\t\t%.0fx" % (old_time / max(new_time + compile_time, 1e-9)))
+
+
+if __name__ == "__main__":
+	main()
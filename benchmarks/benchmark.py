@@ -0,0 +1,322 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	offline benchmark of the three scripts against mock_netbox.py and fake_napalm.py. no netbox or devices needed.
+#	reports wall time, netbox requests, bytes and peak python memory for each phase:
+#
+#		import-<size>		device-to-netbox.py importing a fake device with <size> interfaces
+#		sync-<size>		device-to-netbox.py --sync of that same, unchanged device
+#		type-change-<size>	netbox-device-type-change.py on a device with <size> extra interfaces
+#		type-batch-<size>	netbox-device-type-change.py converting <size> devices in one batch
+#		push-<size>		netbox-to-device.py diffing a generated config for a device with <size> interfaces
+#
+#	the mock netbox runs in its own process so its memory isn't counted. -g reads through the graphql path
+#	(config.netbox_graphql) instead of REST where the scripts have one.
+#
+#	as a regression gate, --baseline fails (exit 1) if any phase makes more netbox requests than the baseline:
+#		benchmarks/benchmark.py --write-baseline benchmarks/baseline.json
+#		benchmarks/benchmark.py --baseline benchmarks/baseline.json
+#
+#	usage: benchmarks/benchmark.py [-s sizes] [-o os] [-l latency ms] [-g] [--baseline file] [--write-baseline file] [--json file]
+
+import argparse
+from contextlib import redirect_stdout
+import ipaddress
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(benchmark_dir, '..'))
+
+import pynetbox
+import requests
+import config
+import fake_napalm
+import mock_netbox
+import netbox_cache
+import script_loader
+
+
+##########################################
+## mock netbox in a child process
+
+def run_mock(latency, url_queue, version):
+	mock = mock_netbox.MockNetbox(latency=latency, version=version)
+	url_queue.put(mock.url)
+	mock.server.serve_forever()
+
+
+# the mock reports a netbox version with graphql's schema when config.netbox_graphql is on
+def start_mock(latency):
+	version = mock_netbox.graphql_api_version if config.netbox_graphql else mock_netbox.api_version
+	url_queue = multiprocessing.Queue()
+	process = multiprocessing.Process(target=run_mock, args=(latency, url_queue, version), daemon=True)
+	process.start()
+	url = url_queue.get(timeout=30)
+	return(process, url)
+
+
+def point_config_at(url, cache_dir):
+	config.netbox_url = url
+	config.netbox_api_token = "benchmark"
+	config.generator_url = url + "generator/?device="
+	config.cache_file = os.path.join(cache_dir, "cache.sqlite")
+	netbox_cache.invalidate()
+
+
+##########################################
+## measuring
+
+def measure(results, url, scenario, phase, function, *args):
+	requests.post(url + "_mock/reset")
+	tracemalloc.reset_peak()
+	memory_before = tracemalloc.get_traced_memory()[0]
+	start = time.perf_counter()
+
+	with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+		result = function(*args)
+
+	wall = time.perf_counter() - start
+	peak = tracemalloc.get_traced_memory()[1] - memory_before
+	stats = requests.get(url + "_mock/stats").json()
+
+	results.append(dict(
+		scenario =	scenario,
+		phase =		phase,
+		wall =		wall,
+		requests =	stats['total'],
+		bytes =		stats['bytes_in'] + stats['bytes_out'],
+		peak =		peak,
+		endpoints =	stats['requests'],
+	))
+	return(result)
+
+
+##########################################
+## scenarios
+
+def seed_common(nb, model, os_name):
+	manufacturer = nb.dcim.manufacturers.create(name="Fake", slug="fake")
+	device_type = nb.dcim.device_types.create(model=model, slug=model.lower(), manufacturer=manufacturer.id)
+	site = nb.dcim.sites.create(name="BenchSite", slug="benchsite")
+	tenant = nb.tenancy.tenants.create(name="BenchTenant", slug="benchtenant")
+	role = nb.dcim.device_roles.create(name=config.device_role, slug=config.device_role)
+	platform = nb.dcim.platforms.create(name=os_name, slug=os_name)
+	return(dict(device_type=device_type, site=site, tenant=tenant, role=role, platform=platform))
+
+
+# a /30 (and every 4th a /64) per fake interface with no site, under a container, like fake_napalm hands out
+def seed_prefixes(nb, size):
+	prefixes = [dict(prefix="198.18.0.0/15", status="container"), dict(prefix="2001:db8::/32", status="container")]
+	for index in range(1, size):
+		prefixes.append(dict(prefix=str(ipaddress.IPv4Address(fake_napalm.ipv4_base + 4 * index)) + "/30"))
+		if index % 4 == 0:
+			prefixes.append(dict(prefix=str(ipaddress.IPv6Address(fake_napalm.ipv6_base + (index << 64))) + "/64"))
+	for chunk in range(0, len(prefixes), 500):
+		nb.ipam.prefixes.create(prefixes[chunk:chunk + 500])
+
+
+def bench_import(results, url, size, os_name, latency):
+	scenario = "import-" + str(size)
+	dtn = script_loader.load_script("device-to-netbox")
+	model = "FAKE-" + str(size)
+	dtn.napalm = types.SimpleNamespace(get_network_driver=lambda driver_os: fake_napalm.make_driver(driver_os, interfaces=size, model=model, latency=latency))
+
+	nb = pynetbox.api(url, config.netbox_api_token)
+	seed_common(nb, model, os_name)
+	seed_prefixes(nb, size)
+
+	args = dict(device="bench" + str(size), model=model, site="BenchSite", tenant="BenchTenant", os=os_name, role=config.device_role,
+		username="bench", password="bench", from_snapshot=None, save_snapshot=None)
+
+	sanity, message, sanitydata = measure(results, url, scenario, "check_netbox_sanity", dtn.check_netbox_sanity, args, nb)
+	if not sanity:
+		raise RuntimeError(scenario + ": " + message)
+	status, device_dict = measure(results, url, scenario, "get_device_info", dtn.get_device_info, args)
+	device_result = measure(results, url, scenario, "create_netbox_device", dtn.create_netbox_device, config, nb, args, device_dict, sanitydata)
+	netbox_interfaces = measure(results, url, scenario, "get_interfaces", dtn.get_netbox_interfaces, nb, device_result)
+	measure(results, url, scenario, "add_interfaces", dtn.add_interfaces, config, nb, args, device_dict, device_result, netbox_interfaces)
+	measure(results, url, scenario, "update_interfaces", dtn.update_interfaces, config, nb, args, device_dict, device_result, netbox_interfaces)
+	measure(results, url, scenario, "add_ips", dtn.add_ips, config, nb, args, device_dict, device_result, sanitydata, netbox_interfaces)
+	measure(results, url, scenario, "update_prefix", dtn.update_prefix, config, nb, args, device_dict, device_result, sanitydata)
+
+	# nothing changed on the device, so this should be reads only
+	scenario = "sync-" + str(size)
+	args['sync'] = True
+	sanity, message, sanitydata = measure(results, url, scenario, "check_netbox_sanity", dtn.check_netbox_sanity, args, nb)
+	if not sanity:
+		raise RuntimeError(scenario + ": " + message)
+	status, device_dict = measure(results, url, scenario, "get_device_info", dtn.get_device_info, args)
+	device_result = measure(results, url, scenario, "sync_netbox_device", dtn.sync_netbox_device, config, nb, args, device_dict, sanitydata)
+	netbox_interfaces = measure(results, url, scenario, "get_interfaces", dtn.get_netbox_interfaces, nb, device_result)
+	measure(results, url, scenario, "add_interfaces", dtn.add_interfaces, config, nb, args, device_dict, device_result, netbox_interfaces)
+	measure(results, url, scenario, "update_interfaces", dtn.update_interfaces, config, nb, args, device_dict, device_result, netbox_interfaces)
+	measure(results, url, scenario, "add_ips", dtn.add_ips, config, nb, args, device_dict, device_result, sanitydata, netbox_interfaces)
+	measure(results, url, scenario, "update_prefix", dtn.update_prefix, config, nb, args, device_dict, device_result, sanitydata)
+
+
+def bench_type_change(results, url, size):
+	scenario = "type-change-" + str(size)
+	ntc = script_loader.load_script("netbox-device-type-change")
+	current_model = "ME-3400EG-2CS-A"
+	target_model = "ASR-920-4SZ-A"
+
+	nb = pynetbox.api(url, config.netbox_api_token)
+	common = seed_common(nb, current_model, "ios")
+	target_type = nb.dcim.device_types.create(model=target_model, slug=target_model.lower(), manufacturer=common['device_type'].manufacturer.id)
+	templates = [dict(device_type=target_type.id, name=name, type=interface['type']) for name, interface in config.types[target_model]['interfaces'].items()]
+	templates.append(dict(device_type=target_type.id, name="GigabitEthernet0/0/0", type="1000base-t"))
+	nb.dcim.interface_templates.create(templates)
+
+	device = nb.dcim.devices.create(name="benchtype" + str(size), device_type=common['device_type'].id, device_role=common['role'].id,
+		site=common['site'].id, tenant=common['tenant'].id, platform=common['platform'].id, serial="FOC1234ABCD")
+	interfaces = [dict(device=device.id, name=name, type=interface['type']) for name, interface in config.types[current_model]['interfaces'].items()]
+	interfaces.extend(dict(device=device.id, name="Vlan" + str(index), type="virtual") for index in range(size))
+	for chunk in range(0, len(interfaces), 500):
+		nb.dcim.interfaces.create(interfaces[chunk:chunk + 500])
+
+	args = dict(device=str(device.id), type=target_model, refresh_cache=False)
+
+	nb, nb_device, nb_device_types = measure(results, url, scenario, "get_device", ntc.get_device, config, args)
+	measure(results, url, scenario, "map_interfaces", ntc.map_interfaces, config, nb, nb_device, args)
+	measure(results, url, scenario, "fix_other", ntc.fix_other, nb_device, nb_device_types, args)
+	measure(results, url, scenario, "add_missing_interfaces", ntc.add_missing_interfaces, config, nb, nb_device, nb_device_types, args)
+
+
+def bench_type_batch(results, url, size):
+	scenario = "type-batch-" + str(size)
+	ntc = script_loader.load_script("netbox-device-type-change")
+	current_model = "ME-3400EG-2CS-A"
+	target_model = "ASR-920-4SZ-A"
+
+	nb = pynetbox.api(url, config.netbox_api_token)
+	common = seed_common(nb, current_model, "ios")
+	target_type = nb.dcim.device_types.create(model=target_model, slug=target_model.lower(), manufacturer=common['device_type'].manufacturer.id)
+	# roles on the target's templates, the current type comes from config.types
+	templates = [dict(device_type=target_type.id, name=name, type=interface['type'], description="role:" + interface['role']) for name, interface in config.types[target_model]['interfaces'].items()]
+	templates.append(dict(device_type=target_type.id, name="GigabitEthernet0/0/0", type="1000base-t"))
+	nb.dcim.interface_templates.create(templates)
+
+	devices = nb.dcim.devices.create([dict(name="benchbatch" + str(index), device_type=common['device_type'].id, device_role=common['role'].id,
+		site=common['site'].id, tenant=common['tenant'].id, platform=common['platform'].id, serial="FOC" + str(index)) for index in range(size)])
+	interfaces = [dict(device=device.id, name=name, type=interface['type']) for device in devices for name, interface in config.types[current_model]['interfaces'].items()]
+	for chunk in range(0, len(interfaces), 500):
+		nb.dcim.interfaces.create(interfaces[chunk:chunk + 500])
+
+	args = dict(device=str(devices[0].id), devices=[str(device.id) for device in devices], type=target_model, file=None, refresh_cache=False)
+	measure(results, url, scenario, "migrate_batch", ntc.migrate_batch, config, args, ntc.read_jobs(args))
+
+
+def bench_push(results, url, size, latency):
+	scenario = "push-" + str(size)
+	ntd = script_loader.load_script("netbox-to-device")
+	model = "FAKE-" + str(size)
+	ntd.get_network_driver = lambda driver_os: fake_napalm.make_driver(driver_os, interfaces=size, model=model, latency=latency)
+
+	nb = pynetbox.api(url, config.netbox_api_token)
+	common = seed_common(nb, model, "ios")
+	device = nb.dcim.devices.create(name="benchpush" + str(size), device_type=common['device_type'].id, device_role=common['role'].id,
+		site=common['site'].id, tenant=common['tenant'].id, platform=common['platform'].id)
+	interfaces = [dict(device=device.id, name=name, type="other", description="pushed") for name in fake_napalm.interface_names("ios", size)]
+	for chunk in range(0, len(interfaces), 500):
+		nb.dcim.interfaces.create(interfaces[chunk:chunk + 500])
+
+	args = dict(device=str(device.id), ip="192.0.2.1", username="bench", password="bench", config=None, replace=False)
+
+	sanity, nb_device = measure(results, url, scenario, "get_device", ntd.get_device, args)
+	candidate_config = measure(results, url, scenario, "get_config_from_generator", ntd.get_config_from_generator, config, args)
+	# unchanged config, revalidated against the local copy
+	measure(results, url, scenario, "refetch_config", ntd.get_config_from_generator, config, args)
+	live_device = measure(results, url, scenario, "open_device", ntd.open_device, args, nb_device, args['ip'])
+	measure(results, url, scenario, "get_diff", ntd.get_diff, args, live_device, ntd.sanitize_config(candidate_config))
+
+
+##########################################
+## output
+
+def print_results(results):
+	print("%-20s %-26s %10s %9s %12s %10s" % ("scenario", "phase", "wall (s)", "requests", "bytes", "peak (MB)"))
+	for result in results:
+		print("%-20s %-26s %10.3f %9d %12d %10.1f" % (result['scenario'], result['phase'], result['wall'], result['requests'], result['bytes'], result['peak'] / 1048576))
+
+
+def request_counts(results):
+	counts = {}
+	for result in results:
+		counts.setdefault(result['scenario'], {})[result['phase']] = result['requests']
+	return(counts)
+
+
+# returns a list of phases that make more requests than the baseline
+def check_baseline(results, baseline):
+	regressions = []
+	for scenario, phases in request_counts(results).items():
+		for phase, count in phases.items():
+			allowed = baseline.get(scenario, {}).get(phase)
+			if allowed is not None and count > allowed:
+				regressions.append(scenario + " " + phase + ": " + str(count) + " requests, baseline " + str(allowed))
+	return(regressions)
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-s', '--sizes',	default="10,1000", help='Comma separated interface counts to benchmark. Defaults to 10,1000')
+	parser.add_argument('-o', '--os',	default="ios", help='OS of the fake device for the import benchmark (ios or junos)')
+	parser.add_argument('-l', '--latency',	type=float, default=0, help='Milliseconds added to every netbox request and device call')
+	parser.add_argument('-g', '--graphql',	action='store_true', help='Turn on config.netbox_graphql')
+	parser.add_argument('--baseline',	help='Fail if any phase makes more netbox requests than in this file')
+	parser.add_argument('--write-baseline',	help='Save request counts per phase to this file')
+	parser.add_argument('--json',		help='Save all results to this file')
+	args = parser.parse_args()
+
+	latency = args.latency / 1000
+	config.netbox_graphql = args.graphql
+	sizes = [int(size) for size in args.sizes.split(",")]
+	results = []
+
+	tracemalloc.start()
+	with tempfile.TemporaryDirectory() as cache_dir:
+		for size in sizes:
+			for bench in [lambda url: bench_import(results, url, size, args.os, latency), lambda url: bench_type_change(results, url, size), lambda url: bench_type_batch(results, url, size), lambda url: bench_push(results, url, size, latency)]:
+				# fresh netbox for every scenario
+				process, url = start_mock(latency)
+				try:
+					point_config_at(url, cache_dir)
+					bench(url)
+				finally:
+					process.terminate()
+					process.join()
+	tracemalloc.stop()
+
+	print_results(results)
+
+	if args.json:
+		with open(args.json, 'w') as f:
+			json.dump(results, f, indent=4)
+
+	if args.write_baseline:
+		with open(args.write_baseline, 'w') as f:
+			json.dump(request_counts(results), f, indent=4, sort_keys=True)
+			f.write("\n")
+
+	if args.baseline:
+		with open(args.baseline, 'r') as f:
+			regressions = check_baseline(results, json.load(f))
+		print("")
+		if regressions:
+			print("Netbox request regressions:")
+			for regression in regressions:
+				print("\t" + regression)
+			sys.exit(1)
+		print("No netbox request regressions against " + args.baseline)
+
+
+if __name__ == "__main__":
+	main()
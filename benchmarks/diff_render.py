@@ -0,0 +1,138 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	micro-benchmark: the old color_diff (string concatenation per line) against write_diff streaming to a file,
+#	and reading + sanitize_config of a whole candidate config against write_candidate_file, on a big
+#	--replace style diff / config. also reports peak python memory of the new code. the old color_diff is
+#	quadratic, expect it to take a few minutes at 100k lines (-n 20000 for a quick run).
+#
+#	usage: benchmarks/diff_render.py [-n lines]
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from colorama import Fore, Style
+import script_loader
+
+
+# what netbox-to-device.py did before write_diff
+def old_color_diff(diff):
+	difflist = diff.splitlines()
+	colorized_str = ''
+	for line in difflist:
+		if line.startswith('+'):
+			colorized_str = colorized_str + Fore.GREEN + line + "\n"
+		elif line.startswith('-'):
+			colorized_str = colorized_str + Fore.RED + line + "\n"
+		elif line.startswith('^'):
+			colorized_str = colorized_str + Fore.BLUE + line + "\n"
+		else:
+			colorized_str = colorized_str + line + "\n"
+
+	return(colorized_str + Style.RESET_ALL)
+
+
+# and before write_candidate_file
+def old_read_config(file):
+	with open(file, 'r') as f:
+		filestr = f.read()
+	return(re.sub(r'\^C', '\x03', filestr))
+
+
+# junos style set commands, a mix of added, removed and context lines
+def make_diff(count):
+	lines = []
+	for index in range(count):
+		line = "set interfaces ge-0/0/" + str(index % 48) + " unit " + str(index) + " description \"customer " + str(index) + "\""
+		if index % 3 == 0:
+			lines.append("+" + line)
+		elif index % 3 == 1:
+			lines.append("-" + line)
+		else:
+			lines.append(" " + line)
+	return("\n".join(lines))
+
+
+def make_config(count):
+	lines = ["banner motd ^C", "maintenance window ^C"]
+	lines.extend("set interfaces ge-0/0/" + str(index % 48) + " unit " + str(index) + " description \"customer " + str(index) + "\"" for index in range(count))
+	return("\n".join(lines) + "\n")
+
+
+def timed(function):
+	start = time.perf_counter()
+	result = function()
+	return(time.perf_counter() - start, result)
+
+
+def measured(function):
+	tracemalloc.start()
+	start = time.perf_counter()
+	result = function()
+	elapsed = time.perf_counter() - start
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return(elapsed, peak, result)
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-n', '--lines',	type=int, default=100000, help='Lines in the diff and the candidate config. Defaults to 100000')
+	args = parser.parse_args()
+
+	ntd = script_loader.load_script("netbox-to-device")
+	diff = make_diff(args.lines)
+
+	with tempfile.TemporaryDirectory() as directory:
+		old_out = os.path.join(directory, "old.txt")
+		new_out = os.path.join(directory, "new.txt")
+
+		def old_render():
+			with open(old_out, 'w') as f:
+				f.write(old_color_diff(diff))
+
+		def new_render():
+			with open(new_out, 'w') as f:
+				ntd.write_diff(diff, f)
+
+		old_time, result = timed(old_render)
+		new_time, new_peak, result = measured(new_render)
+
+		# same text once the colours are taken out
+		with open(old_out, 'r') as old_f, open(new_out, 'r') as new_f:
+			strip = lambda text: text.replace(Style.RESET_ALL, "").replace(Fore.GREEN, "").replace(Fore.RED, "").replace(Fore.BLUE, "")
+			if strip(old_f.read()) != strip(new_f.read()):
+				print("MISMATCH between old and new diff output!")
+				sys.exit(1)
+
+		config_file = os.path.join(directory, "candidate.conf")
+		with open(config_file, 'w') as f:
+			f.write(make_config(args.lines))
+
+		old_sanitize_time, old_sanitize_peak, old_config = measured(lambda: old_read_config(config_file))
+		new_sanitize_time, new_sanitize_peak, candidate_file = measured(lambda: ntd.get_config_file(config_file))
+		with open(candidate_file, 'r') as f:
+			if f.read() != old_config:
+				print("MISMATCH between old and new sanitized config!")
+				sys.exit(1)
+		os.remove(candidate_file)
+
+	print(str(args.lines) + " diff lines, " + str(args.lines) + " config lines")
+	print("")
+	print("\told color_diff:\t\t%.3fs" % old_time)
+	print("\twrite_diff:\t\t%.3fs\t%6.1f MB peak" % (new_time, new_peak / 1048576))
+	print("\tspeedup:\t\t%.0fx" % (old_time / max(new_time, 1e-9)))
+	print("")
+	print("\told read + sanitize:\t%.3fs\t%6.1f MB peak" % (old_sanitize_time, old_sanitize_peak / 1048576))
+	print("\tget_config_file:\t%.3fs\t%6.1f MB peak" % (new_sanitize_time, new_sanitize_peak / 1048576))
+
+
+if __name__ == "__main__":
+	main()
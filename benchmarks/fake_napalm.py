@@ -0,0 +1,166 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	fake napalm driver that makes up a device of any size, so the scripts can be run without a router.
+#	has the getters device-to-netbox.py uses and the config methods netbox-to-device.py uses.
+#
+#	make_driver() returns a class used the same way as napalm.get_network_driver(os) returns one:
+#		driver = fake_napalm.make_driver(os='junos', interfaces=20000, ips=5000)
+#		device = driver(hostname, username, password)
+
+from ipaddress import IPv4Address, IPv6Address
+import time
+
+# addresses from the benchmarking ranges (rfc2544 / rfc3849) so they aren't in config.bad_ip
+ipv4_base = int(IPv4Address("198.18.0.0"))
+ipv6_base = int(IPv6Address("2001:db8::"))
+
+
+def interface_names(os, count):
+	names = []
+	if os == "junos":
+		names.append("lo0.0")
+		index = 0
+		while len(names) < count:
+			physical = "xe-" + str(index // 480) + "/" + str((index // 48) % 10) + "/" + str(index % 48)
+			names.append(physical)
+			units = 0
+			while len(names) < count and units < 9:
+				names.append(physical + "." + str(100 + units))
+				units += 1
+			index += 1
+	else:
+		names.append("Loopback0")
+		index = 0
+		while len(names) < count:
+			if index < 48:
+				names.append("GigabitEthernet0/0/" + str(index))
+			else:
+				names.append("Vlan" + str(index))
+			index += 1
+	return(names[:count])
+
+
+def make_device_data(os='ios', interfaces=10, ips=None, model="FAKE-MODEL", serial="FAKE0001", hostname="fake"):
+	if ips is None:
+		ips = interfaces
+
+	names = interface_names(os, interfaces)
+	interface_dict = {}
+	for index, name in enumerate(names):
+		interface_dict[name] = dict(
+			is_enabled =	index % 7 != 0,
+			is_up =		index % 5 != 0,
+			description =	"fake link " + str(index) if index % 3 == 0 else "",
+			mac_address =	"00:00:5e:00:%02x:%02x" % ((index >> 8) & 0xff, index & 0xff),
+			mtu =		1500,
+			speed =		10000.0,
+			last_flapped =	-1.0,
+		)
+
+	# loopback gets a /32 and a /128, the rest get /30s (and every fourth a v6 /64) until we run out
+	ip_dict = {names[0]: {'ipv4': {str(IPv4Address(ipv4_base + 1)): {'prefix_length': 32}}, 'ipv6': {str(IPv6Address(ipv6_base + 1)): {'prefix_length': 128}}}}
+	count = 2
+	index = 1
+	while count < ips and index < len(names):
+		ip_dict[names[index]] = {'ipv4': {str(IPv4Address(ipv4_base + 4 * index + 1)): {'prefix_length': 30}}}
+		count += 1
+		if index % 4 == 0 and count < ips:
+			ip_dict[names[index]]['ipv6'] = {str(IPv6Address(ipv6_base + (index << 64) + 1)): {'prefix_length': 64}}
+			count += 1
+		index += 1
+
+	facts = dict(
+		hostname =	hostname,
+		fqdn =		hostname,
+		vendor =	"Fake",
+		model =		model,
+		serial_number =	serial,
+		os_version =	"1.0",
+		uptime =	1000.0,
+		interface_list =	names,
+	)
+
+	bgp = {'global': {'router_id': str(IPv4Address(ipv4_base + 1)), 'peers': {}}}
+
+	running = "\n".join("interface " + name + "\n description " + interface_dict[name]['description'] for name in names) + "\n"
+
+	return(dict(facts=facts, interfaces=interface_dict, ips=ip_dict, bgp=bgp, running=running))
+
+
+def make_driver(os='ios', interfaces=10, ips=None, model="FAKE-MODEL", serial="FAKE0001", latency=0.0):
+	class FakeDevice():
+		def __init__(self, hostname, username, password, timeout=60, optional_args=None):
+			self.hostname = hostname
+			self.data = make_device_data(os, interfaces, ips, model, serial, hostname)
+			self.running = self.data['running']
+			self.candidate = None
+			self.opened = False
+
+		def wait(self):
+			if latency:
+				time.sleep(latency)
+
+		def open(self):
+			self.wait()
+			self.opened = True
+
+		def close(self):
+			self.opened = False
+
+		def is_alive(self):
+			return({'is_alive': self.opened})
+
+		def get_facts(self):
+			self.wait()
+			return(self.data['facts'])
+
+		def get_interfaces(self):
+			self.wait()
+			return(self.data['interfaces'])
+
+		def get_interfaces_ip(self):
+			self.wait()
+			return(self.data['ips'])
+
+		def get_bgp_neighbors(self):
+			self.wait()
+			return(self.data['bgp'])
+
+		def load_merge_candidate(self, filename=None, config=None):
+			self.wait()
+			if filename is not None:
+				with open(filename, 'r') as f:
+					config = f.read()
+			self.candidate = ("merge", config)
+
+		def load_replace_candidate(self, filename=None, config=None):
+			self.wait()
+			if filename is not None:
+				with open(filename, 'r') as f:
+					config = f.read()
+			self.candidate = ("replace", config)
+
+		def compare_config(self):
+			self.wait()
+			if self.candidate is None:
+				return("")
+			method, config = self.candidate
+			running = set(self.running.splitlines())
+			diff = ["+" + line for line in config.splitlines() if line not in running]
+			if method == "replace":
+				candidate = set(config.splitlines())
+				diff.extend("-" + line for line in self.running.splitlines() if line not in candidate)
+			return("\n".join(diff))
+
+		def commit_config(self, message="", revert_in=None):
+			self.wait()
+			method, config = self.candidate
+			self.running = config if method == "replace" else self.running + config
+			self.candidate = None
+
+		def discard_config(self):
+			self.candidate = None
+
+	return(FakeDevice)
@@ -0,0 +1,53 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	cold start of each script: wall time of a fresh python running it with --help and with a bad argument,
+#	against a fresh python that only imports what the scripts used to import up front (napalm, pynetbox,
+#	requests, colorama, aiohttp). best and median of -n runs.
+#
+#	usage: benchmarks/import_time.py [-n runs]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+scripts = ["device-to-netbox.py", "netbox-to-device.py", "netbox-device-type-change.py"]
+
+# what the scripts imported at the top before lazy_modules.py
+eager_imports = "import napalm, pynetbox, requests, colorama, asyncio\ntry:\n\timport aiohttp\nexcept ImportError:\n\tpass\n"
+
+
+def timed_runs(command, runs):
+	times = []
+	for run in range(runs):
+		start = time.perf_counter()
+		subprocess.run(command, cwd=repo_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+		times.append(time.perf_counter() - start)
+	return(min(times), statistics.median(times))
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-n', '--runs',	type=int, default=10, help='Runs of each command. Defaults to 10')
+	args = parser.parse_args()
+
+	rows = []
+	rows.append(("python -c pass", timed_runs([sys.executable, "-c", "pass"], args.runs)))
+	rows.append(("old eager imports", timed_runs([sys.executable, "-c", eager_imports], args.runs)))
+	for script in scripts:
+		rows.append((script + " --help", timed_runs([sys.executable, script, "--help"], args.runs)))
+		rows.append((script + " --bogus", timed_runs([sys.executable, script, "--bogus"], args.runs)))
+
+	print("%-45s %10s %10s" % ("command", "best (s)", "median (s)"))
+	for name, (best, median) in rows:
+		print("%-45s %10.3f %10.3f" % (name, best, median))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,86 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	benchmark of interface_classifier against the old list/regex code from device-to-netbox.py, using a
+#	synthetic junos interface listing. timing only, tests/test_interface_classifier.py checks the results.
+#
+#	usage: benchmarks/interface_classifier.py [-i interfaces]
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import config
+import interface_classifier
+
+
+# roughly what a big MX looks like: physicals, lots of units, plus the internal junk bad_if_regex skips
+def make_junos_interfaces(count):
+	interfaces = {}
+	internal = ['bme0', 'cbp0', 'dsc', 'em0', 'em1', 'esi', 'fti0', 'gre', 'ipip', 'jsrv', 'jsrv.1', 'lo0', 'lo0.0', 'lo0.16385', 'lsi', 'mtun', 'pfe-0/0/0', 'pfh-0/0/0', 'pip0', 'tap', 'vme', 'vtep', 'irb', 'ae0', 'ae1']
+	for name in internal:
+		interfaces[name] = {'is_enabled': True, 'description': ''}
+
+	families = ['ge-', 'xe-', 'et-']
+	index = 0
+	while len(interfaces) < count:
+		family = families[index % len(families)]
+		physical = family + str(index // 4000) + "/" + str((index // 400) % 10) + "/" + str((index // 40) % 10)
+		interfaces[physical] = {'is_enabled': True, 'description': ''}
+		interfaces[physical + "." + str(index % 4000)] = {'is_enabled': True, 'description': ''}
+		if index % 97 == 0:
+			interfaces[physical + ".32767"] = {'is_enabled': True, 'description': ''}
+		index += 1
+	return(interfaces)
+
+
+# what get_device_info, add_interfaces and add_ips did before interface_classifier
+def old_classify(interfaces, os):
+	interfaces_list = list(interfaces.keys())
+	pattern = re.compile("|".join(config.bad_if_regex), flags=re.IGNORECASE | re.MULTILINE)
+	good_interface_list = [i for i in interfaces_list if not pattern.match(i)]
+
+	result = {}
+	for interface in interfaces_list:
+		interface_type = "other"
+		for platform_key, platform_val in config.interface_map.items():
+			if platform_key == os:
+				for interface_match, netbox_type in platform_val.items():
+					if re.match(interface_match, interface, re.IGNORECASE):
+						interface_type = netbox_type
+		role = None
+		if re.search(config.interface_roles['loopback'], interface, re.IGNORECASE):
+			role = "loopback"
+		result[interface] = dict(include=interface in good_interface_list, type=interface_type, role=role)
+	return(result)
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-i', '--interfaces', type=int, default=20000, help='Interfaces in the synthetic listing')
+	args = parser.parse_args()
+
+	interfaces = make_junos_interfaces(args.interfaces)
+
+	start = time.perf_counter()
+	old_result = old_classify(interfaces, 'junos')
+	old_time = time.perf_counter() - start
+
+	start = time.perf_counter()
+	classifier = interface_classifier.compile_classifier(config, 'junos')
+	new_result = interface_classifier.classify_interfaces(classifier, interfaces)
+	new_time = time.perf_counter() - start
+
+	print(str(len(interfaces)) + " interfaces, " + str(sum(1 for c in new_result.values() if not c['include'])) + " skipped")
+	print("")
+	print("\told:\t\t%.3fs" % old_time)
+	print("\tclassifier:\t%.3fs" % new_time)
+	print("\tspeedup:\t%.0fx" % (old_time / max(new_time, 1e-9)))
+
+
+if __name__ == "__main__":
+	main()
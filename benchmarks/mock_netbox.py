@@ -0,0 +1,562 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	small in-memory stand-in for the netbox rest api, enough of it for the scripts in this repo:
+#	list/detail GET with the filters the scripts use and offset pagination, POST/PATCH/DELETE of single
+#	objects and lists (all or nothing like netbox: a POST gets an error per item, a PATCH only the first
+#	one), nested foreign keys and choices.
+#	also serves config generator output under /generator/?device=<id>, gzipped when asked for, with an
+#	ETag so conditional requests get a 304 when the config hasn't changed.
+#
+#	POST /graphql/ answers the device / ip_address_list queries netbox_graphql.py sends. there's no real
+#	graphql parser, it looks for those two fields in the query and returns everything they could ask for.
+#
+#	every request is counted per method + endpoint along with bytes in/out, and a fixed latency can be
+#	added to each request to look like a real netbox over a real network.
+#
+#	usage: benchmarks/mock_netbox.py [-p port] [-l latency ms] [-v netbox version]
+#	stats: GET /_mock/stats, reset counters: POST /_mock/reset
+
+import argparse
+from collections import Counter
+from functools import lru_cache
+import gzip
+import hashlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from ipaddress import ip_interface
+import json
+import re
+import threading
+import time
+from urllib.parse import urlparse, parse_qs, urlencode
+
+api_version = "3.7"
+# what it reports with graphql on, the graphql answers are shaped like netbox 4
+graphql_api_version = "4.2"
+default_page_size = 50
+max_page_size = 1000
+
+# foreign keys per endpoint, rendered as nested objects and filterable by <field>_id / <field>__ie
+foreign_keys = {
+	'dcim/devices': {
+		'device_type':	'dcim/device-types',
+		'device_role':	'dcim/device-roles',
+		'role':		'dcim/device-roles',
+		'platform':	'dcim/platforms',
+		'site':		'dcim/sites',
+		'tenant':	'tenancy/tenants',
+		'primary_ip4':	'ipam/ip-addresses',
+		'primary_ip6':	'ipam/ip-addresses',
+	},
+	'dcim/device-types':		{'manufacturer': 'dcim/manufacturers'},
+	'dcim/interfaces':		{'device': 'dcim/devices'},
+	'dcim/interface-templates':	{'device_type': 'dcim/device-types'},
+	'ipam/ip-addresses':		{'tenant': 'tenancy/tenants', 'vrf': 'ipam/vrfs'},
+	'ipam/prefixes':		{'site': 'dcim/sites', 'tenant': 'tenancy/tenants', 'vrf': 'ipam/vrfs'},
+}
+
+# fields netbox returns as {'value': .., 'label': ..}
+choice_fields = ['type', 'status']
+
+# old and new names for the same filter
+filter_aliases = {
+	'devicetype_id':	'device_type_id',
+}
+
+# defaults for fields netbox always returns
+defaults = {
+	'dcim/devices':			{'serial': '', 'status': 'active', 'comments': '', 'primary_ip4': None, 'primary_ip6': None, 'platform': None, 'tenant': None},
+	'dcim/interfaces':		{'enabled': True, 'description': '', 'type': 'other', 'mtu': None},
+	'dcim/interface-templates':	{'description': '', 'mgmt_only': False},
+	'ipam/ip-addresses':		{'status': 'active', 'role': None, 'description': '', 'tenant': None, 'vrf': None, 'assigned_object_type': None, 'assigned_object_id': None},
+	'ipam/prefixes':		{'status': 'active', 'site': None, 'tenant': None, 'vrf': None, 'description': ''},
+}
+
+# fields that have to be unique together
+unique_together = {
+	'dcim/interfaces':	('device', 'name'),
+	'dcim/devices':		('site', 'name'),
+}
+
+# fields used for display / str() of an object
+display_fields = ['name', 'model', 'address', 'prefix']
+
+id_regex = re.compile(r'^(?P<endpoint>[a-z-]+/[a-z0-9-]+)/(?:(?P<id>[0-9]+)/)?$')
+
+
+class MockNetbox():
+	def __init__(self, host='127.0.0.1', port=0, latency=0.0, version=api_version):
+		self.latency =		latency
+		self.version =		version
+		self.objects =		{}
+		self.unique =		{}
+		self.last_id =		0
+		self.configs =		{}
+		self.counts =		Counter()
+		self.bytes_in =		Counter()
+		self.bytes_out =	Counter()
+		self.lock =		threading.RLock()
+		self.server =		ThreadingHTTPServer((host, port), make_handler(self))
+		self.server.daemon_threads = True
+		self.url =		"http://" + host + ":" + str(self.server.server_port) + "/"
+		self.thread =		None
+
+	def start(self):
+		self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+		self.thread.start()
+		return(self)
+
+	def stop(self):
+		self.server.shutdown()
+		self.server.server_close()
+
+	def reset_counts(self):
+		with self.lock:
+			self.counts.clear()
+			self.bytes_in.clear()
+			self.bytes_out.clear()
+
+	def stats(self):
+		with self.lock:
+			return(dict(
+				requests =	{" ".join(key): val for key, val in sorted(self.counts.items())},
+				bytes_in =	sum(self.bytes_in.values()),
+				bytes_out =	sum(self.bytes_out.values()),
+				total =		sum(self.counts.values()),
+			))
+
+	############################
+	# data
+
+	def add(self, endpoint, **fields):
+		with self.lock:
+			self.last_id += 1
+			obj = dict(defaults.get(endpoint, {}))
+			obj.update(flatten(fields))
+			obj['id'] = self.last_id
+			self.objects.setdefault(endpoint, {})[obj['id']] = obj
+			self.index(endpoint, obj)
+			return(obj)
+
+	# unique_together fields -> id, so checking for duplicates doesn't mean scanning every object
+	def unique_key(self, endpoint, obj):
+		if endpoint not in unique_together:
+			return(None)
+		return(tuple(obj.get(field) for field in unique_together[endpoint]))
+
+	def index(self, endpoint, obj):
+		key = self.unique_key(endpoint, obj)
+		if key is not None:
+			self.unique.setdefault(endpoint, {})[key] = obj['id']
+
+	def unindex(self, endpoint, obj):
+		key = self.unique_key(endpoint, obj)
+		if key is not None and self.unique.get(endpoint, {}).get(key) == obj['id']:
+			del self.unique[endpoint][key]
+
+	def remove(self, endpoint, id):
+		obj = self.objects[endpoint].pop(int(id))
+		self.unindex(endpoint, obj)
+
+	def get_object(self, endpoint, id):
+		return(self.objects.get(endpoint, {}).get(int(id)))
+
+	def render(self, endpoint, obj, depth=0):
+		rendered = {'id': obj['id'], 'url': self.url + "api/" + endpoint + "/" + str(obj['id']) + "/"}
+		for field, val in obj.items():
+			if field == 'id':
+				continue
+			if field in foreign_keys.get(endpoint, {}):
+				rendered[field] = self.render_nested(foreign_keys[endpoint][field], val)
+			elif field in choice_fields and val is not None:
+				rendered[field] = {'value': val, 'label': str(val)}
+			else:
+				rendered[field] = val
+		rendered['display'] = display_name(obj)
+
+		if endpoint == 'dcim/devices':
+			rendered['primary_ip'] = rendered.get('primary_ip6') or rendered.get('primary_ip4')
+
+		if endpoint == 'ipam/ip-addresses' and obj.get('assigned_object_type') == "dcim.interface" and obj.get('assigned_object_id'):
+			interface = self.get_object('dcim/interfaces', obj['assigned_object_id'])
+			if interface is not None:
+				rendered['assigned_object'] = dict(self.render_nested('dcim/interfaces', interface['id']), device=self.render_nested('dcim/devices', interface['device']))
+		return(rendered)
+
+	def render_nested(self, endpoint, id):
+		if id is None:
+			return(None)
+		obj = self.get_object(endpoint, id)
+		nested = {'id': id, 'url': self.url + "api/" + endpoint + "/" + str(id) + "/"}
+		if obj is not None:
+			nested['display'] = display_name(obj)
+			for field in display_fields + ['slug']:
+				if field in obj:
+					nested[field] = obj[field]
+		return(nested)
+
+	# value of a field for filtering. foreign keys compare by the name of what they point to
+	def field_value(self, endpoint, obj, field):
+		val = obj.get(field)
+		if field in foreign_keys.get(endpoint, {}) and val is not None:
+			target = self.get_object(foreign_keys[endpoint][field], val)
+			if target is not None:
+				return(display_name(target))
+		return(val)
+
+	def matches(self, endpoint, obj, key, vals):
+		key = filter_aliases.get(key, key)
+		if key in ['limit', 'offset', 'brief', 'ordering', 'exclude']:
+			return(True)
+
+		if key == 'q':
+			return(any(val.lower() in str(display_name(obj)).lower() for val in vals))
+
+		if key == 'id':
+			return(str(obj['id']) in vals)
+
+		if key == 'address':
+			return(address_host(obj['address']) in set(address_host(val) for val in vals))
+
+		if key.endswith('__ie'):
+			field = key[:-4]
+			return(str(self.field_value(endpoint, obj, field)).lower() in [val.lower() for val in vals])
+
+		# ips belong to a device through the interface they're assigned to
+		if endpoint == 'ipam/ip-addresses' and key == 'device_id':
+			interface = self.get_object('dcim/interfaces', obj['assigned_object_id']) if obj.get('assigned_object_type') == "dcim.interface" and obj.get('assigned_object_id') else None
+			return(interface is not None and str(interface['device']) in vals)
+
+		if key.endswith('_id'):
+			field = key[:-3]
+			val = obj.get(field)
+			return(str(val) in vals or (val is None and 'null' in vals))
+
+		val = obj.get(key)
+		if isinstance(val, bool):
+			val = str(val).lower()
+		return(str(val) in vals or str(self.field_value(endpoint, obj, key)) in vals)
+
+	def list(self, endpoint, query):
+		with self.lock:
+			results = [obj for obj in self.objects.get(endpoint, {}).values() if all(self.matches(endpoint, obj, key, vals) for key, vals in query.items())]
+
+			limit = int(query.get('limit', [default_page_size])[0])
+			if limit == 0 or limit > max_page_size:
+				limit = max_page_size
+			offset = int(query.get('offset', [0])[0])
+
+			page = [self.render(endpoint, obj) for obj in results[offset:offset + limit]]
+
+		next_url = None
+		if offset + limit < len(results):
+			next_query = {key: vals for key, vals in query.items() if key not in ['limit', 'offset']}
+			next_query['limit'] = [str(limit)]
+			next_query['offset'] = [str(offset + limit)]
+			next_url = self.url + "api/" + endpoint + "/?" + urlencode(next_query, doseq=True)
+
+		return(dict(count=len(results), next=next_url, previous=None, results=page))
+
+	def validate(self, endpoint, item, existing=None):
+		errors = {}
+		merged = dict(existing or {})
+		merged.update(item)
+
+		key = self.unique_key(endpoint, merged)
+		if key is not None:
+			found = self.unique.get(endpoint, {}).get(key)
+			if found is not None and (existing is None or found != existing['id']):
+				errors['__all__'] = ["Constraint violated: " + ", ".join(unique_together[endpoint]) + " must be unique."]
+
+		for field, target in foreign_keys.get(endpoint, {}).items():
+			if merged.get(field) is not None and self.get_object(target, merged[field]) is None:
+				errors[field] = ["Related object not found using the provided numeric ID: " + str(merged[field])]
+		return(errors)
+
+	def create(self, endpoint, payload):
+		items = payload if isinstance(payload, list) else [payload]
+		with self.lock:
+			items = [flatten(item) for item in items]
+			errors = []
+			pending = []
+			for item in items:
+				error = self.validate(endpoint, item)
+				errors.append(error)
+				if not error:
+					# so later items in the same request see earlier ones for unique checks
+					pending.append(self.add(endpoint, **item))
+			if any(errors):
+				for obj in pending:
+					self.remove(endpoint, obj['id'])
+				return(400, errors if isinstance(payload, list) else errors[0])
+			rendered = [self.render(endpoint, obj) for obj in pending]
+		return(201, rendered if isinstance(payload, list) else rendered[0])
+
+	def update(self, endpoint, payload, id=None):
+		items = payload if isinstance(payload, list) else [dict(payload, id=int(id))]
+		with self.lock:
+			items = [flatten(item) for item in items]
+			errors = []
+			for item in items:
+				obj = self.get_object(endpoint, item.get('id', 0))
+				if obj is None:
+					errors.append({'id': ["Object not found."]})
+				else:
+					errors.append(self.validate(endpoint, item, obj))
+			if any(errors):
+				# like netbox, a failed bulk PATCH answers with the first error only, not one per item
+				return(400, [error for error in errors if error][0])
+			rendered = []
+			for item in items:
+				obj = self.get_object(endpoint, item['id'])
+				self.unindex(endpoint, obj)
+				obj.update(item)
+				self.index(endpoint, obj)
+				rendered.append(self.render(endpoint, obj))
+		return(200, rendered if isinstance(payload, list) else rendered[0])
+
+	def delete(self, endpoint, payload, id=None):
+		ids = [int(item['id']) for item in payload] if id is None else [int(id)]
+		with self.lock:
+			for id in ids:
+				if self.get_object(endpoint, id) is None:
+					return(404, {'detail': "Not found."})
+			for id in ids:
+				self.remove(endpoint, id)
+		return(204, None)
+
+	############################
+	# graphql, shaped like netbox 4: ids are strings, choices are plain values
+
+	def graphql_object(self, endpoint, obj):
+		result = {'id': str(obj['id'])}
+		for field, val in obj.items():
+			if field == 'id':
+				continue
+			if field in foreign_keys.get(endpoint, {}):
+				nested = self.render_nested(foreign_keys[endpoint][field], val)
+				if nested is not None:
+					nested = {key: (str(nested_val) if key == 'id' else nested_val) for key, nested_val in nested.items() if key not in ['url', 'display']}
+				result[field] = nested
+			else:
+				result[field] = val
+		return(result)
+
+	def graphql_ip(self, obj):
+		result = self.graphql_object('ipam/ip-addresses', obj)
+		result.pop('assigned_object_type', None)
+		result.pop('assigned_object_id', None)
+		result['assigned_object'] = None
+		if obj.get('assigned_object_type') == "dcim.interface" and obj.get('assigned_object_id'):
+			interface = self.get_object('dcim/interfaces', obj['assigned_object_id'])
+			if interface is not None:
+				device = self.get_object('dcim/devices', interface['device']) or {}
+				result['assigned_object'] = {'__typename': 'InterfaceType', 'id': str(interface['id']), 'name': interface['name'], 'device': {'id': str(interface['device']), 'name': device.get('name')}}
+		return(result)
+
+	def graphql(self, payload):
+		text = payload.get('query') or ""
+		variables = payload.get('variables') or {}
+		data = {}
+		with self.lock:
+			if "device(" in text:
+				obj = self.get_object('dcim/devices', variables.get('device') or 0)
+				device = None
+				if obj is not None:
+					device = self.graphql_object('dcim/devices', obj)
+					templates = [template for template in self.objects.get('dcim/interface-templates', {}).values() if template.get('device_type') == obj.get('device_type')]
+					if device.get('device_type') is not None:
+						device['device_type']['interfacetemplates'] = [self.graphql_object('dcim/interface-templates', template) for template in templates]
+					ips = {}
+					for ip in self.objects.get('ipam/ip-addresses', {}).values():
+						if ip.get('assigned_object_type') == "dcim.interface" and ip.get('assigned_object_id'):
+							ips.setdefault(ip['assigned_object_id'], []).append(ip)
+					device['interfaces'] = []
+					for interface in self.objects.get('dcim/interfaces', {}).values():
+						if interface.get('device') == obj['id']:
+							rendered = self.graphql_object('dcim/interfaces', interface)
+							rendered.pop('device', None)
+							rendered['ip_addresses'] = [self.graphql_object('ipam/ip-addresses', ip) for ip in ips.get(interface['id'], [])]
+							device['interfaces'].append(rendered)
+				data['device'] = device
+
+			if "ip_address_list(" in text:
+				hosts = set(address_host(address) for address in variables.get('addresses') or [])
+				data['ip_address_list'] = [self.graphql_ip(ip) for ip in self.objects.get('ipam/ip-addresses', {}).values() if address_host(ip['address']) in hosts]
+		return(200, {'data': data})
+
+	# plain text config, either set in self.configs or a made up one from the device's interfaces
+	def generator_config(self, device_id):
+		with self.lock:
+			if device_id in self.configs:
+				return(self.configs[device_id])
+			lines = ["hostname " + str(display_name(self.get_object('dcim/devices', device_id) or {'name': device_id})), "!"]
+			for obj in self.objects.get('dcim/interfaces', {}).values():
+				if obj.get('device') == device_id:
+					lines.extend(["interface " + obj['name'], " description " + (obj.get('description') or ""), " no shutdown" if obj.get('enabled') else " shutdown", "!"])
+			return("\n".join(lines) + "\n")
+
+
+# the same addresses get compared over and over when filtering by a chunk of them
+@lru_cache(maxsize=None)
+def address_host(address):
+	return(str(ip_interface(address).ip))
+
+
+def display_name(obj):
+	for field in display_fields:
+		if obj.get(field) is not None:
+			return(obj[field])
+	return(str(obj.get('id')))
+
+
+# nested objects ({'id': 1, ..}) in payloads become plain ids
+def flatten(item):
+	return({field: (val['id'] if isinstance(val, dict) and 'id' in val else val) for field, val in item.items()})
+
+
+def make_handler(mock):
+	class Handler(BaseHTTPRequestHandler):
+		protocol_version = "HTTP/1.1"
+		# headers and body go out in separate writes, don't let nagle hold the body back
+		disable_nagle_algorithm = True
+
+		def log_message(self, *args):
+			pass
+
+		def send(self, status, body, content_type="application/json", headers=None):
+			if body is None:
+				data = b""
+			elif isinstance(body, bytes):
+				data = body
+			elif content_type == "application/json":
+				data = json.dumps(body).encode()
+			else:
+				data = body.encode()
+			self.send_response(status)
+			self.send_header("Content-Type", content_type)
+			self.send_header("Content-Length", str(len(data)))
+			self.send_header("API-Version", mock.version)
+			for key, val in (headers or {}).items():
+				self.send_header(key, val)
+			self.end_headers()
+			self.wfile.write(data)
+			return(len(data))
+
+		def read_body(self):
+			length = int(self.headers.get("Content-Length") or 0)
+			raw = self.rfile.read(length) if length else b""
+			return(raw, json.loads(raw) if raw else None)
+
+		def handle_any(self, method):
+			if mock.latency:
+				time.sleep(mock.latency)
+
+			url = urlparse(self.path)
+			query = parse_qs(url.query, keep_blank_values=True)
+			raw, payload = self.read_body() if method in ['POST', 'PATCH', 'PUT', 'DELETE'] else (b"", None)
+			path = url.path
+
+			if path.startswith("/_mock/"):
+				if path == "/_mock/stats":
+					return(self.send(200, mock.stats()))
+				if path == "/_mock/reset":
+					mock.reset_counts()
+					return(self.send(200, {}))
+				return(self.send(404, {'detail': "Not found."}))
+
+			endpoint, status, body, content_type, headers = self.route(method, path, query, payload)
+			with mock.lock:
+				mock.counts[(method, endpoint)] += 1
+				mock.bytes_in[endpoint] += len(raw) + len(self.path)
+			sent = self.send(status, body, content_type, headers)
+			with mock.lock:
+				mock.bytes_out[endpoint] += sent
+
+		def route(self, method, path, query, payload):
+			if path.startswith("/generator"):
+				device_id = int(query.get('device', ['0'])[0])
+				text = mock.generator_config(device_id)
+				headers = {'ETag': "\"" + hashlib.sha1(text.encode()).hexdigest() + "\""}
+				if headers['ETag'] in (self.headers.get("If-None-Match") or ""):
+					return("generator", 304, None, "text/plain", headers)
+				if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+					headers['Content-Encoding'] = "gzip"
+					return("generator", 200, gzip.compress(text.encode()), "text/plain", headers)
+				return("generator", 200, text, "text/plain", headers)
+
+			if path.rstrip("/") == "/graphql" and method == 'POST':
+				status, body = mock.graphql(payload or {})
+				return("graphql", status, body, "application/json", None)
+
+			if path in ["/api/", "/api"]:
+				return("api", 200, {}, "application/json", None)
+			if path == "/api/status/":
+				return("status", 200, {'netbox-version': mock.version + ".0"}, "application/json", None)
+
+			match = id_regex.match(path[len("/api/"):]) if path.startswith("/api/") else None
+			if match is None:
+				return(path, 404, {'detail': "Not found."}, "application/json", None)
+
+			endpoint = match.group('endpoint')
+			id = match.group('id')
+
+			if method == 'GET':
+				if id is None:
+					return(endpoint, 200, mock.list(endpoint, query), "application/json", None)
+				with mock.lock:
+					obj = mock.get_object(endpoint, id)
+					if obj is None:
+						return(endpoint, 404, {'detail': "Not found."}, "application/json", None)
+					return(endpoint, 200, mock.render(endpoint, obj), "application/json", None)
+
+			if method == 'POST' and id is None:
+				status, body = mock.create(endpoint, payload)
+				return(endpoint, status, body, "application/json", None)
+
+			if method in ['PATCH', 'PUT']:
+				status, body = mock.update(endpoint, payload, id)
+				return(endpoint, status, body, "application/json", None)
+
+			if method == 'DELETE':
+				status, body = mock.delete(endpoint, payload, id)
+				return(endpoint, status, body, "application/json", None)
+
+			return(endpoint, 405, {'detail': "Method not allowed."}, "application/json", None)
+
+		def do_GET(self):
+			self.handle_any('GET')
+
+		def do_POST(self):
+			self.handle_any('POST')
+
+		def do_PATCH(self):
+			self.handle_any('PATCH')
+
+		def do_PUT(self):
+			self.handle_any('PUT')
+
+		def do_DELETE(self):
+			self.handle_any('DELETE')
+
+	return(Handler)
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-p', '--port',	type=int, default=8000, help='Port to listen on')
+	parser.add_argument('-l', '--latency',	type=float, default=0, help='Milliseconds added to every request')
+	parser.add_argument('-v', '--version',	default=api_version, help='Netbox version to report. Defaults to ' + api_version)
+	args = parser.parse_args()
+
+	mock = MockNetbox(port=args.port, latency=args.latency / 1000, version=args.version)
+	print("Mock netbox listening on " + mock.url + " (api token is ignored)")
+	try:
+		mock.server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+
+
+if __name__ == "__main__":
+	main()
@@ -10,12 +10,59 @@
 netbox_url =		"https://netbox.example.org/"
 netbox_api_token =	"CREATEME"
 request_timeout = 	10
+bulk_chunk_size =	250		# objects per bulk create/update request
+bulk_filter_size =	100		# values per filter request when looking up many objects at once (keeps urls short)
+netbox_page_size =	1000		# objects per page on big reads, up to netbox's MAX_PAGE_SIZE (1000 unless changed there)
+
+# cache of sites, tenants, roles, platforms and device types shared by all scripts. --refresh-cache clears it
+cache_file =		"~/.cache/netbox-device-scripts/cache.sqlite"
+cache_ttl =		3600		# seconds before a cached object is looked up again. 0 disables the cache
+
+# independent netbox requests are sent concurrently when aiohttp is installed (pip install aiohttp)
+netbox_async =		True		# False to always use plain pynetbox
+async_concurrency =	8		# max requests in flight / pooled connections
+async_retries =		3		# retries on connection errors, 429 and 502/503/504, with backoff
+
+# read a device with its interfaces, IPs and interface templates in one graphql query. only used when netbox
+# is 4.0 - 4.2 (the version is checked once), other versions and failed queries read through REST
+netbox_graphql =	False
+
+# netbox-daemon.py keeps device sessions open between jobs, closing them after this many idle seconds
+session_idle_timeout =	300
+daemon_socket =		"~/.cache/netbox-device-scripts/daemon.sock"	# unix socket the daemon listens on and clients connect to
+
+# time per phase / napalm getter and netbox requests per endpoint, written at the end of every run. None to turn off
+metrics_jsonl =		None		# append one json line per run (per device with -f), ie "/var/log/netbox-device-scripts/metrics.jsonl"
+metrics_textfile_dir =	None		# prometheus node_exporter textfile collector directory, ie "/var/lib/node_exporter/textfile_collector"
 
 ##########################################
 #### netbox-to-device stuff
 
 generator_url =       "https://netbox.example.org/cgi-bin/netbox_router_config.cgi?device="
 
+# last config seen per device is kept in cache_file and revalidated with ETag/If-Modified-Since, so unchanged
+# configs aren't downloaded again. --refresh-cache clears it
+generator_cache =	True		# False to always download
+generator_cache_ttl =	0		# seconds to use a cached config without asking the generator at all
+
+# a hash per config section of the last successful push to each device is kept in cache_file. unchanged
+# devices are skipped without looking at them and a merge only sends the sections that changed, so changes
+# made on a device by hand go unnoticed. --force ignores it for a run
+push_cache =		False		# True to turn it on, the default always compares the whole config with the device
+
+# pushing to many devices at once (several -d ids, or --site/--tenant/--role)
+push_workers =		20		# devices to open and diff at once (-w)
+push_wave_size =	10		# devices committed at once. later waves are skipped if one in a wave fails (--wave-size)
+
+# netbox-webhook.py: pushes to devices changed in netbox. a device is pushed once no changes to it have come in
+# for webhook_debounce seconds (or it has waited webhook_max_wait), so bulk edits give one push per device
+webhook_listen =	"127.0.0.1"	# address to listen on (-l)
+webhook_port =		8090		# (-p)
+webhook_secret =	None		# the webhook's secret in netbox, to check X-Hook-Signature. None accepts anything (diffs only, --commit needs it)
+webhook_debounce =	10		# seconds (--debounce)
+webhook_max_wait =	60		# seconds
+webhook_workers =	10		# devices diffed / pushed at once (-w)
+
 
 ##########################################
 #### device-to-netbox stuff
@@ -25,6 +72,23 @@ device_status = 	"active"	# default device status (no current flag)
 os = 			"ios"		# default os / napalm driver (-o)
 ip_status =		"active"	# default ip statis (no current flag)
 
+# after adding IPs, fill in site/tenant on the most specific global prefix each one is in, where they're empty.
+# loopbacks and container prefixes are skipped
+update_prefixes =	False
+device_timeout =	60		# napalm timeout in seconds for talking to a device
+
+# napalm getters run when importing: facts, interfaces, ips, bgp. facts are always run. the import uses interfaces
+# and ips, a device imported without one of them leaves that part alone in netbox. bgp isn't used by the import,
+# only kept in --save-snapshot files. per os / role lists replace the default (role first), --getters replaces all
+import_getters =	['facts', 'interfaces', 'ips']
+import_getters_by_os =	{}		# ie {'junos': ['facts', 'interfaces', 'ips', 'bgp']}
+import_getters_by_role = {}		# ie {'pe': ['facts', 'interfaces', 'ips']}
+getter_timeouts =	{'facts': 60, 'interfaces': 120, 'ips': 120, 'bgp': 300}	# seconds per getter, None to wait forever
+
+# inventory (-f) imports
+import_workers =	10		# devices to import at once (-w)
+import_timeout =	600		# seconds before a single device is killed and marked failed (--timeout)
+
 # interfaces you don't want to import.  case insensitive + multiline flags given
 bad_if_regex =	['^vlan1$', '^bme.*', '^cbp.*',
 		'^esi.*', '^.local.*',
@@ -73,6 +137,13 @@ interface_map['junos'] = {
 ##########################################
 #### netbox-device-type-change stuff
 
+# roles can also come from netbox: put "role:wan1" etc in the description of a device type's interface templates.
+# the map is built from those and only rebuilt when the templates change. types below is used for device
+# types whose templates have no roles
+template_roles =	True		# False to only use types below
+template_role_field =	'description'	# interface template field with the role word, description or label
+template_role_prefix =	'role:'
+
 # create a new type by mapping interface names to roles (wan1/2, lan1/2, mgmt, loop)
 
 types = {}
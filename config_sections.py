@@ -0,0 +1,161 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	splits a candidate config in to top-level sections and remembers a hash of each section of the last
+#	config netbox-to-device.py pushed to a device (in the sqlite cache_file). that lets a run skip a device
+#	whose config hasn't changed since, or for a merge, send only the sections that did.
+#
+#	sections are:
+#		ios style	a line starting in column 0 plus the indented lines under it. "banner x ^C" runs to
+#				the closing delimiter. "!" and "end" are dropped
+#		brace style	"interfaces {" to its closing "}" (junos, eos)
+#		set style	"set interfaces ge-0/0/0 ..." lines grouped by their first two words after set/delete
+
+from contextlib import closing
+import hashlib
+import json
+import time
+import config as config
+import netbox_cache
+
+## see config.py for config
+
+separators = ['!', 'end']
+
+
+# read a config (any iterable of lines, ie an open file) in to a list of (key, text) in the order they appear
+def read_sections(lines):
+	sections = []
+	current = None
+	depth = 0
+	delimiter = None
+
+	def start(key, line):
+		section = [key, [line]]
+		sections.append(section)
+		return(section)
+
+	for line in lines:
+		line = line.rstrip("\r\n")
+		stripped = line.strip()
+
+		# inside a multi-line banner, up to the closing delimiter
+		if delimiter is not None:
+			current[1].append(line)
+			if delimiter in line:
+				delimiter = None
+			continue
+
+		# inside a { } block
+		if depth > 0:
+			current[1].append(line)
+			depth += line.count("{") - line.count("}")
+			continue
+
+		if stripped == "" or stripped in separators:
+			continue
+
+		if line[0].isspace():
+			if current is None:
+				current = start("", line)
+			else:
+				current[1].append(line)
+			continue
+
+		words = stripped.split()
+		if words[0] in ['set', 'delete'] and len(words) > 1:
+			key = " ".join(words[1:3])
+			if current is not None and current[0] == key:
+				current[1].append(line)
+			else:
+				current = start(key, line)
+			continue
+
+		current = start(stripped.rstrip("{").strip(), line)
+		if stripped.endswith("{"):
+			depth = line.count("{") - line.count("}")
+		elif words[0] == "banner" and len(words) > 2:
+			banner_delimiter = banner_delimiter_of(words[2])
+			if stripped.count(banner_delimiter) < 2:
+				delimiter = banner_delimiter
+
+	return([(key, "\n".join(text) + "\n") for key, text in sections])
+
+
+# ^C (or the ascii 3 sanitize_config turns it in to), otherwise the first character
+def banner_delimiter_of(word):
+	if word.startswith("^C"):
+		return("^C")
+	return(word[0])
+
+
+# key -> hash. a key seen more than once (ie several "ip route" lines with the same start) gets #2, #3..
+def section_hashes(sections):
+	hashes = {}
+	for key, text in sections:
+		unique_key = key
+		count = 1
+		while unique_key in hashes:
+			count += 1
+			unique_key = key + " #" + str(count)
+		hashes[unique_key] = hashlib.sha256(text.encode()).hexdigest()
+	return(hashes)
+
+
+# sections that are new or differ from what was pushed last time, in config order
+def changed_sections(sections, pushed_hashes):
+	current_hashes = section_hashes(sections)
+	changed_keys = set(key for key, val in current_hashes.items() if pushed_hashes.get(key) != val)
+	changed = []
+	seen = {}
+	for key, text in sections:
+		seen[key] = seen.get(key, 0) + 1
+		unique_key = key if seen[key] == 1 else key + " #" + str(seen[key])
+		if unique_key in changed_keys:
+			changed.append((key, text))
+	return(changed)
+
+
+##########################################
+## what was last pushed, per device
+
+def connect():
+	connection = netbox_cache.connect()
+	connection.execute("CREATE TABLE IF NOT EXISTS pushed (device TEXT PRIMARY KEY, stored REAL, method TEXT, hashes TEXT)")
+	return(connection)
+
+
+def device_key(device_id):
+	return(config.netbox_url + "dcim/devices/" + str(device_id) + "/")
+
+
+# returns (time, method, hashes) of the last successful push, or None
+def load_pushed(device_id):
+	if not config.push_cache:
+		return(None)
+	with closing(connect()) as connection:
+		row = connection.execute("SELECT stored, method, hashes FROM pushed WHERE device = ?", (device_key(device_id),)).fetchone()
+	if row is None:
+		return(None)
+	return(row[0], row[1], json.loads(row[2]))
+
+
+def store_pushed(device_id, method, hashes):
+	if not config.push_cache:
+		return()
+	with closing(connect()) as connection:
+		with connection:
+			connection.execute("INSERT OR REPLACE INTO pushed (device, stored, method, hashes) VALUES (?, ?, ?, ?)", (device_key(device_id), time.time(), method, json.dumps(hashes)))
+	return()
+
+
+# forget a device (or every device if device_id is None), so the next push compares the whole config again
+def invalidate(device_id=None):
+	with closing(connect()) as connection:
+		with connection:
+			if device_id is None:
+				connection.execute("DELETE FROM pushed")
+			else:
+				connection.execute("DELETE FROM pushed WHERE device = ?", (device_key(device_id),))
+	return()
@@ -23,6 +23,35 @@
 #	2021-04-20	update from netbox 2.8 to 2.11. adjust up_dict to not use 'interface' and instead use 'assigned_object_*'
 #	2022-04-29	published on github at https://github.com/falz/netbox-device-scripts/
 #	2022-04-29	remove slugs which are deprecated, this also fixes case sensitivity issues
+#	2026-10-17	add -f inventory file (csv/yaml) to import many devices at once with a bounded worker pool,
+#			per-device timeouts and a summary at the end. password is only asked for once.
+#	2026-10-17	create missing interfaces with chunked bulk requests instead of one POST each
+#	2026-10-17	update_interfaces reads all interfaces once and bulk PATCHes only the ones that changed
+#	2026-10-17	add_ips reads interfaces and existing IPs up front, bulk creates/updates IPs and sets
+#			primary_ip4/primary_ip6 with a single device update
+#	2026-10-17	compile config.bad_ip once in to sorted ranges (ip_filter.py) and filter all IPs in one pass
+#	2026-10-17	classify interfaces (import or skip, type, role) with precompiled regexes in interface_classifier.py.
+#			interface_map now stops at the first match
+#	2026-10-17	cache sites, tenants, roles, platforms and device types on disk (netbox_cache.py). add --refresh-cache
+#	2026-10-17	run the independent netbox lookups in check_netbox_sanity and add_ips concurrently (netbox_async.py)
+#	2026-10-17	add --save-snapshot / --from-snapshot to save collected device info and re-import from it
+#			without logging in to the device. a directory of snapshots is imported like an inventory
+#	2026-10-17	record time per phase and napalm getter plus netbox requests per endpoint (metrics.py),
+#			written as json lines and/or a prometheus textfile, see config.py
+#	2026-10-17	add --sync to update a device that already exists, writing only what differs from the device.
+#			add --prune to also delete interfaces and IPs that are gone from it
+#	2026-10-17	add_ips can read the interfaces and existing IPs in one graphql query (config.netbox_graphql)
+#	2026-10-17	update_prefix fills in site/tenant on the most specific prefix of each IP, found with a radix
+#			tree (prefix_tree.py) over the prefixes read once, sent as one bulk PATCH (config.update_prefixes)
+#	2026-10-17	import napalm and pynetbox lazily (lazy_modules.py) so --help, argument errors and failed netbox
+#			checks don't wait for napalm to load every driver
+#	2026-10-17	open devices and netbox through sessions.py so netbox-daemon.py can keep them warm between jobs.
+#			the napalm session is now closed after collecting, split the getters out in to collect_device_info
+#	2026-10-17	only run the napalm getters in the plan for the device's os / role (config.import_getters*, --getters),
+#			each with a timeout (config.getter_timeouts) and its time printed. bgp is no longer collected by default.
+#			interface / ip phases are skipped when their getter isn't run
+#	2026-10-17	read interfaces, IPs and prefixes with netbox_bulk.fetch_records / fetch_all: config.netbox_page_size
+#			per page, the pages after the first read at once
 #
 # issues / todo:
 #
@@ -30,16 +59,36 @@
 #
 
 import argparse
+import csv
 import datetime
 import getpass
-from ipaddress import ip_address, ip_network
+import interface_classifier
+import io
+from ipaddress import ip_address
+import ip_filter
 import json
-import napalm
-import pynetbox
-import re
+import metrics
+import lazy_modules
+import multiprocessing
+import multiprocessing.connection
+import napalm_getters
+import netbox_async
+import netbox_bulk
+import netbox_cache
+import netbox_graphql
+import os
+import prefix_tree
+import sessions
+import snapshot
 import sys
+import time
 import config as config
 
+# only imported when first used, see lazy_modules.py
+asyncio =	lazy_modules.load("asyncio")
+napalm =	lazy_modules.load("napalm")
+pynetbox =	lazy_modules.load("pynetbox")
+
 ## see config.py for config
 
 #these are here to suppress crypto errors from paramiko <2.5.0 related to Juniper devices. Remove once Paramiko 2.5.0+ is available.
@@ -47,6 +96,9 @@ import config as config
 import warnings
 warnings.filterwarnings(action='ignore',module='.*paramiko.*')
 
+# IPs we never import, as sorted ranges for quick lookups
+bad_ip_ranges = ip_filter.compile_ip_ranges(config.bad_ip)
+
 
 # see config.py for config options
 
@@ -54,16 +106,46 @@ warnings.filterwarnings(action='ignore',module='.*paramiko.*')
 
 def parse_cli_args():
 	parser = argparse.ArgumentParser()
-	parser.add_argument('-d', '--device',	required=True,  help='Device hostname to fetch config from')
-	parser.add_argument('-m', '--model',	required=True,  help='Netbox device model name to create (example ASR-920-4SZ-A)')
+	parser.add_argument('-d', '--device',	required=False, help='Device hostname to fetch config from')
+	parser.add_argument('-m', '--model',	required=False, help='Netbox device model name to create (example ASR-920-4SZ-A)')
 	parser.add_argument('-o', '--os',	required=False, help='OS of device to fetch. Defaults to "ios" if not specified. (see NAPALM driver names)')
 	parser.add_argument('-r', '--role',	required=False, help='Netbox device role. Defaults to "cpe" if not specified (See ' + config.netbox_url + 'dcim/device-roles/)')
-	parser.add_argument('-s', '--site',	required=True,  help='Netbox site name to use (Example AbbotsfordSD)')
-	parser.add_argument('-t', '--tenant',	required=True,  help='Netbox tenant name to use (Example AbbotsfordSD)')
+	parser.add_argument('-s', '--site',	required=False, help='Netbox site name to use (Example AbbotsfordSD)')
+	parser.add_argument('-t', '--tenant',	required=False, help='Netbox tenant name to use (Example AbbotsfordSD)')
 	parser.add_argument('-u', '--username',	required=False, help='Username. Used for both Netbox API call and device login. Defaults to shell username.')
+	parser.add_argument('-f', '--file',	required=False, help='Inventory file (.csv or .yaml) of devices to import. Columns: device, model, site, tenant, os, role')
+	parser.add_argument('-w', '--workers',	required=False, type=int, default=config.import_workers, help='Number of devices to import at once with -f. Defaults to ' + str(config.import_workers))
+	parser.add_argument('--refresh-cache',	required=False, action='store_true', help='Clear cached sites, tenants, roles, platforms and device types before starting')
+	parser.add_argument('--save-snapshot',	required=False, help='Save what was collected from the device to this file (or directory, one file per device) before adding it to netbox')
+	parser.add_argument('--from-snapshot',	required=False, help='Import from a saved snapshot instead of logging in to the device. A directory imports every snapshot in it')
+	parser.add_argument('--timeout',	required=False, type=int, default=config.import_timeout, help='Seconds before giving up on a single device with -f. Defaults to ' + str(config.import_timeout))
+	parser.add_argument('--sync',		required=False, action='store_true', help='Update a device that already exists in netbox instead of refusing to import it. Only what differs from the device is written')
+	parser.add_argument('--prune',		required=False, action='store_true', help='With --sync, also delete interfaces and IPs in netbox that are no longer on the device')
+	parser.add_argument('--getters',	required=False, help='Comma separated napalm getters to run: ' + ", ".join(napalm_getters.methods) + '. Overrides config.import_getters. Phases whose getter is left out are skipped')
 
 	args = vars(parser.parse_args()) 
 
+	if args['prune'] and not args['sync']:
+		parser.error("--prune only works with --sync")
+
+	if args['getters'] is not None:
+		try:
+			args['getters'] = napalm_getters.parse_getters(args['getters'])
+		except ValueError as e:
+			parser.error("--getters: " + str(e))
+
+	# a single snapshot has the rest of the arguments in it, anything given on the cli wins. kept so the
+	# import doesn't read it again
+	if args['from_snapshot'] is not None and not snapshot.is_snapshot_dir(args['from_snapshot']) and args['file'] is None:
+		args['snapshot_data'] = snapshot.load_snapshot(args['from_snapshot'])
+		fill_snapshot_args(args, args['snapshot_data'][0])
+
+	# either a single device, an inventory file or a directory of snapshots
+	if args['file'] is None and not (args['from_snapshot'] is not None and snapshot.is_snapshot_dir(args['from_snapshot'])):
+		for required in ['device', 'model', 'site', 'tenant']:
+			if args[required] is None:
+				parser.error("the following arguments are required: --" + required + " (or use -f for an inventory file)")
+
 	os = args['os']
 	if os is None:
 		os = "ios"
@@ -79,10 +161,112 @@ def parse_cli_args():
 		args['username'] = username
 
 	print("")
-	args['password'] = getpass.getpass("Password for user \"" + username + "\" to log in to \"" + args['device'] + "\": ")
+	if args['from_snapshot'] is not None:
+		# nothing to log in to
+		args['password'] = None
+	elif args['file'] is None:
+		args['password'] = getpass.getpass("Password for user \"" + username + "\" to log in to \"" + args['device'] + "\": ")
+	else:
+		# prompt once for the whole inventory
+		args['password'] = getpass.getpass("Password for user \"" + username + "\" to log in to devices in \"" + args['file'] + "\": ")
 	return(args)
 
 
+# read an inventory of devices to import. returns a list of args dicts, one per device, same shape as parse_cli_args()
+def read_inventory(args):
+	file = args['file']
+	if not os.path.exists(file):
+		print(file, "doesn't exist!")
+		sys.exit(1)
+
+	if file.lower().endswith(('.yml', '.yaml')):
+		try:
+			import yaml
+		except ImportError:
+			print("YAML inventory requires PyYAML: pip install pyyaml")
+			sys.exit(1)
+		with open(file, 'r') as f:
+			rows = yaml.safe_load(f) or []
+	else:
+		with open(file, 'r', newline='') as f:
+			lines = [line for line in f if line.strip() and not line.lstrip().startswith('#')]
+		rows = list(csv.DictReader(lines))
+
+	# every device gets its own snapshot file in these, so they have to be directories
+	if args['save_snapshot'] is not None:
+		if os.path.exists(args['save_snapshot']) and not os.path.isdir(args['save_snapshot']):
+			print("--save-snapshot " + args['save_snapshot'] + " isn't a directory, it has to be one with -f")
+			sys.exit(1)
+		os.makedirs(args['save_snapshot'], exist_ok=True)
+	if args['from_snapshot'] is not None and not snapshot.is_snapshot_dir(args['from_snapshot']):
+		print("--from-snapshot " + args['from_snapshot'] + " isn't a directory, it has to be one with -f")
+		sys.exit(1)
+
+	inventory = []
+	for line_number, row in enumerate(rows, start=1):
+		row = {str(key).strip().lower(): str(val).strip() for key, val in row.items() if key is not None and val is not None}
+
+		missing = [required for required in ['device', 'model', 'site', 'tenant'] if not row.get(required)]
+		if missing:
+			print("Inventory entry " + str(line_number) + " is missing: " + ", ".join(missing))
+			sys.exit(1)
+
+		device_args = dict(
+			device =	row['device'],
+			model =		row['model'],
+			site =		row['site'],
+			tenant =	row['tenant'],
+			os =		row.get('os') or args['os'],
+			role =		row.get('role') or args['role'],
+			username =	args['username'],
+			password =	args['password'],
+			sync =		args['sync'],
+			prune =		args['prune'],
+			getters =	args['getters'],
+		)
+		add_snapshot_args(args, device_args)
+		inventory.append(device_args)
+
+	return(inventory)
+
+
+# every snapshot in a --from-snapshot directory, as an inventory. the snapshots are only read by the import,
+# which fills in the arguments from them
+def read_snapshot_inventory(args):
+	inventory = []
+	for file in snapshot.snapshot_files(args['from_snapshot']):
+		device_args = {key: None for key in snapshot.snapshot_args}
+		device_args.update(username=args['username'], password=None, from_snapshot=file, save_snapshot=None, sync=args['sync'], prune=args['prune'])
+		inventory.append(device_args)
+
+	if not inventory:
+		print("No snapshots found in " + args['from_snapshot'])
+		sys.exit(1)
+	return(inventory)
+
+
+# per-device snapshot file names in the --save-snapshot/--from-snapshot directories
+def add_snapshot_args(args, device_args):
+	for key in ['save_snapshot', 'from_snapshot']:
+		if args.get(key) is not None:
+			device_args[key] = snapshot.snapshot_path(args[key], device_args['device'], directory=True)
+	return(device_args)
+
+
+# arguments saved in a snapshot, where they weren't given
+def fill_snapshot_args(args, snapshot_args):
+	for key, val in snapshot_args.items():
+		if args.get(key) is None:
+			args[key] = val
+	return(args)
+
+
+# name of a device in an inventory, before its snapshot has been read
+def inventory_name(device_args):
+	if device_args.get('device') is not None:
+		return(device_args['device'])
+	return(snapshot.snapshot_device(device_args['from_snapshot']))
+
 
 def check_netbox_sanity(args, nb):
 	# sanity checks, return results from checks for use later
@@ -90,22 +274,28 @@ def check_netbox_sanity(args, nb):
 
 	device = 	args['device'].lower()
 	site =		args['site'].lower()
+	model =		args['model'].lower()
+	tenant =	args['tenant'].lower()
 
+	# the lookups don't depend on each other, so do them all at once when we can
 	try:
-		existingdevices = nb.dcim.devices.get(name__ie=device, site__ie=site)
-	except pynetbox.lib.query.RequestError as e:
-		print(e.error)
-
-	if existingdevices is not None:
-		message="Device " +  device + " already exists at site " + site + ": " + config.netbox_url + "dcim/devices/" + str(existingdevices.id) + "/"
+		if netbox_async.enabled():
+			existingdevices, models, sites, tenants = netbox_async.run(sanity_lookups_async(nb, device, site, model, tenant))
+		else:
+			existingdevices = nb.dcim.devices.get(name__ie=device, site__ie=site)
+			models = netbox_cache.cached_get(nb.dcim.device_types, model__ie=model)
+			sites = netbox_cache.cached_get(nb.dcim.sites, name__ie=site)
+			tenants = netbox_cache.cached_get(nb.tenancy.tenants, name__ie=tenant)
+	except (pynetbox.RequestError, netbox_async.AsyncRequestError) as e:
+		message = "Netbox sanity checks failed: " + str(e.error)
 		return(False, message, sanitydata)
 
+	if existingdevices is not None:
+		if not args.get('sync'):
+			message="Device " +  device + " already exists at site " + site + ": " + config.netbox_url + "dcim/devices/" + str(existingdevices.id) + "/ (use --sync to update it)"
+			return(False, message, sanitydata)
+		sanitydata['device'] = existingdevices
 
-	model = args['model'].lower()
-	try:
-		models = nb.dcim.device_types.get(model__ie=model)
-	except pynetbox.lib.query.RequestError as e:
-		print(e.error)
 
 	if models is None:
 		message="Model " + model + " doesn't exist!"
@@ -114,7 +304,6 @@ def check_netbox_sanity(args, nb):
 		sanitydata['model'] = models
 
 
-	sites = nb.dcim.sites.get(name__ie=site)
 	if sites is None:
 		message = "Site " + site + " doesn't exist!"
 		return(False, message, sanitydata)
@@ -122,12 +311,6 @@ def check_netbox_sanity(args, nb):
 		sanitydata['site'] = sites
 
 
-	tenant = args['tenant'].lower()
-	try:
-		tenants = nb.tenancy.tenants.get(name__ie=tenant)
-	except pynetbox.lib.query.RequestError as e:
-		print(e.error)
-
 	if tenants is None:
 		message = "Tenant " + tenant + " doesn't exist!"
 		return(False, message, sanitydata)
@@ -140,6 +323,16 @@ def check_netbox_sanity(args, nb):
 	return(True, message, sanitydata)
 
 
+async def sanity_lookups_async(nb, device, site, model, tenant):
+	async with netbox_async.AsyncNetbox() as anb:
+		return(await asyncio.gather(
+			anb.get(nb.dcim.devices, name__ie=device, site__ie=site),
+			anb.cached_get(nb.dcim.device_types, model__ie=model),
+			anb.cached_get(nb.dcim.sites, name__ie=site),
+			anb.cached_get(nb.tenancy.tenants, name__ie=tenant),
+		))
+
+
 def get_device_info(args):
 	# todo - add more error handling (check if napalm installed, if the driver passed is legit
 
@@ -149,84 +342,79 @@ def get_device_info(args):
 	print("Connecting to " + device + ":", end='')
 	try:
 		driver = napalm.get_network_driver(args['os'])
-		napalmdevice = driver(device, args['username'], args['password'])
-		napalmdevice.open()
+		napalmdevice = sessions.acquire(driver, args['os'], device, args['username'], args['password'])
 	except:
 		print(" ERROR: Can't connect to", device, "for some reason! Check hostname, password, OS")
-		return(False)
+		return(False, {})
 	print(" Done")
 
+	# kept open for the next job when running under netbox-daemon.py, closed otherwise
+	try:
+		status, device_dict = collect_device_info(args, napalmdevice)
+	except Exception:
+		sessions.release(napalmdevice, reusable=False)
+		raise
+	sessions.release(napalmdevice, reusable=status)
+	return(status, device_dict)
 
+
+# run the planned getters (see napalm_getters.py) on an open napalm device
+def collect_device_info(args, napalmdevice):
 	device_dict = {}
 	print("")
 	print("Getting info:", end='')
 
-	try:
-		print(" Facts", end='')
-		facts = napalmdevice.get_facts()
-		device_dict['facts'] = facts
-	except:
-		return(False, device_dict)
-
-
-	try:
-		print(" Interfaces", end='')
-		interfaces = napalmdevice.get_interfaces()
-
-		# use lists for easy comparison
-		interfaces_list = list(interfaces.keys())
-		bad_if_list = config.bad_if_regex
-
-		pattern = re.compile("|".join(bad_if_list), flags=re.IGNORECASE | re.MULTILINE)
-		good_interface_list = [ i for i in interfaces_list if not pattern.match(i) ]
-		bad_interface_list =  [ i for i in interfaces_list if pattern.match(i) ]
-
-		good_interfaces = {}
-		for interface_key, interface_val in interfaces.items():
-			if interface_key in good_interface_list:
-				good_interfaces[interface_key] = interface_val
-
-
-		bad_interfaces = {}
-		for interface_key, interface_val in interfaces.items():
-			if interface_key in bad_interface_list:
-				bad_interfaces[interface_key] = interface_val
-
-
-		device_dict['good_interfaces'] = good_interfaces
-		device_dict['bad_interfaces'] = bad_interfaces
-
-	except:
-		return(False, device_dict)
-
-		
-	try:
-		print(" IPs", end='')
-		ips = napalmdevice.get_interfaces_ip()
-		device_dict['ips'] = ips
-
-	except:
-		return(False, device_dict)
-
-
-	try:
-		print(" BGP", end='')
-		bgp = napalmdevice.get_bgp_neighbors()
-		device_dict['bgp'] = bgp
-	except:
-		device_dict['bgp'] = {}
+	getters = napalm_getters.plan(config, args['os'], args['role'], args.get('getters'))
+	for getter in getters:
+		print(" " + napalm_getters.labels[getter], end='')
+		start = time.perf_counter()
+		try:
+			with metrics.getter(napalm_getters.methods[getter]):
+				result = napalm_getters.run_getter(napalmdevice, getter, napalm_getters.timeout_for(getter))
+		except Exception as e:
+			if isinstance(e, napalm_getters.GetterTimeout):
+				print(" (" + str(e) + ")", end='')
+			if getter in napalm_getters.optional:
+				device_dict[getter] = {}
+				continue
+			return(False, device_dict)
+		print(" (%.1fs)" % (time.perf_counter() - start), end='')
+
+		if getter == 'interfaces':
+			# split in to interfaces to import and ones matching config.bad_if_regex, in one pass
+			classifier = interface_classifier.get_classifier(config, args['os'])
+			good_interfaces = {}
+			bad_interfaces = {}
+			for interface_key, interface_val in result.items():
+				if interface_classifier.classify_interface(classifier, interface_key)['include']:
+					good_interfaces[interface_key] = interface_val
+				else:
+					bad_interfaces[interface_key] = interface_val
+
+			device_dict['good_interfaces'] = good_interfaces
+			device_dict['bad_interfaces'] = bad_interfaces
+		else:
+			device_dict[getter] = result
 
 	print (" Done")
 
 	return (True, device_dict)
 
+# netbox 4.0 renamed a device's device_role field to role
+def role_field(nb):
+	version = sessions.netbox_version(nb)
+	if version is not None and version >= (4, 0):
+		return("role")
+	return("device_role")
+
+
 def create_netbox_device(config, nb, args, device_dict, sanitydata):
 
 	print("")
 	print("Creating netbox device: ", end='')
 	try:
-		role = nb.dcim.device_roles.get(name__ie=args['role'])
-		platform = nb.dcim.platforms.get(name__ie=args['os'])
+		role = netbox_cache.cached_get(nb.dcim.device_roles, name__ie=args['role'])
+		platform = netbox_cache.cached_get(nb.dcim.platforms, name__ie=args['os'])
 	except pynetbox.lib.query.RequestError as e:
 		print(e.error)
 
@@ -237,7 +425,6 @@ def create_netbox_device(config, nb, args, device_dict, sanitydata):
 	create_dict = dict(
 		name =		args['device'],
 		device_type =	sanitydata['model'].id,
-		device_role =	role.id,
 		platform =	platform.id,
 		serial =	device_dict['facts']['serial_number'],
 		tenant =	sanitydata['tenant'].id,
@@ -245,6 +432,7 @@ def create_netbox_device(config, nb, args, device_dict, sanitydata):
 		status =	config.device_status,
 		comments =	"Created " + timestamp + " via import script by " + args['username'],
 	)
+	create_dict[role_field(nb)] =	role.id
 
 	try:
 		result = nb.dcim.devices.create(create_dict)
@@ -255,51 +443,92 @@ def create_netbox_device(config, nb, args, device_dict, sanitydata):
 
 	return(result)
 
-# use this for nonstandard nontemplate interfaces such as vlan
-def add_interfaces(config, nb, args, device_dict, device_result):
 
-	# get existing interfaces from netbox, keep one orig and another a list of strings for easier comparison
+# --sync: the device found by check_netbox_sanity, patched only where it differs from what we'd create
+def sync_netbox_device(config, nb, args, device_dict, sanitydata):
+	device_result = sanitydata['device']
+
+	print("")
+	print("Syncing netbox device: ", end='')
 	try:
-		netbox_interfaces=nb.dcim.interfaces.filter(device_id=device_result.id)
-	except pynetbox.lib.query.RequestError as e:
+		role = netbox_cache.cached_get(nb.dcim.device_roles, name__ie=args['role'])
+		platform = netbox_cache.cached_get(nb.dcim.platforms, name__ie=args['os'])
+	except pynetbox.RequestError as e:
 		print(e.error)
 
+	sync_dict = dict(
+		device_type =	sanitydata['model'].id,
+		platform =	platform.id,
+		serial =	device_dict['facts']['serial_number'],
+		tenant =	sanitydata['tenant'].id,
+		site =		sanitydata['site'].id,
+	)
+	sync_dict[role_field(nb)] =	role.id
+
+	update_dict = changed_fields(device_result, sync_dict)
+	if update_dict:
+		update_device(nb, device_result, update_dict)
+		print("Updated " + ", ".join(sorted(update_dict)), end='')
+	else:
+		print("Unchanged", end='')
+
+	print(" - " + config.netbox_url + "dcim/devices/" + str(device_result.id) + "/")
+
+	return(device_result)
+
+
+# the fields in wanted_dict that differ from a netbox record. serialize() gives ids for nested objects and values for choices
+def changed_fields(record, wanted_dict):
+	current = record.serialize()
+	return({key: val for key, val in wanted_dict.items() if current.get(key) != val})
+
+# the device's interfaces in netbox by name, read once per import and passed to the phases that need them.
+# None if the read failed
+def get_netbox_interfaces(nb, device_result):
+	try:
+		return(netbox_bulk.fetch_all(nb.dcim.interfaces, device_id=device_result.id))
+	except (pynetbox.RequestError, netbox_async.AsyncRequestError) as e:
+		print(e.error)
+		return(None)
+
+
+# use this for nonstandard nontemplate interfaces such as vlan. netbox_interfaces (from get_netbox_interfaces)
+# gets the created ones added
+def add_interfaces(config, nb, args, device_dict, device_result, netbox_interfaces):
+
 	# uses lists to more easily compare
-	netbox_interfaces_list = [str(i) for i in netbox_interfaces]
+	netbox_interfaces_list = list(netbox_interfaces)
 	device_interfaces = list(device_dict['good_interfaces'].keys())
 
 	# compare the two to create a new list of interfaces to add
 	missing_interfaces = list(set(device_interfaces) - set(netbox_interfaces_list))
 	#print(missing_interfaces)
 
-	print("")
-	print("Adding interfaces:", end='')
+	classifier = interface_classifier.get_classifier(config, args['os'])
+	create_list = []
 	for interface in missing_interfaces:
-		interface_type = "other"
-		# map interface types. This almost certainly could get condensed.
-		for platform_key, platform_val in config.interface_map.items():
-			if platform_key == args['os']:
-				for interface_match, netbox_type in platform_val.items():
-					if re.match(interface_match, interface, re.IGNORECASE):
-						interface_type = netbox_type
-						#print(interface_type)
-						# probably a better way to break out of this
-						continue
+		# type from config.interface_map, falls back on "other"
+		interface_type = interface_classifier.interface_type(classifier, interface)
+		create_list.append(dict(
+			device =	device_result.id,
+			name =		interface,
+			type =		interface_type,
+		))
 
+	print("")
+	print("Adding interfaces:", end='')
 
-		try:
-			nb.dcim.interfaces.create(
-				device =	device_result.id,
-				name =		interface,
-				type =		interface_type,
-			)
-			print(" " + interface, end='')
-
-		except pynetbox.lib.query.RequestError as e:
-			print(e.error)
+	# send them all in a few bulk requests instead of one per interface
+	created, failed = netbox_bulk.bulk_create(nb.dcim.interfaces, create_list)
+	for netbox_interface in created:
+		netbox_interfaces[str(netbox_interface)] = netbox_interface
+		print(" " + str(netbox_interface), end='')
 
 	print(" Done")
 
+	for interface, error in failed.items():
+		print("ERROR adding " + interface + ": " + str(error))
+
 	# print out skipped interfaces because why not
 	print("")
 	print("Skipping interfaces:", end='')
@@ -312,7 +541,7 @@ def add_interfaces(config, nb, args, device_dict, device_result):
 
 
 # add IP's to interfaces that we hope already exist
-def update_interfaces(config, nb, args, device_dict, device_result):
+def update_interfaces(config, nb, args, device_dict, device_result, netbox_interfaces):
 
 	device_interfaces={}
 	device_interfaces=device_dict['good_interfaces']
@@ -320,36 +549,82 @@ def update_interfaces(config, nb, args, device_dict, device_result):
 	print("")
 	print("Updating interfaces:", end='')
 
+	# only send the ones that differ from what netbox has
+	update_list = []
+	labels = {}
 	for interface_key, interface_val in device_interfaces.items():
-		try:
-			netbox_interface=nb.dcim.interfaces.get(device_id=device_result.id,name=interface_key)
-		except pynetbox.lib.query.RequestError as e:
-			print(e.error)
+		netbox_interface = netbox_interfaces.get(interface_key)
+		if netbox_interface is None:
+			continue
 
 		update_dict = {}
-		update_dict = dict(
-			enabled 	= interface_val['is_enabled'],
-			description	= interface_val['description'],
-		)
-		try:
-			netbox_interface.update(update_dict)
-			print(" " + interface_key,  end='')
+		if netbox_interface.enabled != interface_val['is_enabled']:
+			update_dict['enabled'] = interface_val['is_enabled']
+		if (netbox_interface.description or "") != interface_val['description']:
+			update_dict['description'] = interface_val['description']
 
-		except pynetbox.lib.query.RequestError as e:
-			print(e.error)
+		if update_dict:
+			update_dict['id'] = netbox_interface.id
+			update_list.append(update_dict)
+			labels[netbox_interface.id] = interface_key
+
+	updated, failed = netbox_bulk.bulk_update(nb.dcim.interfaces, update_list, labels)
+	for netbox_interface in updated:
+		print(" " + str(netbox_interface), end='')
 
 	print(" Done")
 
+	for interface, error in failed.items():
+		print("ERROR updating " + interface + ": " + str(error))
+
 	return()
 
-def bad_ip_check(config, ip_check):
-	for bad_net in config.bad_ip:
-		if ip_address(ip_check) in ip_network(bad_net):
-			return(True)
-	return(False)
+# --prune: delete interfaces in netbox that the device doesn't have at all. skipped ones (config.bad_if_regex) are still on the device, so they stay
+def prune_interfaces(config, nb, args, device_dict, device_result, netbox_interfaces):
+	print("")
+	print("Deleting interfaces no longer on the device:", end='')
+
+	device_interfaces = set(device_dict['good_interfaces']) | set(device_dict['bad_interfaces'])
+	stale_interfaces = [i for name, i in netbox_interfaces.items() if name not in device_interfaces]
+
+	deleted, failed = netbox_bulk.bulk_delete(nb.dcim.interfaces, stale_interfaces)
+	for netbox_interface in deleted:
+		print(" " + str(netbox_interface), end='')
+
+	print(" Done")
+
+	for interface, error in failed.items():
+		print("ERROR deleting " + interface + ": " + str(error))
+
+	return(True)
+
+
+# --prune: delete IPs assigned to the device in netbox that aren't configured on it any more
+def prune_ips(config, nb, args, device_dict, device_result):
+	print("")
+	print("Deleting IP addresses no longer on the device:", end='')
+
+	device_hosts = set(str(ip_address(ip_key)) for interface_val in device_dict['ips'].values() for family_value in interface_val.values() for ip_key in family_value)
+	try:
+		stale_ips = [i for i in netbox_bulk.fetch_records(nb.ipam.ip_addresses, device_id=device_result.id) if address_host(i.address) not in device_hosts]
+	except (pynetbox.RequestError, netbox_async.AsyncRequestError) as e:
+		print(e.error)
+		return(False)
+
+	deleted, failed = netbox_bulk.bulk_delete(nb.ipam.ip_addresses, stale_ips)
+	for netbox_ip in deleted:
+		print(" " + str(netbox_ip), end='')
+
+	print(" Done")
+
+	for address, error in failed.items():
+		print("ERROR deleting " + address + ": " + str(error))
+
+	return(True)
 
 
-def add_ips(config, nb, args, device_dict, device_result, sanitydata):
+# netbox_interfaces as from get_netbox_interfaces, read here if it's None (interfaces weren't collected)
+def add_ips(config, nb, args, device_dict, device_result, sanitydata, netbox_interfaces=None):
 	# dealing with something like:
 	#(
 	#   "Vlan3000",
@@ -367,7 +642,36 @@ def add_ips(config, nb, args, device_dict, device_result, sanitydata):
 
 	print("")
 	print("Adding IP addresses:", end='')
-	for interface_key, interface_val in device_dict['ips'].items():
+
+	# drop everything in config.bad_ip in one pass
+	good_ips, bad_ips = ip_filter.filter_interfaces_ip(bad_ip_ranges, device_dict['ips'])
+	hosts = [str(ip_address(ip_key)) for interface_val in good_ips.values() for family_value in interface_val.values() for ip_key in family_value]
+
+	# read any of these IPs that already exist (and the interfaces if we don't have them) up front, instead of
+	# queries per address. interfaces are looked up by lower case name
+	read_interfaces = netbox_interfaces is None
+	try:
+		bundle = netbox_graphql.fetch_device(nb, device_result.id, addresses=hosts)
+		if bundle is not None:
+			interface_list = bundle['interfaces']
+			existing_ips = {}
+			for netbox_ip in bundle['ip_addresses']:
+				existing_ips.setdefault(address_host(netbox_ip.address), netbox_ip)
+		elif netbox_async.enabled():
+			interface_list, existing_ips = netbox_async.run(add_ips_lookups_async(config, nb, device_result, hosts, read_interfaces))
+		else:
+			interface_list = netbox_bulk.fetch_records(nb.dcim.interfaces, device_id=device_result.id) if read_interfaces else None
+			existing_ips = get_existing_ips(config, nb, hosts)
+	except (pynetbox.RequestError, netbox_async.AsyncRequestError) as e:
+		print(e.error)
+		return(False)
+	if read_interfaces:
+		netbox_interfaces = {str(i): i for i in interface_list}
+	netbox_interfaces = {name.lower(): i for name, i in netbox_interfaces.items()}
+
+	classifier = interface_classifier.get_classifier(config, args['os'])
+	wanted_ips = []
+	for interface_key, interface_val in good_ips.items():
 		interface_key = interface_key.lower()
 		for family_key, family_value in interface_val.items():
 			for ip_key, ip_val in family_value.items():
@@ -375,84 +679,125 @@ def add_ips(config, nb, args, device_dict, device_result, sanitydata):
 				address = ip_key + "/" + str(ip_val['prefix_length'])
 				description = device_result.name + " " + interface_key
 
-				# check if this is in bad_ip list
-				if not bad_ip_check(config, ip_key):
-
-					print(" " + address, end='')
-
-					# get interface associated with this IP
-					try:
-						netbox_interface=nb.dcim.interfaces.get(device_id=device_result.id, name__ie=interface_key)
-					except pynetbox.lib.query.RequestError as e:
-						print(e.error)
-
-					ip_dict = {}
-					ip_dict = dict(
-						# api change in 2.9.0 - https://github.com/netbox-community/netbox/releases/tag/v2.9.0
-						#interface =		netbox_interface.id,
-						assigned_object_id =	netbox_interface.id,
-						assigned_object_type =	"dcim.interface",
-						address =		address,
-						status =		config.ip_status,
-						tenant =		netbox_tenant.id,
-						description =		description,
-					)
-
-					interface_role = ""
-					# todo: support more interface_roles and loop through them, even if it's only one item
-					if re.search(config.interface_roles['loopback'], interface_key, re.IGNORECASE):
-						interface_role = "loopback"
-						ip_dict['role'] = interface_role
-
-					#Check if IP already exists, if so update it. if not, add it.
-					try:
-						netbox_ip = nb.ipam.ip_addresses.get(q=address)
-					except pynetbox.lib.query.RequestError as e:
-						print(e.error)
-
-					if netbox_ip:
-						print(" (updated)", end='')
-						try:
-							netbox_ip.update(ip_dict)
-						except pynetbox.lib.query.RequestError as e:
-							print(e.error)
-
-					else:
-						try:
-							netbox_ip = nb.ipam.ip_addresses.create(ip_dict)
-						except pynetbox.lib.query.RequestError as e:
-							print(e.error)
-
-					# do this after the ip is created
-					if interface_role == "loopback":
-						try:
-							device_role = nb.dcim.device_roles.get(name__ie=args['role'])
-						except pynetbox.lib.query.RequestError as e:
-							print(e.error)
-
-						update_dict = {}
-						update_dict = dict(
-							device_type =	sanitydata['model'].id,
-							device_role =	device_role,
-							site =		sanitydata['site'].id,
-						)
-						if family_key == "ipv4":
-							update_dict['primary_ip4'] =	netbox_ip.id
-
-						if family_key == "ipv6":
-							update_dict['primary_ip6'] =	netbox_ip.id
-
-						update_device(nb, device_result, update_dict)
-						print(" (primary)", end='')
+				# get interface associated with this IP
+				netbox_interface = netbox_interfaces.get(interface_key)
+				if netbox_interface is None:
+					print(" " + address + " (no interface " + interface_key + ")", end='')
+					continue
+
+				ip_dict = {}
+				ip_dict = dict(
+					# api change in 2.9.0 - https://github.com/netbox-community/netbox/releases/tag/v2.9.0
+					#interface =		netbox_interface.id,
+					assigned_object_id =	netbox_interface.id,
+					assigned_object_type =	"dcim.interface",
+					address =		address,
+					status =		config.ip_status,
+					tenant =		netbox_tenant.id,
+					description =		description,
+				)
+
+				if interface_classifier.interface_role(classifier, interface_key) == "loopback":
+					ip_dict['role'] = "loopback"
+
+				wanted_ips.append((family_key, str(ip_address(ip_key)), ip_dict))
+
+	#Check if IPs already exist, if so update them. if not, add them.
+	create_list = []
+	update_list = []
+	labels = {}
+	for family_key, host, ip_dict in wanted_ips:
+		print(" " + ip_dict['address'], end='')
+		netbox_ip = existing_ips.get(host)
+		if netbox_ip:
+			# only send what differs, so re-running against an unchanged device writes nothing
+			update_dict = changed_fields(netbox_ip, ip_dict)
+			if update_dict:
+				print(" (updated)", end='')
+				update_list.append(dict(update_dict, id=netbox_ip.id))
+				labels[netbox_ip.id] = ip_dict['address']
+		else:
+			create_list.append(ip_dict)
+
+	created, failed = netbox_bulk.bulk_create(nb.ipam.ip_addresses, create_list, key='address')
+	updated, update_failed = netbox_bulk.bulk_update(nb.ipam.ip_addresses, update_list, labels)
+	failed.update(update_failed)
+
+	# ids of everything we now have in netbox, by host address
+	ip_ids = {host: netbox_ip.id for host, netbox_ip in existing_ips.items()}
+	for netbox_ip in created:
+		ip_ids[address_host(netbox_ip.address)] = netbox_ip.id
+
+	# loopbacks become the device's primary IPs, sent as one device update at the end
+	update_dict = {}
+	for family_key, host, ip_dict in wanted_ips:
+		if ip_dict.get('role') == "loopback" and host in ip_ids:
+			if family_key == "ipv4":
+				update_dict['primary_ip4'] =	ip_ids[host]
+
+			if family_key == "ipv6":
+				update_dict['primary_ip6'] =	ip_ids[host]
+
+	# already set when syncing an existing device
+	update_dict = changed_fields(device_result, update_dict)
+	if update_dict:
+		try:
+			device_role = netbox_cache.cached_get(nb.dcim.device_roles, name__ie=args['role'])
+		except pynetbox.lib.query.RequestError as e:
+			print(e.error)
+
+		update_dict['device_type'] =	sanitydata['model'].id
+		update_dict[role_field(nb)] =	device_role.id
+		update_dict['site'] =		sanitydata['site'].id
+
+		update_device(nb, device_result, update_dict)
+		print(" (primary)", end='')
 
 	print(" Done")
+
+	for address, error in failed.items():
+		print("ERROR adding " + address + ": " + str(error))
+
 	return(True)
 
 
+# strip the mask from a netbox address and normalize it so v6 addresses compare the same as napalm's
+def address_host(address):
+	return(str(ip_address(str(address).split("/")[0])))
+
+
+# look up many addresses with a few filter requests instead of one per address. returns host -> netbox ip
+def get_existing_ips(config, nb, hosts):
+	existing_ips = {}
+	for chunk in netbox_bulk.chunked(hosts, config.bulk_filter_size):
+		try:
+			for netbox_ip in nb.ipam.ip_addresses.filter(address=chunk):
+				existing_ips.setdefault(address_host(netbox_ip.address), netbox_ip)
+		except pynetbox.lib.query.RequestError as e:
+			print(e.error)
+	return(existing_ips)
+
+
+# the IPs by host (and the device's interfaces with read_interfaces, otherwise None) at once
+async def add_ips_lookups_async(config, nb, device_result, hosts, read_interfaces=True):
+	async with netbox_async.AsyncNetbox() as anb:
+		lookups = [anb.filter(nb.ipam.ip_addresses, address=chunk) for chunk in netbox_bulk.chunked(hosts, config.bulk_filter_size)]
+		if read_interfaces:
+			lookups.append(anb.filter(nb.dcim.interfaces, device_id=device_result.id))
+		results = await asyncio.gather(*lookups)
+
+	interface_list = results.pop() if read_interfaces else None
+	existing_ips = {}
+	for chunk in results:
+		for netbox_ip in chunk:
+			existing_ips.setdefault(address_host(netbox_ip.address), netbox_ip)
+	return(interface_list, existing_ips)
+
+
 def update_device(nb, device_result, update_dict):
+	# device_result is the record we created, no need to fetch it again before patching
 	try:
-		device = nb.dcim.devices.get(device_result.id)
-		device.update(update_dict)
+		device_result.update(update_dict)
 	except pynetbox.lib.query.RequestError as e:
 		print(e.error)
 	return()
@@ -463,11 +808,61 @@ def update_ip(nb, device_result, update_dict):
 	return()
 
 
-def update_prefix(nb, device_result, update_dict):
-	# placeholder, perhaps take this opportunity to fix site/tenant on prefixes, which are the direct parent of IPs discovered?
-	# it's not easy to find direct parent prefix, if we do this we'd have to iterate through all parents and find the ones with the most specific?
-	# also this makes sense for members conenctions, but probably not hubs
-	return()
+# fill in site/tenant on prefixes that are the direct (most specific) parent of the device's IPs. all global
+# prefixes with no site or this site are read once and put in a radix tree, instead of a ?contains= per IP.
+# only fills what's empty so prefixes shared with other sites (hubs) are left alone, and skips loopbacks
+# (usually from a pool) and container prefixes
+def update_prefix(config, nb, args, device_dict, device_result, sanitydata):
+	print("")
+	print("Updating prefixes:", end='')
+
+	good_ips, bad_ips = ip_filter.filter_interfaces_ip(bad_ip_ranges, device_dict['ips'])
+	classifier = interface_classifier.get_classifier(config, args['os'])
+	hosts = []
+	for interface_key, interface_val in good_ips.items():
+		if interface_classifier.interface_role(classifier, interface_key.lower()) == "loopback":
+			continue
+		hosts.extend(ip_key for family_value in interface_val.values() for ip_key in family_value)
+
+	if not hosts:
+		print(" Done")
+		return(True)
+
+	netbox_site = sanitydata['site']
+	netbox_tenant = sanitydata['tenant']
+	try:
+		netbox_prefixes = netbox_bulk.fetch_records(nb.ipam.prefixes, vrf_id="null", site_id=[netbox_site.id, "null"])
+	except (pynetbox.RequestError, netbox_async.AsyncRequestError) as e:
+		print(e.error)
+		return(False)
+
+	tree = prefix_tree.build_tree((str(netbox_prefix.prefix), netbox_prefix) for netbox_prefix in netbox_prefixes)
+
+	parents = {}
+	for host in hosts:
+		netbox_prefix = prefix_tree.longest_match(tree, host)
+		if netbox_prefix is not None and getattr(netbox_prefix.status, 'value', None) != "container":
+			parents[netbox_prefix.id] = netbox_prefix
+
+	update_list = []
+	labels = {}
+	for netbox_prefix in parents.values():
+		update_dict = {}
+		if netbox_prefix.site is None:
+			update_dict['site'] = netbox_site.id
+		if netbox_prefix.tenant is None and netbox_tenant is not None:
+			update_dict['tenant'] = netbox_tenant.id
+		if update_dict:
+			print(" " + str(netbox_prefix.prefix), end='')
+			update_list.append(dict(update_dict, id=netbox_prefix.id))
+			labels[netbox_prefix.id] = str(netbox_prefix.prefix)
+
+	updated, failed = netbox_bulk.bulk_update(nb.ipam.prefixes, update_list, labels)
+	print(" Done")
+
+	for prefix, error in failed.items():
+		print("ERROR updating " + prefix + ": " + str(error))
+	return(True)
 
 
 def prettyprint(dict):
@@ -487,43 +882,214 @@ def pretty_summary(args):
 	print("")
 	return()
 
-# main stuff. probs move this to a __main__ function?
-
-args = parse_cli_args()
+# run the whole import for a single device. returns (True/False, message) instead of exiting so it can be used for many devices
+def import_device(args, nb):
+	# the snapshot first, it can have the arguments the sanity checks need
+	if args.get('from_snapshot') is not None:
+		print("Loading snapshot " + args['from_snapshot'] + ":", end='')
+		try:
+			with metrics.phase("load_snapshot"):
+				if args.get('snapshot_data') is None:
+					args['snapshot_data'] = snapshot.load_snapshot(args['from_snapshot'])
+				snapshot_args, device_dict = args['snapshot_data']
+		except (OSError, ValueError) as e:
+			print(" ERROR")
+			return(False, "Couldn't load snapshot " + args['from_snapshot'] + ": " + str(e))
+		fill_snapshot_args(args, snapshot_args)
+		print(" Done")
+		print("")
 
-pretty_summary(args)
+	metrics.labels['device'] = args['device']
 
+	#do some super basic checks with netbox API based on CLI args before even logging in to a device
+	with metrics.phase("check_netbox_sanity"):
+		sanity, message, sanitydata = check_netbox_sanity(args, nb)
+	print(message)
+	if sanity == False:
+		return(False, message)
 
+	if args.get('from_snapshot') is None:
+		with metrics.phase("get_device_info"):
+			devicestatus, device_dict = get_device_info(args)
+		if devicestatus == False:
+			return(False, "Couldn't get info from " + args['device'])
 
-#connect to netbox api
-nb = pynetbox.api(config.netbox_url, config.netbox_api_token)
+	if args.get('save_snapshot') is not None:
+		path = snapshot.save_snapshot(snapshot.snapshot_path(args['save_snapshot'], args['device']), args, device_dict)
+		print("")
+		print("Saved snapshot: " + path)
 
-#do some super basic checks with netbox API based on CLI args before even logging in to a device
-sanity, message, sanitydata = check_netbox_sanity(args, nb)
-if sanity == False:
-	print(message)
-	sys.exit(1)
-else: 
-	print(message)
-	devicestatus, device_dict = get_device_info(args)
+	#prettyprint(device_dict['facts'])
+	if 'device' in sanitydata:
+		with metrics.phase("sync_netbox_device"):
+			device_result = sync_netbox_device(config, nb, args, device_dict, sanitydata)
+	else:
+		with metrics.phase("create_netbox_device"):
+			device_result = create_netbox_device(config, nb, args, device_dict, sanitydata)
+	#print(device_result)
+
+	# phases only run if their getters did (see napalm_getters.py)
+	collected_interfaces = 'good_interfaces' in device_dict
+	collected_ips = 'ips' in device_dict
+	skipped = [name for name, collected in [("interfaces", collected_interfaces), ("IPs", collected_ips)] if not collected]
+	if skipped:
+		print("")
+		print("Not collected, leaving alone in netbox: " + ", ".join(skipped))
 
-	if devicestatus == True:
-		#prettyprint(device_dict['facts'])
-		device_result = create_netbox_device(config, nb, args, device_dict, sanitydata)
-		#print(device_result)
+	# read once for all the phases below, add_interfaces adds the ones it creates
+	netbox_interfaces = None
+	if collected_interfaces:
+		with metrics.phase("get_interfaces"):
+			netbox_interfaces = get_netbox_interfaces(nb, device_result)
+		if netbox_interfaces is None:
+			return(False, "Couldn't read the interfaces of " + args['device'] + " from netbox")
 
 		# add interfaces
-		add_interfaces_result = add_interfaces(config, nb, args, device_dict, device_result)
+		with metrics.phase("add_interfaces"):
+			add_interfaces_result = add_interfaces(config, nb, args, device_dict, device_result, netbox_interfaces)
 		#print(add_interfaces_result)
 
 		# update interfaces
-		update_interfaces_result = update_interfaces(config, nb, args, device_dict, device_result)
+		with metrics.phase("update_interfaces"):
+			update_interfaces_result = update_interfaces(config, nb, args, device_dict, device_result, netbox_interfaces)
 		#print(update_interfaces_result)
 
+	if collected_ips:
 		# add ip addresses to interfaces
-		ips_result = add_ips(config, nb, args, device_dict, device_result, sanitydata)
+		with metrics.phase("add_ips"):
+			ips_result = add_ips(config, nb, args, device_dict, device_result, sanitydata, netbox_interfaces)
 		#print(ips_result)
 
-		print("")
+		if config.update_prefixes:
+			with metrics.phase("update_prefix"):
+				update_prefix(config, nb, args, device_dict, device_result, sanitydata)
+
+	# ips first, deleting an interface would unassign its ips and we'd no longer find them
+	if args.get('prune'):
+		with metrics.phase("prune"):
+			if collected_ips:
+				prune_ips(config, nb, args, device_dict, device_result)
+			if collected_interfaces:
+				prune_interfaces(config, nb, args, device_dict, device_result, netbox_interfaces)
+
+	return(True, config.netbox_url + "dcim/devices/" + str(device_result.id) + "/")
+
+
+# runs in its own process for -f. output is buffered and handed back so devices don't print over each other
+def import_worker(args, results):
+	metrics.forked()
+	sessions.forked()
+	sys.stdout = io.StringIO()
+	try:
+		nb = sessions.netbox()
+		status, message = import_device(args, nb)
+	except Exception as e:
+		status, message = False, "ERROR: " + type(e).__name__ + ": " + str(e)
+	output = sys.stdout.getvalue()
+	sys.stdout = sys.__stdout__
+
+	# one json line per device from here, the totals go back to the parent for the textfile
+	data = metrics.snapshot()
+	metrics.write_jsonl("device-to-netbox", status, data)
+	results.send((status, message, output, data))
+	results.close()
+
+
+def import_fleet(args, inventory):
+	# processes instead of threads so a hung device can actually be killed once it hits --timeout. each has
+	# its own pipe back, so killing one can't leave a shared queue locked for the others
+	summary = {}
+	running = {}
+	pending = list(enumerate(inventory))
+
+	print("Importing " + str(len(inventory)) + " devices, " + str(args['workers']) + " at a time")
+
+	while pending or running:
+		while pending and len(running) < args['workers']:
+			index, device_args = pending.pop(0)
+			reader, writer = multiprocessing.Pipe(duplex=False)
+			process = multiprocessing.Process(target=import_worker, args=(device_args, writer))
+			process.start()
+			# the child has its own copy, so the reader sees EOF if it dies without sending
+			writer.close()
+			running[index] = (process, time.time(), reader)
+
+		readers = {reader: index for index, (process, started, reader) in running.items()}
+		for reader in multiprocessing.connection.wait(list(readers), timeout=1):
+			index = readers[reader]
+			process = running[index][0]
+			try:
+				status, message, output, data = reader.recv()
+			except EOFError:
+				process.join()
+				summary[index] = (False, "Import process died with exit code " + str(process.exitcode))
+			else:
+				summary[index] = (status, message)
+				metrics.merge(data)
+				print("")
+				print("==== " + inventory_name(inventory[index]) + " ====")
+				print(output, end='')
+
+		for index, (process, started, reader) in list(running.items()):
+			if index in summary:
+				process.join()
+				reader.close()
+				del running[index]
+			elif time.time() - started > args['timeout']:
+				process.terminate()
+				process.join()
+				reader.close()
+				summary[index] = (False, "Timed out after " + str(args['timeout']) + " seconds, device may be partially imported")
+				del running[index]
+
+	print("")
+	print("Import summary:")
+	print("")
+	failed = 0
+	for index, device_args in enumerate(inventory):
+		status, message = summary[index]
+		if status == False:
+			failed += 1
+		print("\t" + inventory_name(device_args) + "\t" + ("OK" if status else "FAILED") + "\t" + message)
+	print("")
+	print(str(len(inventory) - failed) + " succeeded, " + str(failed) + " failed")
+	print("")
+
+	return(failed == 0)
+
+
+def main():
+	args = parse_cli_args()
+
+	if args['refresh_cache']:
+		netbox_cache.invalidate(config.netbox_url)
+
+	if args['file'] is not None or (args['from_snapshot'] is not None and snapshot.is_snapshot_dir(args['from_snapshot'])):
+		if args['file'] is not None:
+			inventory = read_inventory(args)
+		else:
+			inventory = read_snapshot_inventory(args)
+		metrics.labels['devices'] = len(inventory)
+		if import_fleet(args, inventory) == False:
+			sys.exit(1)
+		return()
+
+	pretty_summary(args)
+
+	#connect to netbox api
+	nb = sessions.netbox()
+
+	status, message = import_device(args, nb)
+	if status == False:
+		sys.exit(1)
+
+	print("")
+	if args['sync']:
+		print("Device synced successfully.")
+	else:
 		print("Device added successfully.")
-		print("")
+	print("")
+
+
+if __name__ == "__main__":
+	metrics.run("device-to-netbox", main)
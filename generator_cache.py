@@ -0,0 +1,119 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	fetches rendered configs from config.generator_url for netbox-to-device.py. one requests session is
+#	shared by everything in the process (keep-alive, gzip), and the last config seen for each device is
+#	kept in the sqlite cache_file along with its ETag/Last-Modified. the generator is asked with
+#	If-None-Match/If-Modified-Since and a 304 reuses the cached copy instead of downloading it again.
+#	within config.generator_cache_ttl seconds the cached copy is used without asking at all, but only for
+#	the login that fetched it. anyone else still has to get past the generator's auth first.
+
+from contextlib import closing
+import hashlib
+import lazy_modules
+import os
+import threading
+import time
+import config as config
+import metrics
+import netbox_cache
+
+requests =	lazy_modules.load("requests")
+
+## see config.py for config
+
+session = None
+session_lock = threading.Lock()
+
+
+# one pooled session per process, sized for the batch push workers
+def get_session():
+	global session
+	with session_lock:
+		if session is None:
+			session = requests.Session()
+			adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(config.push_workers, 1))
+			session.mount("http://", adapter)
+			session.mount("https://", adapter)
+			session.headers['Accept-Encoding'] = "gzip, deflate"
+			session.hooks['response'].append(metrics.response_hook)
+	return(session)
+
+
+# same sqlite file as netbox_cache, own table. configs have secrets in them so only we can read it
+def connect():
+	connection = netbox_cache.connect()
+	os.chmod(os.path.expanduser(config.cache_file), 0o600)
+	connection.execute("CREATE TABLE IF NOT EXISTS generator (url TEXT PRIMARY KEY, stored REAL, etag TEXT, last_modified TEXT, body TEXT, login TEXT)")
+	# cache files from before logins were stored. their rows have none, so they're always revalidated
+	if 'login' not in [row[1] for row in connection.execute("PRAGMA table_info(generator)")]:
+		connection.execute("ALTER TABLE generator ADD COLUMN login TEXT")
+	return(connection)
+
+
+# who fetched a cached config, without keeping the password itself
+def login_key(auth):
+	return(hashlib.sha256("\n".join(str(part) for part in auth or ()).encode()).hexdigest())
+
+
+def load(url):
+	if not config.generator_cache:
+		return(None)
+	with closing(connect()) as connection:
+		row = connection.execute("SELECT stored, etag, last_modified, body, login FROM generator WHERE url = ?", (url,)).fetchone()
+	if row is None:
+		return(None)
+	return(dict(stored=row[0], etag=row[1], last_modified=row[2], body=row[3], login=row[4]))
+
+
+def store(url, etag, last_modified, body, login):
+	if not config.generator_cache:
+		return()
+	with closing(connect()) as connection:
+		with connection:
+			connection.execute("INSERT OR REPLACE INTO generator (url, stored, etag, last_modified, body, login) VALUES (?, ?, ?, ?, ?, ?)", (url, time.time(), etag, last_modified, body, login))
+	return()
+
+
+# GET a generator url. returns (http status, config text), a 304 comes back as 200 with the cached text.
+# connection problems raise requests.exceptions.RequestException like requests.get
+def fetch(url, auth):
+	login = login_key(auth)
+	cached = load(url)
+	if cached is not None and cached['login'] == login and time.time() - cached['stored'] < config.generator_cache_ttl:
+		return(200, cached['body'])
+
+	headers = {}
+	if cached is not None:
+		if cached['etag']:
+			headers['If-None-Match'] = cached['etag']
+		if cached['last_modified']:
+			headers['If-Modified-Since'] = cached['last_modified']
+
+	response = get_session().get(url, auth=auth, headers=headers, timeout=config.request_timeout)
+
+	if response.status_code == 304 and cached is not None:
+		store(url, cached['etag'], cached['last_modified'], cached['body'], login)
+		return(200, cached['body'])
+
+	if response.status_code == 200:
+		etag = response.headers.get('ETag')
+		last_modified = response.headers.get('Last-Modified')
+		# nothing to revalidate with, only worth keeping if the ttl lets us skip asking
+		if etag or last_modified or config.generator_cache_ttl > 0:
+			store(url, etag, last_modified, response.text, login)
+
+	return(response.status_code, response.text)
+
+
+# drop cached configs for a generator (or all of them if url is None)
+def invalidate(url=None):
+	with closing(connect()) as connection:
+		with connection:
+			if url is None:
+				connection.execute("DELETE FROM generator")
+			else:
+				# a plain prefix, LIKE would take _ and % in the url as wildcards
+				connection.execute("DELETE FROM generator WHERE substr(url, 1, length(?)) = ?", (url, url))
+	return()
@@ -0,0 +1,88 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	classify device interfaces in one pass using config.bad_if_regex, config.interface_map and config.interface_roles:
+#	whether to import it, which netbox interface type it gets and which role (ie loopback) it has.
+#	the regex lists are compiled once per os, and type lookups are remembered per interface name prefix.
+
+import re
+
+# name up to the first digit, ie 'ge-' for ge-0/0/0.100 or 'GigabitEthernet' for GigabitEthernet0/1
+name_prefix_regex = re.compile(r'^[^0-9]*')
+
+# a plain prefix with no digits or regex characters, ie 'ge-' or 'port-channel'
+literal_regex = re.compile(r'^[A-Za-z_ -]+$')
+
+classifiers = {}
+
+
+# build (or reuse) the classifier for one os
+def get_classifier(config, os):
+	if os not in classifiers:
+		classifiers[os] = compile_classifier(config, os)
+	return(classifiers[os])
+
+
+def compile_classifier(config, os):
+	bad_regex = re.compile("|".join(config.bad_if_regex), flags=re.IGNORECASE | re.MULTILINE)
+
+	# one alternation with a group per interface_map entry. the first entry that matches wins
+	type_map = config.interface_map.get(os, {})
+	type_names = list(type_map.values())
+	type_regex = None
+	if type_map:
+		type_regex = re.compile("|".join("(?P<t" + str(index) + ">" + pattern + ")" for index, pattern in enumerate(type_map)), flags=re.IGNORECASE)
+
+	roles = [(role, re.compile(pattern, flags=re.IGNORECASE)) for role, pattern in config.interface_roles.items()]
+
+	classifier = dict(
+		bad_regex =	bad_regex,
+		type_regex =	type_regex,
+		type_names =	type_names,
+		roles =		roles,
+		# only safe to remember types per name prefix when every pattern is a plain prefix without digits
+		prefix_cache =	{} if all(literal_regex.match(pattern) for pattern in type_map) else None,
+	)
+	return(classifier)
+
+
+def interface_type(classifier, name):
+	if classifier['type_regex'] is None:
+		return("other")
+
+	prefix_cache = classifier['prefix_cache']
+	if prefix_cache is not None:
+		prefix = name_prefix_regex.match(name).group(0).lower()
+		if prefix in prefix_cache:
+			return(prefix_cache[prefix])
+
+	match = classifier['type_regex'].match(name)
+	if match:
+		found_type = classifier['type_names'][int(match.lastgroup[1:])]
+	else:
+		found_type = "other"
+
+	if prefix_cache is not None:
+		prefix_cache[prefix] = found_type
+	return(found_type)
+
+
+def interface_role(classifier, name):
+	for role, regex in classifier['roles']:
+		if regex.search(name):
+			return(role)
+	return(None)
+
+
+def classify_interface(classifier, name):
+	return(dict(
+		include =	classifier['bad_regex'].match(name) is None,
+		type =		interface_type(classifier, name),
+		role =		interface_role(classifier, name),
+	))
+
+
+# one pass over a napalm get_interfaces() dict (or any iterable of names). returns name -> classification
+def classify_interfaces(classifier, interfaces):
+	return({name: classify_interface(classifier, name) for name in interfaces})
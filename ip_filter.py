@@ -0,0 +1,58 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	fast matching of addresses against a list of networks, ie config.bad_ip.
+#	networks are turned in to sorted, merged integer ranges per address family once,
+#	then each lookup is a binary search instead of parsing and scanning the whole list.
+
+from bisect import bisect_right
+from ipaddress import ip_address, ip_network
+
+
+# returns {4: (starts, ends), 6: (starts, ends)} with overlapping/adjacent networks merged
+def compile_ip_ranges(networks):
+	ranges = {4: [], 6: []}
+	for network in networks:
+		network = ip_network(network, strict=False)
+		ranges[network.version].append((int(network.network_address), int(network.broadcast_address)))
+
+	compiled = {}
+	for version, version_ranges in ranges.items():
+		starts = []
+		ends = []
+		for start, end in sorted(version_ranges):
+			if ends and start <= ends[-1] + 1:
+				ends[-1] = max(ends[-1], end)
+			else:
+				starts.append(start)
+				ends.append(end)
+		compiled[version] = (starts, ends)
+
+	return(compiled)
+
+
+def ip_in_ranges(compiled, address):
+	# takes a string or an ip_address()
+	if isinstance(address, str):
+		address = ip_address(address)
+	starts, ends = compiled[address.version]
+	address = int(address)
+	index = bisect_right(starts, address) - 1
+	return(index >= 0 and address <= ends[index])
+
+
+# filter a napalm get_interfaces_ip() result in one pass. returns (good, bad) in the same shape as the input
+def filter_interfaces_ip(compiled, interfaces_ip):
+	good = {}
+	bad = {}
+	for interface_key, interface_val in interfaces_ip.items():
+		for family_key, family_value in interface_val.items():
+			for ip_key, ip_val in family_value.items():
+				if ip_in_ranges(compiled, ip_key):
+					target = bad
+				else:
+					target = good
+				target.setdefault(interface_key, {}).setdefault(family_key, {})[ip_key] = ip_val
+
+	return(good, bad)
@@ -0,0 +1,37 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	heavy dependencies (napalm pulls in every driver plus paramiko, netmiko, ncclient and junos-eznc, then
+#	pynetbox, requests, aiohttp, colorama) are only really imported the first time something is used from
+#	them, so --help, bad arguments and runs that stop at a netbox check don't pay seconds of import time.
+#
+#	napalm = lazy_modules.load("napalm") gives a module object that imports itself on first attribute access.
+#	only top level packages, find_spec on a submodule would import its parent.
+
+import importlib.util
+import sys
+
+
+# a lazily imported module, the real one if it's already imported, or None if it isn't installed
+def load(name):
+	if name in sys.modules:
+		return(sys.modules[name])
+
+	spec = importlib.util.find_spec(name)
+	if spec is None:
+		return(None)
+
+	loader = importlib.util.LazyLoader(spec.loader)
+	spec.loader = loader
+	module = importlib.util.module_from_spec(spec)
+	sys.modules[name] = module
+	loader.exec_module(module)
+	return(module)
+
+
+# import it now. LazyLoader isn't thread safe before python 3.12, so do this before starting threads
+def ready(module):
+	if module is not None:
+		getattr(module, "__dict__")
+	return(module)
@@ -0,0 +1,204 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	timing and api call metrics for the scripts: wall time per phase and per napalm getter, and count,
+#	time, bytes and errors of http requests per method + netbox endpoint. written at the end of a run as a
+#	json line (config.metrics_jsonl) and/or a prometheus textfile collector file (config.metrics_textfile_dir)
+#	so cron/automation runs can be graphed and alerted on.
+
+from contextlib import contextmanager
+import datetime
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse
+import config as config
+
+## see config.py for config
+
+phases =	{}
+getters =	{}
+http =		{}
+labels =	{}
+
+# requests are recorded from pynetbox's page threads and the push workers at the same time
+lock = threading.Lock()
+
+# /api/dcim/interfaces/123/ -> dcim/interfaces
+endpoint_regex = re.compile(r'^/api/(?P<endpoint>[^?]*?)/?(?:[0-9]+/?)?$')
+
+
+@contextmanager
+def phase(name):
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		seconds = time.perf_counter() - start
+		with lock:
+			phases[name] = phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def getter(name):
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		seconds = time.perf_counter() - start
+		with lock:
+			getters[name] = getters.get(name, 0.0) + seconds
+
+
+def endpoint_name(url):
+	path = urlparse(url).path
+	match = endpoint_regex.match(path)
+	if match:
+		return(match.group('endpoint'))
+	return(path)
+
+
+def record_request(method, url, status, seconds, size):
+	key = (method.upper(), endpoint_name(url))
+	with lock:
+		entry = http.setdefault(key, dict(count=0, seconds=0.0, bytes=0, errors=0))
+		entry['count'] += 1
+		entry['seconds'] += seconds
+		entry['bytes'] += size
+		if status is None or status >= 400:
+			entry['errors'] += 1
+
+
+# requests response hook, ie requests.get(url, hooks={'response': metrics.response_hook})
+def response_hook(response, *args, **kwargs):
+	body = response.request.body or b""
+	record_request(response.request.method, response.url, response.status_code, response.elapsed.total_seconds(), len(response.content) + len(body))
+	return(response)
+
+
+# count every request a pynetbox api object makes
+def instrument(nb):
+	if response_hook not in nb.http_session.hooks['response']:
+		nb.http_session.hooks['response'].append(response_hook)
+	return(nb)
+
+
+def reset():
+	with lock:
+		phases.clear()
+		getters.clear()
+		http.clear()
+		labels.clear()
+
+
+# in a forked child. another thread may have held the lock when we forked, and the parent's numbers aren't ours
+def forked():
+	global lock
+	lock = threading.Lock()
+	reset()
+
+
+# everything recorded so far, as plain data so it can be passed between processes and merged
+def snapshot():
+	with lock:
+		return(dict(
+			phases =	dict(phases),
+			getters =	dict(getters),
+			http =		[dict(method=method, endpoint=endpoint, **entry) for (method, endpoint), entry in sorted(http.items())],
+		))
+
+
+def merge(data):
+	with lock:
+		for name, seconds in data['phases'].items():
+			phases[name] = phases.get(name, 0.0) + seconds
+		for name, seconds in data['getters'].items():
+			getters[name] = getters.get(name, 0.0) + seconds
+		for entry in data['http']:
+			total = http.setdefault((entry['method'], entry['endpoint']), dict(count=0, seconds=0.0, bytes=0, errors=0))
+			for field in ['count', 'seconds', 'bytes', 'errors']:
+				total[field] += entry[field]
+
+
+def write_jsonl(script, success, data=None, extra_labels=None):
+	if not config.metrics_jsonl:
+		return()
+	line = dict(
+		time =		datetime.datetime.now().isoformat(timespec='seconds'),
+		script =	script,
+		success =	success,
+	)
+	line.update(labels)
+	line.update(extra_labels or {})
+	line.update(data if data is not None else snapshot())
+
+	path = os.path.expanduser(config.metrics_jsonl)
+	directory = os.path.dirname(path)
+	if directory:
+		os.makedirs(directory, exist_ok=True)
+	with open(path, 'a') as f:
+		f.write(json.dumps(line) + "\n")
+	return()
+
+
+def prom_labels(**values):
+	return("{" + ",".join(key + "=\"" + str(val).replace("\\", "\\\\").replace("\"", "\\\"") + "\"" for key, val in values.items()) + "}")
+
+
+def write_textfile(script, success):
+	if not config.metrics_textfile_dir:
+		return()
+	script_label = dict(script=script)
+	data = snapshot()
+	lines = []
+
+	def metric(name, help, samples):
+		lines.append("# HELP " + name + " " + help)
+		lines.append("# TYPE " + name + " gauge")
+		for sample_labels, val in samples:
+			lines.append(name + prom_labels(**sample_labels) + " " + str(val))
+
+	metric("netbox_scripts_last_run_timestamp_seconds", "Unix time the last run finished.", [(script_label, int(time.time()))])
+	metric("netbox_scripts_last_run_success", "1 if the last run succeeded.", [(script_label, int(bool(success)))])
+	metric("netbox_scripts_phase_seconds", "Wall time per phase of the last run.", [(dict(script_label, phase=name), round(seconds, 6)) for name, seconds in sorted(data['phases'].items())])
+	metric("netbox_scripts_getter_seconds", "Wall time per napalm getter of the last run.", [(dict(script_label, getter=name), round(seconds, 6)) for name, seconds in sorted(data['getters'].items())])
+
+	http_samples = {'count': [], 'seconds': [], 'bytes': [], 'errors': []}
+	for entry in data['http']:
+		for field in http_samples:
+			http_samples[field].append((dict(script_label, method=entry['method'], endpoint=entry['endpoint']), round(entry[field], 6)))
+	metric("netbox_scripts_http_requests", "HTTP requests per endpoint in the last run.", http_samples['count'])
+	metric("netbox_scripts_http_request_seconds", "Total HTTP request time per endpoint in the last run.", http_samples['seconds'])
+	metric("netbox_scripts_http_bytes", "HTTP bytes sent and received per endpoint in the last run.", http_samples['bytes'])
+	metric("netbox_scripts_http_errors", "HTTP requests that failed per endpoint in the last run.", http_samples['errors'])
+
+	directory = os.path.expanduser(config.metrics_textfile_dir)
+	os.makedirs(directory, exist_ok=True)
+	path = os.path.join(directory, "netbox_device_scripts_" + script.replace("-", "_") + ".prom")
+	# node_exporter may read it at any time, so write a temp file and move it in to place
+	with open(path + ".tmp", 'w') as f:
+		f.write("\n".join(lines) + "\n")
+	os.replace(path + ".tmp", path)
+	return()
+
+
+def write(script, success):
+	write_jsonl(script, success)
+	write_textfile(script, success)
+	return()
+
+
+# run a script's main(), then write metrics whether it worked, exited or blew up
+def run(script, main):
+	success = False
+	try:
+		main()
+		success = True
+	except SystemExit as e:
+		success = e.code in [0, None]
+		raise
+	finally:
+		write(script, success)
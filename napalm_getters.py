@@ -0,0 +1,98 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	which napalm getters device-to-netbox.py runs, and running them with a timeout each. the plan comes from
+#	config.import_getters, replaced per os / role (config.import_getters_by_os / _by_role) or with --getters,
+#	so getters nothing uses (bgp on a PE with a full table) aren't run. facts are always run.
+#
+#	napalm getters can't be interrupted, so a getter that runs past its timeout is left in its thread and the
+#	device is closed under it. the session isn't used again.
+
+import threading
+import config as config
+
+## see config.py for config
+
+# getter name -> napalm method, in the order they're run
+methods = {
+	'facts':	'get_facts',
+	'interfaces':	'get_interfaces',
+	'ips':		'get_interfaces_ip',
+	'bgp':		'get_bgp_neighbors',
+}
+
+# what's printed while collecting
+labels = {
+	'facts':	'Facts',
+	'interfaces':	'Interfaces',
+	'ips':		'IPs',
+	'bgp':		'BGP',
+}
+
+# the import needs facts for the device itself
+required = ['facts']
+
+# a failure of these is ignored, the rest stop the import
+optional = ['bgp']
+
+
+class GetterTimeout(Exception):
+	def __init__(self, getter, timeout):
+		self.getter = getter
+		self.timeout = timeout
+		super().__init__(methods[getter] + " didn't finish in " + str(timeout) + " seconds")
+
+
+# comma separated getter names from the cli, ie "facts,interfaces". raises ValueError on unknown ones
+def parse_getters(text):
+	names = [name.strip().lower() for name in str(text).split(",") if name.strip()]
+	unknown = [name for name in names if name not in methods]
+	if unknown:
+		raise ValueError("unknown getters: " + ", ".join(unknown) + ". Use " + ", ".join(methods))
+	return(names)
+
+
+# getters to run for a device, most specific first: cli, role, os, default
+def plan(config, os, role, getters=None):
+	if getters is None:
+		getters = config.import_getters_by_role.get(role)
+	if getters is None:
+		getters = config.import_getters_by_os.get(os)
+	if getters is None:
+		getters = config.import_getters
+	wanted = set(getters) | set(required)
+	return([name for name in methods if name in wanted])
+
+
+def timeout_for(getter):
+	return(config.getter_timeouts.get(getter))
+
+
+# call a getter, raising GetterTimeout (and closing the device) if it takes longer than timeout seconds
+def run_getter(napalmdevice, getter, timeout=None):
+	method = getattr(napalmdevice, methods[getter])
+	if timeout is None:
+		return(method())
+
+	outcome = {}
+	def call():
+		try:
+			outcome['result'] = method()
+		except BaseException as e:
+			outcome['error'] = e
+
+	# a daemon thread, a stuck getter mustn't keep python from exiting
+	thread = threading.Thread(target=call, daemon=True)
+	thread.start()
+	thread.join(timeout)
+	if thread.is_alive():
+		try:
+			napalmdevice.close()
+		except Exception:
+			pass
+		raise GetterTimeout(getter, timeout)
+	if 'error' in outcome:
+		raise outcome['error']
+	return(outcome['result'])
+
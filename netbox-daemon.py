@@ -0,0 +1,339 @@
+#! /usr/bin/env python3
+#
+#	long running worker for the other scripts, so their jobs skip the setup a fresh run pays every time:
+#	python start and imports, the netbox session, and logging in to a device that was used recently.
+#	https://github.com/falz/netbox-device-scripts
+#
+# dependencies:
+#	pip install argparse json getpass napalm pynetbox
+#
+# changelog:
+#	2026-10-17	first version. serves device-to-netbox, netbox-to-device and netbox-device-type-change jobs
+#			over a unix socket (config.daemon_socket). device sessions are kept open for
+#			config.session_idle_timeout seconds and checked with is_alive() before reuse (sessions.py)
+#
+# usage:
+#	./netbox-daemon.py serve
+#	./netbox-daemon.py run device-to-netbox -d hostname -s sitename -t tenantname -m ME-3400EG-2CS-A
+#	./netbox-daemon.py status
+#	./netbox-daemon.py stop
+#
+#	a job runs the script's main() in the daemon with the client's arguments, user and working directory.
+#	output is sent back to the client as it's printed and password / y/N prompts are asked on the client's
+#	terminal. jobs run one at a time, in the order they arrive.
+#
+# protocol, json lines both ways:
+#	client:	{"script": .., "argv": [..], "user": .., "cwd": .., "tty": bool}, {"status": true} or {"stop": true}
+#	daemon:	{"output": .., "stream": "stdout"|"stderr"}, {"prompt": .., "secret": bool}, {"exit": code}
+#	client:	{"answer": ..} to a prompt, null for end of input
+#
+# issues / todo:
+#	--pager on netbox-to-device would start the pager on the daemon's terminal, so it's refused
+
+import argparse
+import builtins
+import getpass
+import json
+import lazy_modules
+import metrics
+import os
+import script_loader
+import sessions
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+import config as config
+
+## see config.py for config
+
+scripts = ["device-to-netbox", "netbox-to-device", "netbox-device-type-change"]
+
+# arguments that can't work through the daemon, per script
+refused = {
+	"netbox-to-device":	["--pager"],
+}
+
+# one job at a time, the scripts use sys.stdout, sys.argv, the cwd and getpass
+job_lock = threading.Lock()
+stopping = threading.Event()
+
+
+def parse_cli_args(config):
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-s', '--socket',	required=False, default=config.daemon_socket, help='Unix socket to listen on / connect to. Defaults to ' + str(config.daemon_socket))
+	parser.add_argument('command',		choices=['serve', 'run', 'status', 'stop'], help='serve: run the daemon. run: submit a job. status: idle sessions. stop: stop the daemon')
+	parser.add_argument('script',		nargs='?', choices=scripts, help='Script to run a job of, with run')
+	parser.add_argument('argv',		nargs=argparse.REMAINDER, help='Arguments for the script')
+
+	args = vars(parser.parse_args())
+	args['socket'] = os.path.expanduser(args['socket'])
+
+	if args['command'] == 'run':
+		if args['script'] is None:
+			parser.error("run needs a script, one of " + ", ".join(scripts))
+		for argument in refused.get(args['script'], []):
+			if argument in args['argv']:
+				parser.error(argument + " doesn't work through the daemon, run " + args['script'] + ".py directly")
+	return(args)
+
+
+def send(connection, message):
+	connection.sendall((json.dumps(message) + "\n").encode())
+
+
+def receive(reader):
+	line = reader.readline()
+	if not line:
+		return(None)
+	return(json.loads(line))
+
+
+# stands in for stdout / stderr during a job, sends everything written to the client
+class Channel():
+	def __init__(self, connection, reader, tty, stream):
+		self.connection = connection
+		self.reader = reader
+		self.tty = tty
+		self.stream = stream
+		self.lock = threading.Lock()
+		self.closed = False
+
+	def write(self, text):
+		if text:
+			self.send(dict(output=text, stream=self.stream))
+		return(len(text))
+
+	def flush(self):
+		pass
+
+	def isatty(self):
+		return(self.tty)
+
+	def send(self, message):
+		with self.lock:
+			if self.closed:
+				return()
+			try:
+				send(self.connection, message)
+			except OSError:
+				# client went away, the job carries on
+				self.closed = True
+		return()
+
+	# ask the client, EOFError if it's gone or ends the input like a terminal would
+	def ask(self, prompt, secret):
+		self.send(dict(prompt=str(prompt), secret=secret))
+		try:
+			message = receive(self.reader)
+		except (OSError, ValueError):
+			message = None
+		if message is None or message.get('answer') is None:
+			raise EOFError()
+		return(message['answer'])
+
+
+# run one job with the client standing in for the terminal, returns the exit code
+def run_job(request, connection, reader):
+	script = request.get('script')
+	if script not in scripts:
+		send(connection, dict(output="Unknown script " + str(script) + "\n", stream="stderr"))
+		return(2)
+
+	module = script_loader.load_script(script)
+	out = Channel(connection, reader, bool(request.get('tty')), "stdout")
+	err = Channel(connection, reader, bool(request.get('tty')), "stderr")
+	user = request.get('user') or getpass.getuser()
+
+	saved = (sys.stdout, sys.stderr, sys.argv, os.getcwd(), getpass.getpass, getpass.getuser, builtins.input)
+	sys.stdout = out
+	sys.stderr = err
+	sys.argv = [script + ".py"] + [str(argument) for argument in request.get('argv') or []]
+	getpass.getpass = lambda prompt="Password: ", stream=None: out.ask(prompt, True)
+	getpass.getuser = lambda: user
+	builtins.input = lambda prompt="": out.ask(prompt, False)
+
+	code = 0
+	try:
+		os.chdir(request.get('cwd') or saved[3])
+		metrics.reset()
+		metrics.run(script, module.main)
+	except SystemExit as e:
+		if e.code is None:
+			code = 0
+		elif isinstance(e.code, int):
+			code = e.code
+		else:
+			print(e.code, file=sys.stderr)
+			code = 1
+	except (KeyboardInterrupt, EOFError):
+		print("", file=sys.stderr)
+		code = 130
+	except Exception:
+		traceback.print_exc(file=sys.stderr)
+		code = 1
+	finally:
+		sys.stdout, sys.stderr, sys.argv = saved[0], saved[1], saved[2]
+		os.chdir(saved[3])
+		getpass.getpass, getpass.getuser, builtins.input = saved[4], saved[5], saved[6]
+	return(code)
+
+
+class Handler(socketserver.StreamRequestHandler):
+	def handle(self):
+		try:
+			request = receive(self.rfile)
+		except ValueError:
+			return()
+		if request is None:
+			return()
+
+		if request.get('status'):
+			send(self.connection, dict(idle_sessions=sessions.idle_count(), busy=job_lock.locked(), pid=os.getpid()))
+			return()
+
+		if request.get('stop'):
+			send(self.connection, dict(exit=0))
+			stopping.set()
+			threading.Thread(target=self.server.shutdown, daemon=True).start()
+			return()
+
+		with job_lock:
+			code = run_job(request, self.connection, self.rfile)
+		try:
+			send(self.connection, dict(exit=code))
+		except OSError:
+			pass
+		return()
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+	daemon_threads = True
+
+
+# close sessions that have been idle too long, every so often
+def expire_sessions():
+	interval = max(1, min(60, config.session_idle_timeout))
+	while not stopping.wait(interval):
+		sessions.expire()
+
+
+def serve(args):
+	path = args['socket']
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	if os.path.exists(path):
+		try:
+			probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+			probe.connect(path)
+			probe.close()
+			print("A daemon is already listening on " + path)
+			sys.exit(1)
+		except ConnectionRefusedError:
+			# left over from a daemon that died
+			os.unlink(path)
+
+	sessions.keep_devices = True
+	# import napalm and pynetbox now rather than in the first job, and before any threads (see lazy_modules.py)
+	for script in scripts:
+		module = script_loader.load_script(script)
+		for name in ['napalm', 'pynetbox']:
+			if hasattr(module, name):
+				lazy_modules.ready(getattr(module, name))
+
+	# jobs run with our netbox token and get device passwords, so the socket is only for us
+	umask = os.umask(0o077)
+	try:
+		server = Server(path, Handler)
+	finally:
+		os.umask(umask)
+	threading.Thread(target=expire_sessions, daemon=True).start()
+
+	print("Listening on " + path + ". Idle device sessions are closed after " + str(config.session_idle_timeout) + " seconds")
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		stopping.set()
+		server.server_close()
+		if os.path.exists(path):
+			os.unlink(path)
+		sessions.expire(everything=True)
+	print("Stopped")
+
+
+def connect(args):
+	client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		client.connect(args['socket'])
+	except (FileNotFoundError, ConnectionRefusedError):
+		print("No daemon listening on " + args['socket'] + ". Start one with ./netbox-daemon.py serve", file=sys.stderr)
+		sys.exit(1)
+	return(client)
+
+
+# send a job and act as its terminal until it's done, returns the job's exit code
+def submit(args):
+	client = connect(args)
+	reader = client.makefile('r')
+	request = dict(
+		script =	args['script'],
+		argv =		args['argv'],
+		user =		getpass.getuser(),
+		cwd =		os.getcwd(),
+		tty =		sys.stdout.isatty(),
+	)
+	send(client, request)
+
+	while True:
+		message = receive(reader)
+		if message is None:
+			print("Lost the connection to the daemon", file=sys.stderr)
+			return(1)
+		if 'output' in message:
+			stream = sys.stderr if message.get('stream') == "stderr" else sys.stdout
+			stream.write(message['output'])
+			stream.flush()
+		elif 'prompt' in message:
+			try:
+				if message.get('secret'):
+					answer = getpass.getpass(message['prompt'])
+				else:
+					answer = input(message['prompt'])
+			except EOFError:
+				answer = None
+			send(client, dict(answer=answer))
+		elif 'exit' in message:
+			return(message['exit'])
+
+
+def request(args, message):
+	client = connect(args)
+	send(client, message)
+	return(receive(client.makefile('r')))
+
+
+def main():
+	args = parse_cli_args(config)
+
+	if args['command'] == 'serve':
+		serve(args)
+	elif args['command'] == 'run':
+		try:
+			code = submit(args)
+		except KeyboardInterrupt:
+			# the job carries on in the daemon, its output goes nowhere
+			print("")
+			code = 130
+		sys.exit(code)
+	elif args['command'] == 'status':
+		status = request(args, dict(status=True))
+		print("Daemon pid " + str(status['pid']) + ", " + str(status['idle_sessions']) + " idle device sessions" + (", running a job" if status['busy'] else ""))
+	elif args['command'] == 'stop':
+		request(args, dict(stop=True))
+		print("Stopped")
+
+
+if __name__ == "__main__":
+	main()
@@ -15,16 +15,43 @@
 #	2021-04-20	convert from netbox 2.8.0 to 2.11.0. Only change is device status no longer is an id, so change "2" to "planned".
 #	2022-04-29	posted to github
 #	2022-07-02	remove deprecated slugs
+#	2026-10-17	look up device types through the shared on-disk cache (netbox_cache.py). add --refresh-cache
+#	2026-10-17	fetch the device and target device type concurrently (netbox_async.py)
+#	2026-10-17	move main code in to main(), pass nb around instead of using a global.
+#	2026-10-17	record time per phase plus netbox requests per endpoint (metrics.py)
+#			look up config.types case insensitively, netbox types are lowercased before the lookup
+#	2026-10-17	index config.types by role once per type instead of a nested loop per interface, send renames
+#			and missing interfaces as bulk PATCH/POST, cache interface templates per device type.
+#			add batch mode: several -d ids or -f file of device,type to migrate many devices at once
+#	2026-10-17	read role maps from "role:" words on netbox interface templates (role_maps.py), config.types
+#			is only used for device types without them
+#	2026-10-17	optionally read the device, its interfaces and its type's templates in one graphql query
+#	2026-10-17	import pynetbox lazily (lazy_modules.py)
+#	2026-10-17	share one netbox session per process (sessions.py) for netbox-daemon.py
+#	2026-10-17	read interfaces once with netbox_bulk.fetch_records / fetch_all, big pages read in parallel
 #
 # todo:
 #	instead of 1:1 mapping of interfaces, should we sense its type based on circuit ID and correctly assign it?
 #	finalize missing console and power ports
 
 import argparse
-import pynetbox
+import csv
+import metrics
+import netbox_async
+import netbox_bulk
+import netbox_cache
+import netbox_graphql
+import lazy_modules
+import os
+import role_maps
+import sessions
 import sys
 import config as config
 
+# only imported when first used, see lazy_modules.py
+asyncio =	lazy_modules.load("asyncio")
+pynetbox =	lazy_modules.load("pynetbox")
+
 
 ## see config.py for config
 
@@ -32,37 +59,79 @@ import config as config
 ## functions
 def parse_cli_args(config):
 	parser = argparse.ArgumentParser()
-	parser.add_argument('-d', '--device',   required=True,  help='Netbox Device id - Numeric.')
-	parser.add_argument('-t', '--type',	required=True,  help='Netbox Device Type to convert to. Perhaps ME-3400EG-2CS-A or ASR-920-4SZ-A')
+	parser.add_argument('-d', '--device',   required=False, help='Netbox Device id - Numeric. Several comma separated IDs convert all of them to -t')
+	parser.add_argument('-t', '--type',	required=False, help='Netbox Device Type to convert to. Perhaps ME-3400EG-2CS-A or ASR-920-4SZ-A')
+	parser.add_argument('-f', '--file',	required=False, help='CSV file of devices to convert, columns: device, type. Instead of -d/-t')
+	parser.add_argument('--refresh-cache',	required=False, action='store_true', help='Clear cached device types and interface templates before starting')
 
 	args = vars(parser.parse_args())
 
-	if args['device'].isnumeric() == False:
-		print("Device \"" + args['device'] + "\" is not numeric. -i should be the device ID from netbox")
-		print()
-		sys.exit(1)
+	if args['file'] is None:
+		if args['device'] is None or args['type'] is None:
+			parser.error("the following arguments are required: -d/--device, -t/--type (or use -f for a file)")
+
+		args['devices'] = [device.strip() for device in args['device'].split(",") if device.strip()]
+		for device in args['devices']:
+			if device.isnumeric() == False:
+				print("Device \"" + device + "\" is not numeric. -d should be the device ID from netbox")
+				print()
+				sys.exit(1)
+		args['device'] = args['devices'][0]
 
 	return(args)
 
+
+# jobs for batch mode, a list of (device id, target type) from -f or several -d
+def read_jobs(args):
+	if args['file'] is None:
+		return([(device, args['type']) for device in args['devices']])
+
+	if not os.path.exists(args['file']):
+		print(args['file'], "doesn't exist!")
+		sys.exit(1)
+
+	with open(args['file'], 'r', newline='') as f:
+		lines = [line for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+	jobs = []
+	for line_number, row in enumerate(csv.DictReader(lines), start=1):
+		row = {str(key).strip().lower(): str(val).strip() for key, val in row.items() if key is not None and val is not None}
+		if not row.get('device', '').isnumeric() or not row.get('type'):
+			print("Entry " + str(line_number) + " in " + args['file'] + " needs a numeric device and a type")
+			sys.exit(1)
+		jobs.append((row['device'], row['type']))
+	return(jobs)
+
 def get_device(config, args):
 	device = args['device']
 	type = args['type'].lower()
 
-	nb = pynetbox.api(config.netbox_url, config.netbox_api_token)
-	# todo add error checking
-	nb_device = nb.dcim.devices.get(device)
+	nb = sessions.netbox()
 
-	print("Working on", nb_device, "(" + config.netbox_url +"dcim/devices/" + device + ") Type: ", end="")
-
-	# check if this type is valid in netbox
+	# the device and the target type don't depend on each other, fetch both at once when we can
 	try:
-		nb_device_type = nb.dcim.device_types.get(model__ie=type)
-		#print(nb_device_type)
-	except pynetbox.RequestError as e:
+		bundle = netbox_graphql.fetch_device(nb, device)
+		if bundle is not None:
+			nb_device = bundle['device']
+			nb_device_types = netbox_cache.cached_filter(nb.dcim.device_types, model__ie=type)
+			# map_interfaces reads these next
+			if nb_device is not None:
+				netbox_graphql.prefetch(nb.dcim.interfaces, bundle['interfaces'], device_id=nb_device.id)
+				netbox_graphql.prefetch(nb.dcim.interface_templates, bundle['templates'], devicetype_id=nb_device.device_type.id)
+		elif netbox_async.enabled():
+			nb_device, nb_device_types = netbox_async.run(get_device_async(nb, device, type))
+		else:
+			nb_device = nb.dcim.devices.get(device)
+			nb_device_types = netbox_cache.cached_filter(nb.dcim.device_types, model__ie=type)
+	except (pynetbox.RequestError, netbox_async.AsyncRequestError) as e:
 		print(e.error)
 		sys.exit(1)
 
-	nb_device_types = nb.dcim.device_types.filter(model__ie=type)
+	if nb_device is None:
+		print("Device", device, "doesn't exist!")
+		sys.exit(1)
+
+	print("Working on", nb_device, "(" + config.netbox_url +"dcim/devices/" + device + ") Type: ", end="")
 
 	#cant do simple 'if a in b' because one is string and other is object
 	if str(type) in [str(device_type).lower() for device_type in nb_device_types]:
@@ -75,6 +144,14 @@ def get_device(config, args):
 	return(nb, nb_device, nb_device_types)
 
 
+async def get_device_async(nb, device, type):
+	async with netbox_async.AsyncNetbox() as anb:
+		return(await asyncio.gather(
+			anb.get(nb.dcim.devices, device),
+			anb.cached_filter(nb.dcim.device_types, model__ie=type),
+		))
+
+
 # misc other stuff - clear serial number, change status
 def fix_other(nb_device, nb_device_types, args):
 	print("")
@@ -98,87 +175,253 @@ def fix_other(nb_device, nb_device_types, args):
 	return(True)
 
 
+# config.py has them in netbox's case, compare lowercase
+def config_types(config):
+	return({type_key.lower(): dict(type_val) for type_key, type_val in config.types.items()})
+
+
+# config.types plus role maps from the interface templates of device_types (netbox records), which win
+def get_types(config, nb, device_types):
+	types = config_types(config)
+	seen = set()
+	for device_type in device_types:
+		if device_type.id in seen:
+			continue
+		seen.add(device_type.id)
+		interfaces = role_maps.role_map(get_templates(nb, device_type))
+		if interfaces is not None:
+			type_key = str(device_type).lower()
+			types[type_key] = dict(types.get(type_key, {}), interfaces=interfaces)
+	return(types)
+
+
+# role -> (interface name, interface type) of a device type, built once per type and kept in types
+def role_index(types, device_type):
+	if 'role_index' not in types[device_type]:
+		index = {}
+		for interface_name, interface in types[device_type]['interfaces'].items():
+			index[interface['role']] = (interface_name, interface['type'])
+		types[device_type]['role_index'] = index
+	return(types[device_type]['role_index'])
+
+
+# the renames/type changes that turn a device's interfaces from current_type in to target_type.
+# list of (netbox interface, role, new name, new type), interfaces that are already right are left out
+def plan_mapping(types, current_type, target_type, current_interfaces):
+	current_map = types[current_type]['interfaces']
+	target_roles = role_index(types, target_type)
+
+	mapping = []
+	for current_interface in current_interfaces:
+		current = current_map.get(str(current_interface))
+		if current is None or current['role'] not in target_roles:
+			continue
+		new_name, new_type = target_roles[current['role']]
+		if str(current_interface) == new_name and getattr(current_interface.type, 'value', None) == new_type:
+			continue
+		mapping.append((current_interface, current['role'], new_name, new_type))
+	return(mapping)
+
+
+# PATCH all of the mapping in bulk, for one or many devices. returns (ids of the interfaces netbox renamed,
+# dict of label -> error for the ones it didn't)
+def apply_mapping(nb, mapping):
+	update_list = []
+	labels = {}
+	for netbox_interface, role, new_name, new_type in mapping:
+		update_list.append(dict(id=netbox_interface.id, name=new_name, type=new_type))
+		labels[netbox_interface.id] = str(netbox_interface.device) + " " + str(netbox_interface)
+
+	updated, failed = netbox_bulk.bulk_update(nb.dcim.interfaces, update_list, labels)
+
+	for netbox_interface, role, new_name, new_type in mapping:
+		error = failed.get(labels[netbox_interface.id])
+		print("Role:", role, "Old Name:", netbox_interface, "-> New Name:", new_name, "New Type:", new_type, "Status:", "OK" if error is None else error)
+	return(set(netbox_interface.id for netbox_interface in updated), failed)
+
+
 # map lan and wan interfaces. perhaps add missing here as well
-def map_interfaces(config, nb_device, args):
+def map_interfaces(config, nb, nb_device, args):
 	target_type	= args['type'].lower()
 	current_type	= str(nb_device.device_type).lower()
 
-	if current_type not in config.types:
-		print("ERROR: device type", current_type, "not defined in config.py")
-		print()
-		sys.exit(1)
+	target_device_types = [device_type for device_type in netbox_cache.cached_filter(nb.dcim.device_types, model__ie=target_type) if str(device_type).lower() == target_type]
+	types = get_types(config, nb, [nb_device.device_type] + target_device_types)
+
+	for check_type in [current_type, target_type]:
+		if check_type not in types:
+			print("ERROR: device type", check_type, "has no role map: not in types in config.py and no roles on its netbox interface templates")
+			print()
+			sys.exit(1)
 
 	print("")
 	print("Mapping interfaces..")
 
 	# get interfaces from netbox device
-	current_interfaces	= nb.dcim.interfaces.filter(device_id=nb_device.id)
+	current_interfaces	= netbox_graphql.filter(nb.dcim.interfaces, device_id=nb_device.id)
 
-	for current_interface in current_interfaces:
-		current_interface_str=str(current_interface)
-		if current_interface_str in config.types[current_type]['interfaces']:
-			current_interface_role = config.types[current_type]['interfaces'][current_interface_str]['role']
-			current_interface_type = config.types[current_type]['interfaces'][current_interface_str]['type']
-			print("Role:", current_interface_role, "Old Name:", current_interface, end='')
-
-			for new_interface in config.types[target_type]['interfaces']:
-				new_interface_str=str(new_interface)
-				if current_interface_role in config.types[target_type]['interfaces'][new_interface_str]['role']:
-					new_interface_role = config.types[target_type]['interfaces'][new_interface]['role']
-					new_interface_type = config.types[target_type]['interfaces'][new_interface]['type']
-					print(" -> New Name:", new_interface, "New Type:", new_interface_type, end='')
-
-					netbox_interface	= nb.dcim.interfaces.get(device_id=nb_device.id, name=current_interface)
-					#print(netbox_interface)
-
-					# finally actually make the change
-					update_dict = {}
-					update_dict = dict(
-						name	= new_interface,
-						type	= new_interface_type,
-					)
-					#print(update_dict)
-					try:
-						netbox_interface.update(update_dict)
-						print(" Status: OK")
-					except pynetbox.lib.query.RequestError as e:
-						print(e.error)
+	apply_mapping(nb, plan_mapping(types, current_type, target_type, current_interfaces))
 	print("Done")
 	return(True)
 
 
-def add_missing_interfaces(config, nb_device, nb_device_types, args):
+# interface templates of a device type, from the on-disk cache (--refresh-cache clears it)
+def get_templates(nb, device_type):
+	templates = netbox_graphql.take(nb.dcim.interface_templates, devicetype_id=device_type.id)
+	if templates is None:
+		templates = netbox_cache.cached_filter(nb.dcim.interface_templates, devicetype_id=device_type.id)
+	return(templates)
+
+
+# interfaces to create so a device has everything in the templates
+def plan_missing(nb_device, interface_names, templates):
+	interface_names = set(interface_names)
+	create_list = []
+	for template_interface in templates:
+		if str(template_interface) not in interface_names:
+			create_list.append(dict(
+				device =	nb_device.id,
+				name =		str(template_interface),
+				type =		template_interface.type.value,
+				enabled =	False,
+			))
+	return(create_list)
+
+
+def add_missing_interfaces(config, nb, nb_device, nb_device_types, args):
 	# use api/dcim/interface-templates/?devicetype_id=1 (well, get that id from device types)
 	# loop throught them and add missing 
 
 	# get the devicetype_id for the desired device
 	for device_type in nb_device_types:
 		if str(device_type) == args['type']:
-			devicetype_id = device_type.id
-			netbox_interfaces		= nb.dcim.interfaces.filter(device_id=nb_device.id)
-			netbox_template_interfaces	= nb.dcim.interface_templates.filter(devicetype_id=device_type.id)
+			netbox_interfaces		= netbox_bulk.fetch_all(nb.dcim.interfaces, device_id=nb_device.id)
+			netbox_template_interfaces	= get_templates(nb, device_type)
 			print("")
 			print("Creating missing interfaces:")
 
-			for template_interface in netbox_template_interfaces:
-				#comparison only works on strings
-				if str(template_interface) not in [str(netbox_interface) for netbox_interface in netbox_interfaces]:
-					print(template_interface, template_interface.type.value)
-					create_dict = dict(
-						device =	nb_device.id,
-						name =		str(template_interface),
-						type =		template_interface.type.value,
-						enabled =	False,
-					)
-					#print(create_dict)
-					try:
-						result = nb.dcim.interfaces.create(create_dict)
-					except pynetbox.RequestError as e:
-						print(e.error)
+			create_list = plan_missing(nb_device, netbox_interfaces, netbox_template_interfaces)
+			created, failed = netbox_bulk.bulk_create(nb.dcim.interfaces, create_list)
+			for create_dict in create_list:
+				print(create_dict['name'], create_dict['type'])
+			for interface, error in failed.items():
+				print("ERROR creating " + interface + ": " + str(error))
 			print("Done")
 	return(True)
 
 
+# convert many devices at once. everything is read up front in a few filter requests, then all renames,
+# device updates and missing interfaces go out as bulk requests across devices. a device that can't be
+# converted is reported and left alone, the rest carry on
+def migrate_batch(config, args, jobs):
+	nb = sessions.netbox()
+	summary = {device: (False, "") for device, target_model in jobs}
+
+	print("Fetching " + str(len(jobs)) + " netbox devices..")
+	device_ids = [device for device, target_model in jobs]
+	nb_devices = {}
+	interfaces = {}
+	try:
+		with metrics.phase("get_devices"):
+			for chunk in netbox_bulk.chunked(device_ids, config.bulk_filter_size):
+				for nb_device in nb.dcim.devices.filter(id=chunk):
+					nb_devices[str(nb_device.id)] = nb_device
+				for netbox_interface in netbox_bulk.fetch_records(nb.dcim.interfaces, device_id=chunk):
+					interfaces.setdefault(str(netbox_interface.device.id), []).append(netbox_interface)
+
+			target_types = {}
+			for target_model in set(target_model for device, target_model in jobs):
+				for device_type in netbox_cache.cached_filter(nb.dcim.device_types, model__ie=target_model):
+					if str(device_type).lower() == target_model.lower():
+						target_types[target_model] = device_type
+
+			types = get_types(config, nb, [nb_device.device_type for nb_device in nb_devices.values()] + list(target_types.values()))
+	except (pynetbox.RequestError, netbox_async.AsyncRequestError) as e:
+		print(e.error)
+		sys.exit(1)
+
+	# work out what to do for every device before changing anything
+	todo = []
+	for device, target_model in jobs:
+		nb_device = nb_devices.get(device)
+		current_type = str(nb_device.device_type).lower() if nb_device is not None else None
+		if nb_device is None:
+			summary[device] = (False, "Device doesn't exist")
+		elif target_model not in target_types:
+			summary[device] = (False, "INVALID type " + target_model)
+		elif current_type not in types or target_model.lower() not in types:
+			summary[device] = (False, "Device type " + (target_model if current_type in types else str(nb_device.device_type)) + " has no role map (not in config.py types, no roles on its netbox interface templates)")
+		else:
+			todo.append((device, nb_device, target_types[target_model], plan_mapping(types, current_type, target_model.lower(), interfaces.get(device, []))))
+
+	print("")
+	print("Mapping interfaces..")
+	with metrics.phase("map_interfaces"):
+		renamed_ids, failed = apply_mapping(nb, [mapped for device, nb_device, target_type, mapping in todo for mapped in mapping])
+	print("Done")
+
+	# a bulk PATCH is all or nothing, so a device with a rename that didn't go through keeps its type and gets
+	# no interfaces created, rather than being left half converted
+	rename_failed = {}
+	for device, nb_device, target_type, mapping in todo:
+		errors = [str(netbox_interface) + ": " + str(failed.get(str(nb_device) + " " + str(netbox_interface), "not renamed")) for netbox_interface, role, new_name, new_type in mapping if netbox_interface.id not in renamed_ids]
+		if errors:
+			rename_failed[device] = errors
+	for device, nb_device, target_type, mapping in todo:
+		if device in rename_failed:
+			summary[device] = (False, "Interface renames failed, type not changed: " + "; ".join(rename_failed[device]))
+	todo = [job for job in todo if job[0] not in rename_failed]
+
+	print("")
+	print("Changing serial number, status and type..")
+	with metrics.phase("fix_other"):
+		update_list = [dict(id=nb_device.id, serial="", status="planned", device_type=target_type.id) for device, nb_device, target_type, mapping in todo]
+		updated, device_failed = netbox_bulk.bulk_update(nb.dcim.devices, update_list, {nb_device.id: str(nb_device) for device, nb_device, target_type, mapping in todo})
+	for device, nb_device, target_type, mapping in todo:
+		print(nb_device, nb_device.device_type, "->", target_type, "Status:", device_failed.get(str(nb_device), "OK"))
+	print("Done")
+
+	# names after the renames netbox confirmed, no need to read them again
+	print("")
+	print("Creating missing interfaces..")
+	with metrics.phase("add_missing_interfaces"):
+		create_list = []
+		templates = {}
+		for device, nb_device, target_type, mapping in todo:
+			# still the old type
+			if str(nb_device) in device_failed:
+				continue
+			if target_type.id not in templates:
+				templates[target_type.id] = get_templates(nb, target_type)
+			renamed = {netbox_interface.id: new_name for netbox_interface, role, new_name, new_type in mapping if netbox_interface.id in renamed_ids}
+			interface_names = [renamed.get(netbox_interface.id, str(netbox_interface)) for netbox_interface in interfaces.get(device, [])]
+			create_list.extend(plan_missing(nb_device, interface_names, templates[target_type.id]))
+		device_names = {nb_device.id: str(nb_device) for device, nb_device, target_type, mapping in todo}
+		created, create_failed = netbox_bulk.bulk_create(nb.dcim.interfaces, create_list, key=lambda item: device_names[item['device']] + " " + item['name'])
+	print(str(len(created)) + " created")
+	print("Done")
+
+	for device, nb_device, target_type, mapping in todo:
+		errors = [label + ": " + str(error) for label, error in create_failed.items() if label.startswith(str(nb_device) + " ")]
+		if str(nb_device) in device_failed:
+			errors.insert(0, str(device_failed[str(nb_device)]))
+		summary[device] = (not errors, "; ".join(errors) if errors else config.netbox_url + "dcim/devices/" + device + "/")
+
+	print("")
+	print("Conversion summary:")
+	print("")
+	failures = 0
+	for device, target_model in jobs:
+		status, message = summary[device]
+		if status == False:
+			failures += 1
+		print("\t" + device + "\t" + target_model + "\t" + ("OK" if status else "FAILED") + "\t" + message)
+	print("")
+	print(str(len(jobs) - failures) + " succeeded, " + str(failures) + " failed")
+	print("")
+	return(failures == 0)
+
+
 # attempt to find the template based on desired device type, then add missing console and power ports
 def fix_ports_from_template(config, nb_device, args):
 	return(True)
@@ -186,17 +429,35 @@ def fix_ports_from_template(config, nb_device, args):
 
 ##########################################
 ## main
-args = parse_cli_args(config)
+def main():
+	args = parse_cli_args(config)
+
+	if args['refresh_cache']:
+		netbox_cache.invalidate(config.netbox_url)
+
+	if args['file'] is not None or len(args['devices']) > 1:
+		if migrate_batch(config, args, read_jobs(args)) == False:
+			sys.exit(1)
+		return()
+
+	print("Fetching netbox device", args['device'], "..")
+	metrics.labels['device'] = args['device']
+	with metrics.phase("get_device"):
+		nb, nb_device, nb_device_types = get_device(config, args)
+
+	# do this before other as the device has to be old type still
+	with metrics.phase("map_interfaces"):
+		mapped_interfaces = map_interfaces(config, nb, nb_device, args)
+	#print(interfaces)
 
-print("Fetching netbox device", args['device'], "..")
-nb, nb_device, nb_device_types = get_device(config, args)
+	with metrics.phase("fix_other"):
+		other=fix_other(nb_device, nb_device_types, args)
+	#print(other)
 
-# do this before other as the device has to be old type still
-map_interfaces = map_interfaces(config, nb_device, args)
-#print(interfaces)
+	# do this after the device type is changed
+	with metrics.phase("add_missing_interfaces"):
+		missing_interfaces = add_missing_interfaces(config, nb, nb_device, nb_device_types, args)
 
-other=fix_other(nb_device, nb_device_types, args)
-#print(other)
 
-# do this after the device type is changed
-missing_interfaces = add_missing_interfaces(config, nb_device, nb_device_types, args)
+if __name__ == "__main__":
+	metrics.run("netbox-device-type-change", main)
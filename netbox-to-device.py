@@ -23,34 +23,85 @@
 #	2021-07-23	colourize diff
 #
 #	2022-04-29	put on github https://github.com/falz/netbox-device-scripts
+#
+#	2026-10-17	move main code in to main() and split out open_device() / get_diff() so they can be reused
+#	2026-10-17	record time per phase plus netbox/generator requests per endpoint (metrics.py)
+#	2026-10-17	push to many devices at once: several -d ids or --site/--tenant/--role. devices are opened and
+#			diffed in parallel (-w), reviewed together and committed in parallel waves (--wave-size).
+#			a device that fails doesn't stop the others
+#	2026-10-17	fetch configs over one pooled, gzipped session and keep them in a local cache that is revalidated
+#			with ETag/If-Modified-Since (generator_cache.py). add --refresh-cache
+#	2026-10-17	write diffs line by line instead of building one big string, add --pager and --no-color.
+#			candidate configs are sanitized line by line in to a temp file and loaded with filename=
+#	2026-10-17	remember a hash per config section of the last push to each device (config_sections.py). skip
+#			devices whose config hasn't changed since, and for a merge only send the sections that did. add --force
+#	2026-10-17	import napalm, pynetbox, requests and colorama lazily (lazy_modules.py) so --help and argument
+#			errors are quick
+#	2026-10-17	open devices and netbox through sessions.py so netbox-daemon.py can keep them warm between jobs
 
 import argparse
+import concurrent.futures
+import config_sections
+from contextlib import contextmanager
+import generator_cache
 import getpass
-from napalm.base import get_network_driver
+import io
+import lazy_modules
+import metrics
 import os
-import pynetbox
 import re
-import requests
+import sessions
+import shlex
+import subprocess
 import sys
+import tempfile
+import time
 import config as config
-from colorama import Fore, Style
+
+# only imported when first used, see lazy_modules.py
+colorama =	lazy_modules.load("colorama")
+napalm =	lazy_modules.load("napalm")
+pynetbox =	lazy_modules.load("pynetbox")
+requests =	lazy_modules.load("requests")
 
 ## see config.py for config
 
 def parse_cli_args(config):
 	parser = argparse.ArgumentParser()
-	parser.add_argument('-d', '--device',   required=True,  help='Source Netbox Device id to fetch config from. Use numeric ID.')
+	parser.add_argument('-d', '--device',   required=False, help='Source Netbox Device id to fetch config from. Use numeric ID. Several comma separated IDs push to all of them')
 	parser.add_argument('-i', '--ip',	required=False,  help='IP address or hostname to push config to. Use to override whatever Netbox returns as primary IP')
 	parser.add_argument('-u', '--username', required=False, help='Username. Used for both Netbox API call and device login. Defaults to shell username.')
 	parser.add_argument('-c', '--config',	required=False,  help='Config file to push to device, overrides pulling from Netbox Config Generator')
 	parser.add_argument('-r', '--replace',	required=False, action='store_true', help='Config REPLACE instead of config MERGE (default). Danger, for Testing!')
+	parser.add_argument('--site',		required=False, help='Push to every device at this netbox site (slug) instead of -d. Can be combined with --tenant/--role')
+	parser.add_argument('--tenant',		required=False, help='Push to every device of this netbox tenant (slug)')
+	parser.add_argument('--role',		required=False, help='Push to every device with this netbox device role (slug)')
+	parser.add_argument('-w', '--workers',	required=False, type=int, default=config.push_workers, help='Number of devices to open and diff at once when pushing to many. Defaults to ' + str(config.push_workers))
+	parser.add_argument('--wave-size',	required=False, type=int, default=config.push_wave_size, help='Number of devices to commit at once when pushing to many. Defaults to ' + str(config.push_wave_size))
+	parser.add_argument('--pager',		required=False, action='store_true', help='Show diffs through $PAGER (less -R if not set)')
+	parser.add_argument('--no-color',	required=False, action='store_true', help='Plain diffs without colours, for logs. Also the default when output is not a terminal')
+	parser.add_argument('--force',		required=False, action='store_true', help='Compare with the device even if the config is unchanged since the last push, and send all of it')
+	parser.add_argument('--refresh-cache',	required=False, action='store_true', help='Clear cached configs from the config generator before starting')
 
 	args = vars(parser.parse_args())
 
-	if args['device'].isnumeric() == False:
-		print("Device \"" + args['device'] + "\" is not numeric. -i should be the device ID from netbox")
-		print()
-		sys.exit(1)
+	args['filters'] = {key: args[key] for key in ['site', 'tenant', 'role'] if args[key] is not None}
+	if args['device'] is None and not args['filters']:
+		parser.error("one of -d/--device or --site/--tenant/--role is required")
+
+	args['device_ids'] = []
+	if args['device'] is not None:
+		args['device_ids'] = [device.strip() for device in args['device'].split(",") if device.strip()]
+		for device in args['device_ids']:
+			if device.isnumeric() == False:
+				print("Device \"" + device + "\" is not numeric. -d should be the device ID from netbox")
+				print()
+				sys.exit(1)
+		if len(args['device_ids']) == 1:
+			args['device'] = args['device_ids'][0]
+
+	if is_batch(args) and args['ip'] is not None:
+		parser.error("-i only works with a single device")
 
 	username = args['username']
 	if username is None:
@@ -64,32 +115,46 @@ def parse_cli_args(config):
 
 def get_device(args):
 	device = args['device']
-	nb = pynetbox.api(config.netbox_url, config.netbox_api_token)
+	nb = sessions.netbox()
 	# add error checking
 	nb_device = nb.dcim.devices.get(device)
 	return(True, nb_device)
 
 
+# more than one device to push to
+def is_batch(args):
+	return(len(args['device_ids']) > 1 or bool(args['filters']))
+
+
 def get_config_from_generator(config, args):
-	username =	args['username']
-	password =	args['password']
 	url = 		config.generator_url + args['device']
 	print('Fetching ' + url)
 	print()
 
-	try:   
-		config_from_generator = requests.get(url, auth=(username, password), timeout=config.request_timeout)
-	except requests.exceptions.RequestException as errormessage:
-		print(errormessage)
-		sys.exit(1)
-	#check http status code as 200
-	if config_from_generator.status_code != 200:
+	status, result = fetch_config_from_generator(config, args, args['device'])
+	if status == False:
 		print("")
-		print("SEV0 received HTTP status code " + str(config_from_generator.status_code))
+		print(result)
 		print("Recheck password and double check if URL works: " + url)
 		print("")
 		sys.exit(1)
-	return(config_from_generator.text)
+	return(result)
+
+
+# returns (True, config) or (False, error message) so one device failing doesn't have to end the run
+def fetch_config_from_generator(config, args, device_id):
+	username =	args['username']
+	password =	args['password']
+	url = 		config.generator_url + str(device_id)
+
+	try:   
+		status_code, config_from_generator = generator_cache.fetch(url, (username, password))
+	except requests.exceptions.RequestException as errormessage:
+		return(False, str(errormessage))
+	#check http status code as 200
+	if status_code != 200:
+		return(False, "SEV0 received HTTP status code " + str(status_code))
+	return(True, config_from_generator)
 
 
 # IOS banners have issues with ^C and they must be Ascii character 3 instead. search/replace for that here.
@@ -97,6 +162,20 @@ def sanitize_config(dirty_config_str):
 	clean_config_str = re.sub(r'\^C', '\x03', dirty_config_str)
 	return(clean_config_str)
 
+
+# same as sanitize_config, a line at a time
+def sanitize_lines(lines):
+	for line in lines:
+		yield(line.replace('^C', '\x03'))
+
+
+# sanitize a candidate config in to a temp file (only readable by us) for napalm's filename=, so a big
+# config is never held in memory twice. the caller removes it
+def write_candidate_file(lines):
+	with tempfile.NamedTemporaryFile('w', prefix="netbox-to-device-", suffix=".conf", delete=False) as f:
+		f.writelines(sanitize_lines(lines))
+	return(f.name)
+
 def get_device_ip(args, nb_device):
 	# see if passed from -i cli
 	ip = args['ip']
@@ -112,120 +191,440 @@ def get_device_ip(args, nb_device):
 			sys.exit(1)
 	return(ip)
 
+# returns the name of a sanitized temp copy of the file, see write_candidate_file()
 def get_config_file(file):
 	if os.path.exists(file):
-		file = open(file, 'r')
-		filestr = file.read()
+		with open(file, 'r') as f:
+			candidate_file = write_candidate_file(f)
 	else:
 		print(file, "doesn't exist!")
 		sys.exit(1)
 
-	return(filestr)
-
-def color_diff(diff):
-	difflist = diff.splitlines()
-	colorized_str = ''
-	for line in difflist:
-		if line.startswith('+'):
-			colorized_str = colorized_str + Fore.GREEN + line + "\n"
-		elif line.startswith('-'):
-			colorized_str = colorized_str + Fore.RED + line + "\n"
-		elif line.startswith('^'):
-			colorized_str = colorized_str + Fore.BLUE + line + "\n"
+	return(candidate_file)
+
+
+# colorama.Fore colour per diff line prefix
+diff_colors = {
+	'+':	'GREEN',
+	'-':	'RED',
+	'^':	'BLUE',
+}
+
+# lines of a big string one at a time, without a list or copy of the whole thing
+def iter_lines(text):
+	start = 0
+	while start < len(text):
+		end = text.find("\n", start)
+		if end == -1:
+			end = len(text)
+		yield(text[start:end])
+		start = end + 1
+
+
+# write a diff to out one line at a time. each coloured line is reset on its own so nothing bleeds in to the next
+def write_diff(diff, out, color=True):
+	if color:
+		colors = {prefix: getattr(colorama.Fore, name) for prefix, name in diff_colors.items()}
+		reset = colorama.Style.RESET_ALL
+	for line in iter_lines(diff):
+		if color and line[:1] in colors:
+			out.write(colors[line[:1]] + line + reset + "\n")
 		else:
-			colorized_str = colorized_str + line + "\n"
-
-	return(colorized_str + Style.RESET_ALL)
-
-
-args = parse_cli_args(config)
+			out.write(line + "\n")
+	return()
+
+
+# yields (out, color) to write diffs to: stdout, or a pager with --pager
+@contextmanager
+def diff_output(args):
+	color = not args['no_color'] and sys.stdout.isatty()
+	if not args['pager']:
+		yield(sys.stdout, color)
+		sys.stdout.flush()
+		return
+
+	command = os.environ.get('PAGER') or "less -R"
+	try:
+		pager = subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE, universal_newlines=True)
+	except (OSError, ValueError) as e:
+		# no such pager, or PAGER doesn't parse. the diff still goes to stdout
+		print("Can't run pager " + command + ": " + str(e))
+		yield(sys.stdout, color)
+		sys.stdout.flush()
+		return
+
+	try:
+		yield(pager.stdin, color)
+		pager.stdin.close()
+	except BrokenPipeError:
+		# quit the pager before the end
+		pass
+	pager.wait()
+
+
+# napalm's driver class for a platform (ios, junos..)
+def get_network_driver(platform):
+	return(napalm.get_network_driver(platform))
+
+
+# connect to the device with the napalm driver named by the netbox platform
+def open_device(args, nb_device, ip):
+	platform = (str(nb_device.platform).lower())
+
+	driver = get_network_driver(platform)
+
+	# an already open session when running under netbox-daemon.py. driver options are in sessions.py
+	live_device = sessions.acquire(driver, platform, ip, args['username'], args['password'])
+	return(live_device)
+
+
+# load the candidate config (a string, or a file with filename=) on to the device and return the diff against what's running
+def get_diff(args, live_device, config_str=None, filename=None):
+	if args['replace'] == True:
+		live_device.load_replace_candidate(filename=filename, config=config_str)
+	else:
+		live_device.load_merge_candidate(filename=filename, config=config_str)
+
+	diffs = live_device.compare_config()
+	return(diffs)
+
+
+# with the push cache: skip a device if its candidate is what we last pushed to it, and for a merge only send
+# the sections that changed since. returns a dict with skip, the file to send, hashes to store once pushed, a message
+def plan_push(args, device_id, candidate_file):
+	with open(candidate_file, 'r') as f:
+		sections = config_sections.read_sections(f)
+
+	method = "replace" if args['replace'] else "merge"
+	plan = dict(skip=False, candidate_file=candidate_file, subset_file=None, method=method, hashes=config_sections.section_hashes(sections), message="")
+
+	pushed = None if args['force'] else config_sections.load_pushed(device_id)
+	if pushed is None:
+		return(plan)
+	stored, pushed_method, pushed_hashes = pushed
+	if pushed_method != method:
+		return(plan)
+
+	# a merge can't remove a section, so only new or changed ones matter. a replace has to match exactly
+	changed = config_sections.changed_sections(sections, pushed_hashes)
+	if not changed and (method == "merge" or set(pushed_hashes) == set(plan['hashes'])):
+		plan['skip'] = True
+		plan['message'] = "Unchanged since the " + method + " pushed at " + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stored)) + " (push cache in " + config.cache_file + "), the device wasn't checked. Use --force if it may have been changed by hand"
+	elif method == "merge" and changed:
+		plan['subset_file'] = write_candidate_file(text for key, text in changed)
+		plan['candidate_file'] = plan['subset_file']
+		plan['message'] = "Sending " + str(len(changed)) + " of " + str(len(sections)) + " sections, the rest are unchanged since the merge pushed at " + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stored)) + ". Use --force to send them all"
+	return(plan)
+
+
+def remove_subset_file(plan):
+	if plan is not None and plan['subset_file'] is not None:
+		os.remove(plan['subset_file'])
+	return()
+
+
+# all devices for a batch push, by id or by netbox filter
+def get_devices(args):
+	nb = sessions.netbox()
+	try:
+		if args['device_ids']:
+			nb_devices = list(nb.dcim.devices.filter(id=args['device_ids'], **args['filters']))
+		else:
+			nb_devices = list(nb.dcim.devices.filter(**args['filters']))
+	except pynetbox.RequestError as e:
+		print(e.error)
+		sys.exit(1)
 
-sanity, nb_device = get_device(args)
-if sanity == False:
-	print(message) 
-	sys.exit(1)
-else:
-	# if -c is set, read from that file
+	found = set(str(nb_device.id) for nb_device in nb_devices)
+	for device in args['device_ids']:
+		if device not in found:
+			print("Can't fetch netbox device " + device + ", skipping it")
+	return(sorted(nb_devices, key=lambda nb_device: str(nb_device.name)))
+
+
+# open, load and diff one device of a batch push. runs in a worker thread, so it returns what happened instead of printing or exiting
+def prepare_device(args, nb_device, candidate_file):
+	result = dict(device=nb_device, live_device=None, diffs=None, status="FAILED", message="", plan=None)
+	generated_file = None
+	try:
+		if candidate_file is None:
+			fetched, candidate_config = fetch_config_from_generator(config, args, nb_device.id)
+			if fetched == False:
+				result['message'] = candidate_config
+				return(result)
+			generated_file = write_candidate_file(io.StringIO(candidate_config))
+			candidate_file = generated_file
+
+		result['plan'] = plan_push(args, nb_device.id, candidate_file)
+		if result['plan']['skip']:
+			result['status'] = "UNCHANGED"
+			result['message'] = result['plan']['message']
+			return(result)
+
+		if not nb_device.primary_ip:
+			result['message'] = "No primary IP set in netbox"
+			return(result)
+		ip = str(nb_device.primary_ip).split("/")[0]
+
+		result['live_device'] = open_device(args, nb_device, ip)
+		facts = result['live_device'].get_facts()
+		if str(facts['model']) != str(nb_device.device_type):
+			result['message'] = "Netbox device type " + str(nb_device.device_type) + " does not match model " + str(facts['model'])
+		else:
+			result['diffs'] = get_diff(args, result['live_device'], filename=result['plan']['candidate_file'])
+			if result['diffs'] == "":
+				result['status'] = "NO CHANGES"
+				config_sections.store_pushed(nb_device.id, result['plan']['method'], result['plan']['hashes'])
+			else:
+				result['status'] = "PENDING"
+				result['message'] = str(len(result['diffs'].splitlines())) + " diff lines"
+				if result['plan']['subset_file'] is not None:
+					result['message'] += " (" + result['plan']['message'].split(",")[0].lower() + ")"
+	except Exception as e:
+		result['message'] = type(e).__name__ + ": " + str(e)
+	finally:
+		if generated_file is not None:
+			os.remove(generated_file)
+		remove_subset_file(result['plan'])
+
+	# nothing to commit, so don't hold the session open through the review
+	if result['status'] != "PENDING":
+		close_device(result)
+	return(result)
+
+
+# throw away the candidate and log out, ignoring errors from a session that may already be dead
+def close_device(result):
+	live_device = result['live_device']
+	result['live_device'] = None
+	if live_device is None:
+		return()
+	try:
+		live_device.discard_config()
+	except Exception:
+		sessions.release(live_device, reusable=False)
+		return()
+	sessions.release(live_device)
+	return()
+
+
+def commit_device(result):
+	try:
+		result['live_device'].commit_config()
+		result['status'] = "COMMITTED"
+		result['message'] = ""
+		config_sections.store_pushed(result['device'].id, result['plan']['method'], result['plan']['hashes'])
+	except Exception as e:
+		result['status'] = "FAILED"
+		result['message'] = "Commit failed: " + type(e).__name__ + ": " + str(e)
+	close_device(result)
+	return(result)
+
+
+# commit wave_size devices at a time. if anything in a wave fails, the rest are discarded
+def commit_waves(args, pending):
+	waves = [pending[start:start + args['wave_size']] for start in range(0, len(pending), args['wave_size'])]
+	for number, wave in enumerate(waves, start=1):
+		print("Committing wave " + str(number) + " of " + str(len(waves)) + ":", end='')
+		with concurrent.futures.ThreadPoolExecutor(max_workers=len(wave)) as pool:
+			list(pool.map(commit_device, wave))
+		for result in wave:
+			print(" " + str(result['device'].name) + (" (FAILED)" if result['status'] == "FAILED" else ""), end='')
+		print(" Done")
+
+		if any(result['status'] == "FAILED" for result in wave):
+			for later_wave in waves[number:]:
+				for result in later_wave:
+					close_device(result)
+					result['status'] = "SKIPPED"
+					result['message'] = "Not committed, a device in wave " + str(number) + " failed"
+			return(False)
+	return(True)
+
+
+def push_batch(args):
+	nb_devices = get_devices(args)
+	if not nb_devices:
+		print("No netbox devices to push to")
+		return(False)
+
+	# -c is the same config for every device, sanitize it once
+	candidate_file = None
 	if args['config'] is not None:
-		candidate_config = get_config_file(args['config'])
-	# otherwise, get from config generator
-	else: 
-		# perhaps do some sanity check on this to see if looks like a device config in some way
-		candidate_config = get_config_from_generator(config, args)
+		candidate_file = get_config_file(args['config'])
 
-ip = get_device_ip(args, nb_device)
+	method = "REPLACE" if args['replace'] else "MERGE"
+	print("Generating diffs for " + str(len(nb_devices)) + " devices using " + method + " method, " + str(args['workers']) + " at a time..")
+	print("")
 
-platform = (str(nb_device.platform).lower())
+	# the workers all connect, import napalm here rather than in several threads at once
+	lazy_modules.ready(napalm)
+
+	results = []
+	try:
+		with metrics.phase("prepare_devices"):
+			with concurrent.futures.ThreadPoolExecutor(max_workers=args['workers']) as pool:
+				futures = [pool.submit(prepare_device, args, nb_device, candidate_file) for nb_device in nb_devices]
+				for future in concurrent.futures.as_completed(futures):
+					result = future.result()
+					results.append(result)
+					print("\t" + str(result['device'].name) + "\t" + result['status'] + "\t" + result['message'])
+	finally:
+		if candidate_file is not None:
+			os.remove(candidate_file)
+	results.sort(key=lambda result: str(result['device'].name))
+
+	pending = [result for result in results if result['status'] == "PENDING"]
+	with diff_output(args) as (out, color):
+		for result in pending:
+			out.write("\n==== " + str(result['device'].name) + " ====\n")
+			write_diff(result['diffs'], out, color)
+
+	if pending:
+		yesno = input('\nApply changes to ' + str(len(pending)) + ' devices, ' + str(args['wave_size']) + ' at a time? [y/N] ').lower()
+		if (yesno == 'y') or (yesno == 'yes'):
+			with metrics.phase("commit_config"):
+				commit_waves(args, pending)
+		else:
+			print("Discarding changes..")
+			for result in pending:
+				close_device(result)
+				result['status'] = "DISCARDED"
+				result['message'] = ""
 
-driver = get_network_driver(platform)
+	print("")
+	print("Push summary:")
+	print("")
+	failed = 0
+	for result in results:
+		if result['status'] in ["FAILED", "SKIPPED"]:
+			failed += 1
+		print("\t" + str(result['device'].name) + "\t" + result['status'] + "\t" + result['message'])
+	print("")
+	print(str(len(results) - failed) + " succeeded, " + str(failed) + " failed")
+	print("")
 
-if platform == "ios":
-	optional_args = {
-		'global_delay_factor' : 2,
-	}
-else:
-	optional_args = {}
+	return(failed == 0)
 
-live_device = driver(
-	hostname	= ip,
-	username	= args['username'],
-	password	= args['password'],
-	optional_args	= optional_args
-)
-live_device.open()
 
-config_str = sanitize_config(candidate_config)
+def main():
+	args = parse_cli_args(config)
 
-if live_device.is_alive()['is_alive']:
-	facts = live_device.get_facts()
+	if args['refresh_cache']:
+		generator_cache.invalidate(config.generator_url)
 
-	# check if netbox type matches napalm model
+	if is_batch(args):
+		if push_batch(args) == False:
+			sys.exit(1)
+		return()
 
-	if str(facts['model']) == str(nb_device.device_type):
-		print("Netbox device we're retrieving config from: ")
-		if args['ip']: 
-			connectingto = args['ip']
-		else:
-			connectingto = nb_device.name
-		print("	 ", connectingto, "  (", nb_device.name, ")", sep="")
-		print("	", nb_device.device_type)
-		print("	", "Status: ", nb_device.status)
-		print("")
-		print("Device we're connected to is: ")
-		print("	", facts['hostname'])
-		print("	", facts['model'])
-		print("	", facts['serial_number'])
-		print("")
+	metrics.labels['device'] = args['device']
 
-		if args['replace'] == True:
-			print("Generating diff using REPLACE method..")
+	with metrics.phase("get_device"):
+		sanity, nb_device = get_device(args)
+	if sanity == False:
+		print("Can't fetch netbox device " + args['device'])
+		sys.exit(1)
+	else:
+		ip = get_device_ip(args, nb_device)
+
+		# if -c is set, read from that file
+		if args['config'] is not None:
+			candidate_file = get_config_file(args['config'])
+		# otherwise, get from config generator
+		else: 
+			# perhaps do some sanity check on this to see if looks like a device config in some way
+			with metrics.phase("get_config_from_generator"):
+				candidate_file = write_candidate_file(io.StringIO(get_config_from_generator(config, args)))
+
+	plan = None
+	try:
+		plan = plan_push(args, nb_device.id, candidate_file)
+		if plan['skip']:
+			print("Skipping. " + plan['message'])
 			print("")
-			live_device.load_replace_candidate(config=config_str)
-		else:
-			print("Generating diff using MERGE method..")
+			return()
+		if plan['message']:
+			print(plan['message'])
 			print("")
-			live_device.load_merge_candidate(config=config_str)
-
-		diffs = live_device.compare_config()
 
-		if diffs == "":
-			print("No configuration changes required")
-		else:
-			color_diff = color_diff(diffs)
-			print(color_diff)
-
-			yesno = input('\nApply changes to ' + ip + '? [y/N] ').lower()
-			if (yesno == 'y') or (yesno == 'yes'):
-				print("Applying changes..")
-				live_device.commit_config()
-			else:
-				print("Discarding changes..")
+		if push_device(args, nb_device, ip, plan['candidate_file']):
+			config_sections.store_pushed(nb_device.id, plan['method'], plan['hashes'])
+	finally:
+		os.remove(candidate_file)
+		remove_subset_file(plan)
+
+
+# diff and (after asking) commit a single device. True if the device now has the candidate config
+def push_device(args, nb_device, ip, candidate_file):
+	pushed = False
+	with metrics.phase("open_device"):
+		live_device = open_device(args, nb_device, ip)
+
+	# a session kept for the next job (netbox-daemon.py) has to go back with no candidate loaded and no config
+	# lock held. after an error we can't tell, so it's closed instead
+	reusable = False
+	try:
+		if live_device.is_alive()['is_alive']:
+			with metrics.getter("get_facts"):
+				facts = live_device.get_facts()
+
+			# check if netbox type matches napalm model
+
+			if str(facts['model']) == str(nb_device.device_type):
+				print("Netbox device we're retrieving config from: ")
+				if args['ip']: 
+					connectingto = args['ip']
+				else:
+					connectingto = nb_device.name
+				print("	 ", connectingto, "  (", nb_device.name, ")", sep="")
+				print("	", nb_device.device_type)
+				print("	", "Status: ", nb_device.status)
+				print("")
+				print("Device we're connected to is: ")
+				print("	", facts['hostname'])
+				print("	", facts['model'])
+				print("	", facts['serial_number'])
+				print("")
+
+				if args['replace'] == True:
+					print("Generating diff using REPLACE method..")
+				else:
+					print("Generating diff using MERGE method..")
+				print("")
+
+				with metrics.phase("get_diff"):
+					diffs = get_diff(args, live_device, filename=candidate_file)
+
+				if diffs == "":
+					print("No configuration changes required")
+					live_device.discard_config()
+					pushed = True
+				else:
+					with diff_output(args) as (out, color):
+						write_diff(diffs, out, color)
+
+					yesno = input('\nApply changes to ' + ip + '? [y/N] ').lower()
+					if (yesno == 'y') or (yesno == 'yes'):
+						print("Applying changes..")
+						with metrics.phase("commit_config"):
+							live_device.commit_config()
+						pushed = True
+					else:
+						print("Discarding changes..")
+						live_device.discard_config()
+					print("")
+					print("Complete")
+					print("")
+			else: 
+				print("Abort! Netbox device type:", nb_device.device_type,  "does not match model we're connecting to:", facts['model'])
+				print("")
 				live_device.discard_config()
-			print("")
-			print("Complete")
-			print("")
-	else: 
-		print("Abort! Netbox device type:", nb_device.device_type,  "does not match model we're connecting to:", facts['model'])
-		print("")
+			reusable = True
+	finally:
+		sessions.release(live_device, reusable=reusable)
+	return(pushed)
+
 
-live_device.close()
+if __name__ == "__main__":
+	metrics.run("netbox-to-device", main)
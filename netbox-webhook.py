@@ -0,0 +1,308 @@
+#! /usr/bin/env python3
+#
+#	listen for netbox webhooks and push config to the devices they touch, using netbox-to-device.py
+#	https://github.com/falz/netbox-device-scripts
+#
+# dependencies:
+#	pip install argparse json getpass napalm pynetbox
+#
+# changelog:
+#	2026-10-17	first version. device, interface and IP address webhooks are mapped to device ids. edits to a
+#			device are coalesced until none have arrived for config.webhook_debounce seconds, then it gets
+#			one diff (and push with --commit), config.webhook_workers devices at a time
+#
+# usage:
+#	in netbox, add a webhook for devices, interfaces and IP addresses (created, updated, deleted) with the url
+#	http://<this host>:<webhook_port>/ and the same secret as config.webhook_secret, then:
+#
+#	./netbox-webhook.py				log the diff for each changed device and discard it
+#	./netbox-webhook.py --commit			commit it too, only with webhook_secret set
+#
+# issues / todo:
+#	only device, interface and IP address changes are followed, not config contexts or templates
+
+import argparse
+import concurrent.futures
+import getpass
+import hashlib
+import hmac
+import http.server
+import json
+import lazy_modules
+import metrics
+import script_loader
+import sessions
+import threading
+import time
+import config as config
+
+napalm =	lazy_modules.load("napalm")
+pynetbox =	lazy_modules.load("pynetbox")
+
+## see config.py for config
+
+ntd = script_loader.load_script("netbox-to-device")
+
+# device id -> [first event, last event] for devices waiting out the debounce
+pending = {}
+# devices being pushed, and those changed again meanwhile (pushed once more afterwards)
+running = set()
+dirty = set()
+lock = threading.Lock()
+# content type id -> "app_label.model", read from netbox the first time a snapshot needs one
+content_types = {}
+
+
+def parse_cli_args(config):
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-u', '--username', required=False, help='Username. Used for both the config generator and device login. Defaults to shell username.')
+	parser.add_argument('-l', '--listen',	required=False, default=config.webhook_listen, help='Address to listen on. Defaults to ' + str(config.webhook_listen))
+	parser.add_argument('-p', '--port',	required=False, type=int, default=config.webhook_port, help='Port to listen on. Defaults to ' + str(config.webhook_port))
+	parser.add_argument('-w', '--workers',	required=False, type=int, default=config.webhook_workers, help='Number of devices to diff / push at once. Defaults to ' + str(config.webhook_workers))
+	parser.add_argument('--debounce',	required=False, type=float, default=config.webhook_debounce, help='Seconds without changes to a device before it is pushed. Defaults to ' + str(config.webhook_debounce))
+	parser.add_argument('-r', '--replace',	required=False, action='store_true', help='Config REPLACE instead of config MERGE (default). Danger, for Testing!')
+	parser.add_argument('--commit',		required=False, action='store_true', help='Commit the changes. Without it diffs are logged and discarded')
+
+	args = vars(parser.parse_args())
+
+	# without the secret anyone who can reach the port could have configs pushed
+	if args['commit'] and not config.webhook_secret:
+		parser.error("--commit needs webhook_secret set in config.py (and the same secret on the netbox webhook)")
+
+	username = args['username']
+	if username is None:
+		username = getpass.getuser()
+		args['username'] = username
+
+	print("")
+	args['password'] = getpass.getpass("Password for user \"" + username + "\" to log in to devices and the config generator: ")
+
+	# what netbox-to-device.py's batch functions expect
+	args['force'] = False
+	args['filters'] = {}
+	args['device_ids'] = []
+	return(args)
+
+
+def log(message):
+	print(time.strftime("%Y-%m-%d %H:%M:%S") + "\t" + message, flush=True)
+
+
+# a nested object ({'id': ..}) or a plain id, as found in webhook data and snapshots
+def object_id(value):
+	if isinstance(value, dict):
+		value = value.get('id')
+	if value is None:
+		return(None)
+	return(int(value))
+
+
+# an object type as "app_label.model". webhook data has it like that, snapshots have the content type id
+def object_type(nb, value):
+	if value is None or not str(value).isdigit():
+		return(value)
+	if not content_types:
+		try:
+			# netbox 4 moved content types to core/object-types
+			if int(str(nb.version).split(".")[0]) >= 4:
+				records = nb.core.object_types.all()
+			else:
+				records = nb.extras.content_types.all()
+			content_types.update({int(record.id): str(record.app_label) + "." + str(record.model) for record in records})
+		except pynetbox.RequestError as e:
+			log("Can't look up content types: " + str(e.error))
+	return(content_types.get(int(value)))
+
+
+# ids of the devices a device / interface / IP address (as in a webhook's data or snapshot) belongs to.
+# interfaces whose device needs looking up, like an IP's old interface in a snapshot, are added to interfaces
+def object_devices(nb, model, values, interfaces):
+	devices = set()
+	if not values:
+		return(devices)
+
+	if model == "device":
+		devices.add(object_id(values.get('id')))
+	elif model == "interface":
+		devices.add(object_id(values.get('device')))
+	elif model == "ipaddress":
+		assigned = values.get('assigned_object')
+		if isinstance(assigned, dict):
+			if values.get('assigned_object_type') in ["dcim.interface", None]:
+				devices.add(object_id(assigned.get('device')))
+		elif values.get('assigned_object_id') is not None and object_type(nb, values.get('assigned_object_type')) == "dcim.interface":
+			# snapshots only have the interface id, and the object type as a content type id.
+			# vm interfaces and fhrp groups aren't on a device
+			interfaces.add(int(values['assigned_object_id']))
+	devices.discard(None)
+	return(devices)
+
+
+# device ids a webhook affects: the object's device now and, from the prechange snapshot, the one it was on
+def affected_devices(nb, payload):
+	model = payload.get('model')
+	interfaces = set()
+	devices = object_devices(nb, model, payload.get('data'), interfaces)
+
+	snapshots = payload.get('snapshots') or {}
+	prechange = snapshots.get('prechange')
+	if isinstance(prechange, dict) and model in ["interface", "ipaddress"]:
+		old_interfaces = set()
+		old_devices = object_devices(nb, model, prechange, old_interfaces)
+		devices |= old_devices
+		current = object_id((payload.get('data') or {}).get('assigned_object'))
+		interfaces |= {interface for interface in old_interfaces if interface != current}
+
+	if interfaces:
+		try:
+			for interface in nb.dcim.interfaces.filter(id=sorted(interfaces)):
+				devices.add(object_id(dict(interface).get('device')))
+		except pynetbox.RequestError as e:
+			log("Can't look up interfaces " + str(sorted(interfaces)) + ": " + str(e.error))
+	devices.discard(None)
+	return(devices)
+
+
+# a burst of changes to one device keeps pushing back its deadline
+def note_changes(devices):
+	now = time.time()
+	with lock:
+		for device in devices:
+			if device in running:
+				dirty.add(device)
+			elif device in pending:
+				pending[device][1] = now
+			else:
+				pending[device] = [now, now]
+	return()
+
+
+# devices whose debounce is over, or that have waited config.webhook_max_wait. marked as running
+def take_due(args):
+	now = time.time()
+	due = []
+	with lock:
+		for device, (first, last) in list(pending.items()):
+			if now - last >= args['debounce'] or now - first >= config.webhook_max_wait:
+				due.append(device)
+				del pending[device]
+				running.add(device)
+	return(due)
+
+
+def finished(device):
+	with lock:
+		running.discard(device)
+		if device in dirty:
+			dirty.discard(device)
+			now = time.time()
+			pending[device] = [now, now]
+	return()
+
+
+# diff one device with netbox-to-device.py's batch functions (generator -> load candidate -> compare), commit with --commit
+def push_device(args, nb_device):
+	try:
+		result = ntd.prepare_device(args, nb_device, None)
+		if result['status'] == "PENDING":
+			lines = [str(nb_device.name) + " diff:"]
+			lines.extend("\t" + line for line in result['diffs'].splitlines())
+			log("\n".join(lines))
+			if args['commit']:
+				ntd.commit_device(result)
+			else:
+				ntd.close_device(result)
+				result['status'] = "DISCARDED"
+				result['message'] = "Not committed, run with --commit to push"
+		log(str(nb_device.name) + "\t" + result['status'] + "\t" + result['message'])
+	except Exception as e:
+		log(str(nb_device.name) + "\tFAILED\t" + type(e).__name__ + ": " + str(e))
+	finally:
+		finished(nb_device.id)
+	return()
+
+
+# hands due devices to the workers, one push per device however many changes it had
+def dispatch(args, pool):
+	while True:
+		time.sleep(min(1.0, max(0.1, args['debounce'] / 4)))
+		sessions.expire()
+		due = take_due(args)
+		if not due:
+			continue
+
+		log("Pushing to devices " + ", ".join(str(device) for device in sorted(due)))
+		device_args = dict(args, device_ids=[str(device) for device in due])
+		try:
+			nb_devices = ntd.get_devices(device_args)
+		except (SystemExit, Exception):
+			log("Can't fetch devices " + ", ".join(str(device) for device in due) + " from netbox")
+			nb_devices = []
+
+		found = set()
+		for nb_device in nb_devices:
+			found.add(nb_device.id)
+			pool.submit(push_device, args, nb_device)
+		# deleted since, or the lookup failed
+		for device in due:
+			if device not in found:
+				finished(device)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+	def do_POST(self):
+		body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+		if config.webhook_secret:
+			expected = hmac.new(config.webhook_secret.encode(), body, hashlib.sha512).hexdigest()
+			if not hmac.compare_digest(expected, self.headers.get('X-Hook-Signature') or ""):
+				self.send_response(401)
+				self.end_headers()
+				return()
+
+		try:
+			payload = json.loads(body)
+		except ValueError:
+			self.send_response(400)
+			self.end_headers()
+			return()
+
+		devices = affected_devices(sessions.netbox(), payload)
+		note_changes(devices)
+		self.send_response(202)
+		self.end_headers()
+		return()
+
+	# one line per request would drown out the pushes
+	def log_message(self, format, *args):
+		pass
+
+
+def main():
+	args = parse_cli_args(config)
+
+	# keep device sessions between pushes, closing them after config.session_idle_timeout
+	sessions.keep_devices = True
+	# the workers all connect, import napalm here rather than in several threads at once
+	lazy_modules.ready(napalm)
+	lazy_modules.ready(pynetbox)
+
+	server = http.server.ThreadingHTTPServer((args['listen'], args['port']), Handler)
+	pool = concurrent.futures.ThreadPoolExecutor(max_workers=args['workers'])
+	threading.Thread(target=dispatch, args=(args, pool), daemon=True).start()
+
+	method = "REPLACE" if args['replace'] else "MERGE"
+	log("Listening on " + args['listen'] + ":" + str(args['port']) + ", " + method + " method, " + ("committing" if args['commit'] else "diffs only"))
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+		pool.shutdown(wait=True)
+		sessions.expire(everything=True)
+	log("Stopped")
+
+
+if __name__ == "__main__":
+	metrics.run("netbox-webhook", main)
@@ -0,0 +1,252 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	asyncio netbox client so independent reads can overlap instead of waiting on each other. each process
+#	has one event loop (in its own thread) with one aiohttp session on it, so connections stay pooled from
+#	one batch of work to the next. the session is closed at exit, and a forked child starts its own.
+#	a semaphore caps how many requests a batch has in flight and failed GETs (connection errors, 429,
+#	5xx) are retried with backoff. TLS is checked the way pynetbox's requests session does it.
+#
+#	takes pynetbox endpoints (ie nb.dcim.sites) so urls match what pynetbox uses, and hands back the same
+#	record objects pynetbox would. falls back to plain pynetbox if aiohttp isn't installed or
+#	config.netbox_async is off, see enabled().
+#
+# dependencies:
+#	pip install aiohttp
+
+import atexit
+import json
+import lazy_modules
+import os
+import ssl
+import threading
+import time
+import config as config
+import metrics
+import netbox_cache
+import sessions
+
+asyncio =	lazy_modules.load("asyncio")
+# None if it isn't installed
+aiohttp =	lazy_modules.load("aiohttp")
+requests =	lazy_modules.load("requests")
+
+## see config.py for config
+
+retry_statuses = [429, 502, 503, 504]
+
+# the process's event loop, the thread running it and the aiohttp session on it, made when first needed
+loop = None
+loop_thread = None
+client = None
+state_lock = threading.Lock()
+
+
+def enabled():
+	return(config.netbox_async and aiohttp is not None)
+
+
+def event_loop():
+	global loop, loop_thread
+	with state_lock:
+		if loop is None:
+			loop = asyncio.new_event_loop()
+			loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+			loop_thread.start()
+		return(loop)
+
+
+# run a coroutine from the (synchronous) scripts, on the process's loop so its session can be used again
+def run(coroutine):
+	return(asyncio.run_coroutine_threadsafe(coroutine, event_loop()).result())
+
+
+# close the session and stop the loop
+def shutdown():
+	global loop, loop_thread, client
+	with state_lock:
+		if loop is None:
+			return()
+		if client is not None:
+			try:
+				asyncio.run_coroutine_threadsafe(client.close(), loop).result(timeout=10)
+			except Exception:
+				pass
+		loop.call_soon_threadsafe(loop.stop)
+		loop_thread.join(timeout=10)
+		if not loop.is_running():
+			loop.close()
+		loop, loop_thread, client = None, None, None
+	return()
+
+
+# in a forked child. the parent's loop thread didn't come along and its connections are the parent's
+def forked():
+	global loop, loop_thread, client, state_lock
+	loop, loop_thread, client = None, None, None
+	state_lock = threading.Lock()
+	return()
+
+
+atexit.register(shutdown)
+os.register_at_fork(after_in_child=forked)
+
+
+# the TLS settings of pynetbox's requests session: session.verify / session.cert, and like requests the
+# REQUESTS_CA_BUNDLE or CURL_CA_BUNDLE environment variables
+def ssl_context(http_session):
+	verify = http_session.verify
+	if verify is True and http_session.trust_env:
+		verify = os.environ.get('REQUESTS_CA_BUNDLE') or os.environ.get('CURL_CA_BUNDLE') or True
+	if verify is False:
+		return(False)
+	if verify is True:
+		verify = requests.certs.where()
+
+	if os.path.isdir(verify):
+		context = ssl.create_default_context(capath=verify)
+	else:
+		context = ssl.create_default_context(cafile=verify)
+	if http_session.cert:
+		if isinstance(http_session.cert, (list, tuple)):
+			context.load_cert_chain(*http_session.cert)
+		else:
+			context.load_cert_chain(http_session.cert)
+	return(context)
+
+
+# the process's aiohttp session. only called on the loop's thread
+async def client_session():
+	global client
+	if client is None or client.closed:
+		connector = aiohttp.TCPConnector(limit=config.async_concurrency, keepalive_timeout=60, ssl=ssl_context(sessions.netbox().http_session))
+		client = aiohttp.ClientSession(connector=connector)
+	return(client)
+
+
+# objects by id once each, in case something was added or deleted between reading two pages
+def unique_results(results):
+	seen = set()
+	unique = []
+	for values in results:
+		if values.get('id') not in seen:
+			seen.add(values.get('id'))
+			unique.append(values)
+	return(unique)
+
+
+class AsyncRequestError(Exception):
+	def __init__(self, status, url, error):
+		self.status = status
+		self.url = url
+		self.error = error
+		super().__init__("The request failed with code " + str(status) + ": " + str(error))
+
+
+class AsyncNetbox():
+	def __init__(self, token=None, concurrency=None, retries=None, timeout=None, page_size=None):
+		self.token =		token if token is not None else config.netbox_api_token
+		self.concurrency =	concurrency if concurrency is not None else config.async_concurrency
+		self.retries =		retries if retries is not None else config.async_retries
+		self.timeout =		timeout if timeout is not None else config.request_timeout
+		self.page_size =	page_size if page_size is not None else config.netbox_page_size
+		self.headers = {
+			'Authorization':	"Token " + self.token,
+			'Accept':		"application/json",
+		}
+		self.session =		None
+		self.semaphore =	None
+
+	async def __aenter__(self):
+		self.session = await client_session()
+		self.semaphore = asyncio.Semaphore(self.concurrency)
+		return(self)
+
+	# the session stays open for the next batch
+	async def __aexit__(self, *exc):
+		self.session = None
+
+	async def request(self, method, url, params=None, payload=None):
+		# aiohttp wants strings for query params, and repeated keys for lists
+		if params is not None:
+			params = [(key, str(val)) for key, vals in params.items() for val in (vals if isinstance(vals, list) else [vals])]
+
+		attempt = 0
+		while True:
+			try:
+				async with self.semaphore:
+					start = time.perf_counter()
+					async with self.session.request(method, url, params=params, json=payload, headers=self.headers, timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+						text = await response.text()
+						metrics.record_request(method, url, response.status, time.perf_counter() - start, len(text) + len(json.dumps(payload) if payload is not None else ""))
+						if response.status in retry_statuses and method == "GET" and attempt < self.retries:
+							raise aiohttp.ClientResponseError(response.request_info, response.history, status=response.status)
+						try:
+							body = json.loads(text) if text else None
+						except ValueError:
+							body = text
+						if response.status >= 400:
+							raise AsyncRequestError(response.status, url, body)
+						return(body)
+			except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+				# only reads are safe to send again
+				if method != "GET" or attempt >= self.retries:
+					raise AsyncRequestError(getattr(e, 'status', None), url, str(e) or type(e).__name__)
+			await asyncio.sleep(0.5 * 2 ** attempt)
+			attempt += 1
+
+	def hydrate(self, endpoint, values):
+		return(netbox_cache.hydrate(endpoint, values))
+
+	# all records matching filters. the first page gives the count, then the rest of the pages are read at once
+	async def filter(self, endpoint, **filters):
+		url = endpoint.url + "/"
+		first = await self.request("GET", url, params=dict(filters, limit=self.page_size, offset=0))
+		results = list(first['results'])
+
+		if first.get('next') and results:
+			# netbox caps limit at its MAX_PAGE_SIZE, go by what it actually sent
+			size = len(results)
+			pages = await asyncio.gather(*[self.request("GET", url, params=dict(filters, limit=size, offset=offset)) for offset in range(size, first['count'], size)])
+			for page in pages:
+				results.extend(page['results'])
+		return([self.hydrate(endpoint, values) for values in unique_results(results)])
+
+	# same as pynetbox's endpoint.get(): one record, None, or an error if more than one matches
+	async def get(self, endpoint, *id, **filters):
+		if id:
+			try:
+				return(self.hydrate(endpoint, await self.request("GET", endpoint.url + "/" + str(id[0]) + "/")))
+			except AsyncRequestError as e:
+				if e.status == 404:
+					return(None)
+				raise
+
+		records = await self.filter(endpoint, **filters)
+		if len(records) > 1:
+			raise ValueError("get() returned more than one result. Check that the kwarg(s) passed are valid for this endpoint or use filter() or all() instead.")
+		return(records[0] if records else None)
+
+	# get() through netbox_cache, for sites, tenants, roles, platforms and device types
+	async def cached_get(self, endpoint, **filters):
+		key = netbox_cache.cache_key(endpoint, filters)
+		values = netbox_cache.load(key)
+		if values is not None:
+			return(self.hydrate(endpoint, values))
+
+		record = await self.get(endpoint, **filters)
+		if record is not None:
+			netbox_cache.store(key, dict(record))
+		return(record)
+
+	# list(filter()) through netbox_cache
+	async def cached_filter(self, endpoint, **filters):
+		key = "filter:" + netbox_cache.cache_key(endpoint, filters)
+		values = netbox_cache.load(key)
+		if values is not None:
+			return([self.hydrate(endpoint, value) for value in values])
+
+		records = await self.filter(endpoint, **filters)
+		netbox_cache.store(key, [dict(record) for record in records])
+		return(records)
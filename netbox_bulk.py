@@ -0,0 +1,114 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	bulk helpers shared by the netbox device scripts. netbox takes a list on its create and update
+#	endpoints, so many objects can go in one request instead of one request each. big reads go a
+#	config.netbox_page_size page at a time, with the pages after the first read at once.
+
+import lazy_modules
+import config as config
+import netbox_async
+
+pynetbox =	lazy_modules.load("pynetbox")
+
+## see config.py for config
+
+
+def chunked(items, size):
+	for start in range(0, len(items), size):
+		yield items[start:start + size]
+
+
+# netbox answers a failed bulk create with a list of error dicts in the same order as the payload (empty dict = ok)
+def bulk_errors(e, payload):
+	try:
+		errors = e.req.json()
+	except (AttributeError, ValueError):
+		return(None)
+
+	if isinstance(errors, list) and len(errors) == len(payload):
+		return(errors)
+	return(None)
+
+
+def _bulk_send(send, payloads, label, chunk_size):
+	if chunk_size is None:
+		chunk_size = config.bulk_chunk_size
+
+	done = []
+	failed = {}
+	for chunk in chunked(payloads, chunk_size):
+		try:
+			done.extend(send(chunk))
+		except pynetbox.RequestError as e:
+			errors = bulk_errors(e, chunk)
+			if errors is None:
+				# a bulk PATCH or DELETE only gets one error back for the whole request. split the chunk
+				# until the bad items are on their own, so the good ones still go through
+				if len(chunk) > 1 and getattr(e.req, 'status_code', None) in [400, 404]:
+					half = (len(chunk) + 1) // 2
+					for part in [chunk[:half], chunk[half:]]:
+						part_done, part_failed = _bulk_send(send, part, label, half)
+						done.extend(part_done)
+						failed.update(part_failed)
+				else:
+					for item in chunk:
+						failed[label(item)] = e.error
+				continue
+
+			# the whole chunk is rolled back when any item fails, so resend only the good ones
+			retry = []
+			for item, error in zip(chunk, errors):
+				if error:
+					failed[label(item)] = error
+				else:
+					retry.append(item)
+
+			if retry:
+				retry_done, retry_failed = _bulk_send(send, retry, label, chunk_size)
+				done.extend(retry_done)
+				failed.update(retry_failed)
+
+	return(done, failed)
+
+
+# create objects in chunks. returns (list of created records, dict of key -> error for the ones that failed).
+# key is a payload field, or a function of the payload when the field alone isn't unique
+def bulk_create(endpoint, payloads, key='name', chunk_size=None):
+	label = key if callable(key) else lambda item: item[key]
+	return(_bulk_send(endpoint.create, payloads, label, chunk_size))
+
+
+# PATCH objects in chunks, each payload needs an 'id'. labels maps id -> name for error output
+def bulk_update(endpoint, payloads, labels=None, chunk_size=None):
+	if labels is None:
+		labels = {}
+	return(_bulk_send(endpoint.update, payloads, lambda item: labels.get(item['id'], str(item['id'])), chunk_size))
+
+
+# every record matching filters, as a list. the first page gives the count, then the rest of the pages are read at
+# once: over aiohttp when netbox_async is on, otherwise by pynetbox (threading is on in sessions.netbox()).
+# raises pynetbox.RequestError or netbox_async.AsyncRequestError
+def fetch_records(endpoint, page_size=None, **filters):
+	if page_size is None:
+		page_size = config.netbox_page_size
+
+	if netbox_async.enabled():
+		return(netbox_async.run(fetch_records_async(endpoint, page_size, filters)))
+	return(list(endpoint.filter(limit=page_size, **filters)))
+
+
+async def fetch_records_async(endpoint, page_size, filters):
+	async with netbox_async.AsyncNetbox(page_size=page_size) as anb:
+		return(await anb.filter(endpoint, **filters))
+
+
+# same as fetch_records, as a dict of key -> record. key is a function of the record, str() gives the name
+def fetch_all(endpoint, key=str, page_size=None, **filters):
+	return({key(record): record for record in fetch_records(endpoint, page_size, **filters)})
+
+
+# DELETE records in chunks. returns (list of deleted records, dict of name -> error for the ones that failed)
+def bulk_delete(endpoint, records, chunk_size=None):
+	return(_bulk_send(lambda chunk: chunk if endpoint.delete(chunk) else [], records, str, chunk_size))
@@ -0,0 +1,92 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	on-disk cache for slow changing netbox objects (sites, tenants, roles, platforms, device types).
+#	stored in sqlite so several scripts / processes can share it. entries are keyed by the full api url
+#	and filters, so different netbox installs don't mix, and expire after config.cache_ttl seconds.
+
+from contextlib import closing
+import json
+import os
+import sqlite3
+import time
+import config as config
+
+## see config.py for config
+
+
+def connect():
+	path = os.path.expanduser(config.cache_file)
+	directory = os.path.dirname(path)
+	if directory:
+		os.makedirs(directory, exist_ok=True)
+	connection = sqlite3.connect(path, timeout=30)
+	connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, stored REAL, value TEXT)")
+	return(connection)
+
+
+def cache_key(endpoint, filters):
+	return(endpoint.url + "?" + "&".join(str(key) + "=" + str(val).lower() for key, val in sorted(filters.items())))
+
+
+def load(key):
+	if config.cache_ttl <= 0:
+		return(None)
+	with closing(connect()) as connection:
+		row = connection.execute("SELECT stored, value FROM cache WHERE key = ?", (key,)).fetchone()
+	if row is None or time.time() - row[0] > config.cache_ttl:
+		return(None)
+	return(json.loads(row[1]))
+
+
+def store(key, value):
+	if config.cache_ttl <= 0:
+		return()
+	with closing(connect()) as connection:
+		with connection:
+			connection.execute("INSERT OR REPLACE INTO cache (key, stored, value) VALUES (?, ?, ?)", (key, time.time(), json.dumps(value)))
+	return()
+
+
+# turn cached values back in to the same record objects pynetbox would have returned
+def hydrate(endpoint, values):
+	return(endpoint.return_obj(values, endpoint.api, endpoint))
+
+
+# like endpoint.get(**filters), but from the cache if we looked it up recently. misses (None) are not cached
+def cached_get(endpoint, **filters):
+	key = cache_key(endpoint, filters)
+	values = load(key)
+	if values is not None:
+		return(hydrate(endpoint, values))
+
+	record = endpoint.get(**filters)
+	if record is not None:
+		store(key, dict(record))
+	return(record)
+
+
+# like list(endpoint.filter(**filters))
+def cached_filter(endpoint, **filters):
+	key = "filter:" + cache_key(endpoint, filters)
+	values = load(key)
+	if values is not None:
+		return([hydrate(endpoint, value) for value in values])
+
+	records = list(endpoint.filter(**filters))
+	store(key, [dict(record) for record in records])
+	return(records)
+
+
+# drop everything cached for a netbox install (or everything if url is None). compared as a plain prefix,
+# LIKE would take the _ and % an url can have as wildcards
+def invalidate(url=None):
+	with closing(connect()) as connection:
+		with connection:
+			if url is None:
+				connection.execute("DELETE FROM cache")
+			else:
+				for prefix in [url, "filter:" + url]:
+					connection.execute("DELETE FROM cache WHERE substr(key, 1, length(?)) = ?", (prefix, prefix))
+	return()
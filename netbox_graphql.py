@@ -0,0 +1,221 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	optional graphql read path. one POST to netbox's /graphql/ brings back a device with its interfaces,
+#	their IPs, primary IPs, platform and the interface templates of its device type (plus any IPs looked up
+#	by address), instead of a REST request for each. results are turned back in to the same pynetbox records
+#	the REST calls return, so the scripts don't care which path was used.
+#
+#	records a script wants to read again later can be prefetch()ed and are handed out once by filter() /
+#	take() in place of the REST filter that would have read them. off unless config.netbox_graphql is set.
+#	the queries are written against the netbox 4.0 - 4.2 schema, so netbox's version is checked once and
+#	any other version reads through REST. a failed query falls back to REST too.
+
+import lazy_modules
+import re
+import config as config
+import netbox_bulk
+import netbox_cache
+import sessions
+
+requests =	lazy_modules.load("requests")
+
+## see config.py for config
+
+# fields netbox's REST api returns as {'value': .., 'label': ..}
+choice_fields = ['type', 'status', 'role']
+
+# what a graphql assigned_object is, as REST's assigned_object_type
+assigned_types = {
+	'InterfaceType':	'dcim.interface',
+	'VMInterfaceType':	'virtualization.vminterface',
+	'FHRPGroupType':	'ipam.fhrpgroup',
+}
+
+device_query = """
+	device(id: $device) {
+		id name serial status
+		device_type { id model slug interfacetemplates { id name label description type } }
+		platform { id name slug }
+		site { id name slug }
+		tenant { id name slug }
+		primary_ip4 { id address }
+		primary_ip6 { id address }
+		interfaces {
+			id name label description type enabled mtu
+			ip_addresses { id address status role description tenant { id name } vrf { id name } }
+		}
+	}
+"""
+
+ip_query = """
+	ip_address_list(filters: {address: $addresses}) {
+		id address status role description tenant { id name } vrf { id name }
+		assigned_object { __typename ... on InterfaceType { id name device { id name } } }
+	}
+"""
+
+# netbox versions (major, minor) with the schema the queries are written for
+schema_versions = [(4, 0), (4, 1), (4, 2)]
+
+# records from the last query, handed out once in place of a REST filter
+prefetched = {}
+
+# netbox url -> whether its schema matches, checked once
+schema_matches = {}
+
+
+def enabled(nb):
+	if not config.netbox_graphql:
+		return(False)
+	if nb.base_url not in schema_matches:
+		version = sessions.netbox_version(nb)
+		matches = version in schema_versions
+		if not matches:
+			print(" (graphql needs netbox 4.0 - 4.2, this is " + (".".join(str(part) for part in version) if version else "unknown") + ". Using REST)", end='')
+		schema_matches[nb.base_url] = matches
+	return(schema_matches[nb.base_url])
+
+
+class GraphQLError(Exception):
+	def __init__(self, status, error):
+		self.status = status
+		self.error = error
+		super().__init__("The graphql query failed with code " + str(status) + ": " + str(error))
+
+
+# POST a query with pynetbox's session (so metrics see it), returns the data dict
+def query(nb, text, variables):
+	headers = {
+		'Authorization':	"Token " + str(nb.token),
+		'Content-Type':		"application/json",
+		'Accept':		"application/json",
+	}
+	url = nb.base_url.rsplit("/api", 1)[0] + "/graphql/"
+	response = nb.http_session.post(url, json=dict(query=text, variables=variables), headers=headers, timeout=config.request_timeout)
+
+	try:
+		result = response.json()
+	except ValueError:
+		raise GraphQLError(response.status_code, response.text[:200])
+
+	if response.status_code != 200 or result.get('errors'):
+		raise GraphQLError(response.status_code, [error.get('message') for error in result.get('errors') or []] or result)
+	return(result['data'])
+
+
+# netbox 4 returns choices as enum names (ie TYPE_1000BASE_T), turn them back in to the REST value
+def choice_value(endpoint, field, value):
+	if not isinstance(value, str) or not value.isupper():
+		return(value)
+
+	key = "choices:" + endpoint.url
+	choices = netbox_cache.load(key)
+	if choices is None:
+		choices = {name: [choice['value'] for choice in val] for name, val in endpoint.choices().items()}
+		netbox_cache.store(key, choices)
+
+	names = {re.sub(r'[^A-Z0-9]', '_', str(choice).upper()): choice for choice in choices.get(field, [])}
+	if value in names:
+		return(names[value])
+	return(names.get(value.split("_", 1)[-1], value.lower()))
+
+
+# a graphql object in the shape REST returns it
+def rest_values(endpoint, values):
+	rest = {}
+	for field, val in values.items():
+		if field in ['interfacetemplates', 'interfaces', 'ip_addresses', '__typename']:
+			continue
+		if field in choice_fields and isinstance(val, str):
+			val = choice_value(endpoint, field, val)
+			rest[field] = {'value': val, 'label': val}
+		elif field == 'assigned_object' and isinstance(val, dict):
+			rest['assigned_object_type'] = assigned_types.get(val.get('__typename'))
+			rest['assigned_object_id'] = int(val['id']) if val.get('id') is not None else None
+			rest[field] = {key: nested for key, nested in val.items() if key != '__typename'}
+		elif field == 'id':
+			rest[field] = int(val)
+		elif isinstance(val, dict):
+			nested = dict(val)
+			if 'id' in nested:
+				nested['id'] = int(nested['id'])
+			for display_field in ['name', 'model', 'address']:
+				if display_field in nested:
+					nested.setdefault('display', nested[display_field])
+					break
+			rest[field] = nested
+		else:
+			rest[field] = val
+	rest['url'] = endpoint.url + "/" + str(rest['id']) + "/"
+	return(rest)
+
+
+def record(endpoint, values):
+	return(netbox_cache.hydrate(endpoint, rest_values(endpoint, values)))
+
+
+def prefetch(endpoint, records, **filters):
+	prefetched[netbox_cache.cache_key(endpoint, filters)] = records
+
+
+# prefetched records for these filters (once), or None
+def take(endpoint, **filters):
+	return(prefetched.pop(netbox_cache.cache_key(endpoint, filters), None))
+
+
+# like netbox_bulk.fetch_records(endpoint, **filters), from the last graphql query if it brought these back
+def filter(endpoint, **filters):
+	records = take(endpoint, **filters)
+	if records is None:
+		records = netbox_bulk.fetch_records(endpoint, **filters)
+	return(records)
+
+
+# device, interfaces, templates and ips in one query. returns a dict of records, device None if it doesn't
+# exist. ip_addresses are the ones on the device's interfaces, or with addresses given, those looked up by
+# address anywhere in netbox
+def get_device(nb, device_id, addresses=None):
+	variables = {'device': str(device_id)}
+	declarations = ["$device: ID!"]
+	parts = [device_query]
+	if addresses is not None:
+		variables['addresses'] = list(addresses)
+		declarations.append("$addresses: [String!]")
+		parts.append(ip_query)
+
+	data = query(nb, "query (" + ", ".join(declarations) + ") {" + "".join(parts) + "}", variables)
+
+	bundle = dict(device=None, interfaces=[], templates=[], ip_addresses=[])
+	values = data.get('device')
+	if values is not None:
+		bundle['device'] = record(nb.dcim.devices, values)
+		device_nested = {'id': int(values['id']), 'name': values.get('name')}
+
+		for interface in values.get('interfaces') or []:
+			bundle['interfaces'].append(record(nb.dcim.interfaces, dict(interface, device=device_nested)))
+			for ip in interface.get('ip_addresses') or []:
+				assigned = {'__typename': 'InterfaceType', 'id': interface['id'], 'name': interface.get('name'), 'device': device_nested}
+				bundle['ip_addresses'].append(record(nb.ipam.ip_addresses, dict(ip, assigned_object=assigned)))
+
+		device_type = values.get('device_type') or {}
+		nested_type = {'id': int(device_type['id']), 'model': device_type.get('model')} if device_type.get('id') is not None else None
+		for template in device_type.get('interfacetemplates') or []:
+			bundle['templates'].append(record(nb.dcim.interface_templates, dict(template, device_type=nested_type)))
+
+	if addresses is not None:
+		bundle['ip_addresses'] = [record(nb.ipam.ip_addresses, ip) for ip in data.get('ip_address_list') or []]
+	return(bundle)
+
+
+# get_device, or None when graphql is off, netbox's version doesn't have the schema or the query fails, so
+# the caller can use REST instead
+def fetch_device(nb, device_id, addresses=None):
+	if not enabled(nb):
+		return(None)
+	try:
+		return(get_device(nb, device_id, addresses))
+	except (GraphQLError, KeyError, ValueError, requests.exceptions.RequestException) as e:
+		print(" (graphql failed, using REST: " + str(e) + ")", end='')
+	return(None)
@@ -0,0 +1,61 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	longest prefix match of addresses against a set of networks, ie netbox prefixes, to find the most
+#	specific prefix an IP is in. networks go in to a binary radix tree per address family once, then each
+#	lookup walks at most 32 (v4) or 128 (v6) bits instead of asking netbox ?contains= per address.
+#
+#	a node is [zero child, one child, value].
+
+from ipaddress import ip_address, ip_network
+
+max_bits = {4: 32, 6: 128}
+
+
+def new_tree():
+	return({4: [None, None, None], 6: [None, None, None]})
+
+
+# network is a string or an ip_network(). a network added twice keeps the last value
+def insert(tree, network, value):
+	if isinstance(network, str):
+		network = ip_network(network, strict=False)
+	bits = max_bits[network.version]
+	address = int(network.network_address)
+
+	node = tree[network.version]
+	for position in range(network.prefixlen):
+		bit = (address >> (bits - 1 - position)) & 1
+		if node[bit] is None:
+			node[bit] = [None, None, None]
+		node = node[bit]
+	node[2] = value
+	return(tree)
+
+
+# tree from (network, value) pairs
+def build_tree(items):
+	tree = new_tree()
+	for network, value in items:
+		insert(tree, network, value)
+	return(tree)
+
+
+# value of the most specific network the address is in, or None
+def longest_match(tree, address):
+	# takes a string or an ip_address()
+	if isinstance(address, str):
+		address = ip_address(address.split("/")[0])
+	bits = max_bits[address.version]
+	number = int(address)
+
+	node = tree[address.version]
+	found = node[2]
+	for position in range(bits):
+		node = node[(number >> (bits - 1 - position)) & 1]
+		if node is None:
+			break
+		if node[2] is not None:
+			found = node[2]
+	return(found)
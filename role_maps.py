@@ -0,0 +1,44 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	role maps (interface name -> role and type) for netbox-device-type-change.py, read from a device type's
+#	interface templates in netbox instead of config.types. netbox templates can't have tags or custom fields,
+#	so the role is a "role:wan1" word in the template field named by config.template_role_field.
+#
+#	the map is built from the templates the script already read through netbox_cache, so it's as fresh as they
+#	are (cache_ttl, --refresh-cache). a type with no roles on its templates uses config.types.
+
+import config as config
+
+## see config.py for config
+
+
+# "role:wan1" in the template's role field, or None
+def template_role(template):
+	value = dict(template).get(config.template_role_field) or ""
+	for word in str(value).split():
+		if word.lower().startswith(config.template_role_prefix):
+			return(word[len(config.template_role_prefix):] or None)
+	return(None)
+
+
+# same shape as config.types[type]['interfaces']
+def compile_map(templates):
+	interfaces = {}
+	for template in templates:
+		role = template_role(template)
+		if role is not None:
+			interfaces[str(template)] = {'role': role, 'type': template.type.value}
+	return(interfaces)
+
+
+# interface name -> {'role', 'type'} from the templates of a device type, or None if none of them have a role
+def role_map(templates):
+	if not config.template_roles:
+		return(None)
+
+	interfaces = compile_map(templates)
+	if not interfaces:
+		return(None)
+	return(interfaces)
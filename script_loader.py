@@ -0,0 +1,25 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	the scripts have dashes in their names so they can't be imported normally. this loads one as a module,
+#	ie load_script("device-to-netbox"), so its functions can be reused by the benchmarks and other tools.
+
+import importlib.util
+import os
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_script(name):
+	module_name = name.replace("-", "_")
+	if module_name in sys.modules:
+		return(sys.modules[module_name])
+
+	spec = importlib.util.spec_from_file_location(module_name, os.path.join(script_dir, name + ".py"))
+	module = importlib.util.module_from_spec(spec)
+	# registered before running so multiprocessing can find functions in it by name
+	sys.modules[module_name] = module
+	spec.loader.exec_module(module)
+	return(module)
@@ -0,0 +1,168 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	warm sessions shared by everything in a process. netbox() is one pynetbox api per netbox, so its http
+#	connection stays open between calls. acquire() / release() hand out napalm device sessions; normally
+#	release() just closes them, but with keep_devices on (netbox-daemon.py) they're kept open for
+#	config.session_idle_timeout seconds, so the next job against the same device skips logging in.
+#	a kept session is checked with is_alive() before it's handed out again.
+
+import hashlib
+import socket
+import threading
+import time
+import config as config
+import lazy_modules
+import metrics
+
+pynetbox =	lazy_modules.load("pynetbox")
+
+## see config.py for config
+
+keep_devices = False
+
+apis = {}
+idle = {}
+keys = {}
+versions = {}
+lock = threading.Lock()
+
+
+# the pynetbox api for config.netbox_url, created once and instrumented for metrics
+def netbox():
+	key = (config.netbox_url, config.netbox_api_token)
+	with lock:
+		if key not in apis:
+			nb = pynetbox.api(config.netbox_url, config.netbox_api_token)
+			# pynetbox reads the pages after the first at once, config.async_concurrency at a time
+			nb.threading = True
+			nb.max_workers = config.async_concurrency
+			apis[key] = metrics.instrument(nb)
+		return(apis[key])
+
+
+# netbox's (major, minor) version, None if it can't be read. it's a request of its own, so read once per netbox
+def netbox_version(nb):
+	if nb.base_url not in versions:
+		try:
+			versions[nb.base_url] = tuple(int(part) for part in str(nb.version).split(".")[:2])
+		except Exception:
+			versions[nb.base_url] = None
+	return(versions[nb.base_url])
+
+
+# napalm driver options per platform. every script opens devices with these, so their sessions are interchangeable
+optional_args = {
+	'ios':	{'global_delay_factor': 2},
+}
+
+
+def connect_args(platform):
+	return(dict(timeout=config.device_timeout, optional_args=dict(optional_args.get(str(platform).lower(), {}))))
+
+
+# the address a hostname resolves to, so an import by name and a push by primary IP find the same session
+def device_address(hostname):
+	hostname = str(hostname).lower()
+	try:
+		return(socket.getaddrinfo(hostname, None)[0][4][0])
+	except (OSError, UnicodeError, IndexError):
+		return(hostname)
+
+
+# a session is only reused for the same driver, device and login
+def session_key(driver, hostname, username, password):
+	secret = hashlib.sha256(str(password).encode()).hexdigest()
+	return((driver.__module__ + "." + driver.__name__, device_address(hostname), username, secret))
+
+
+def healthy(device):
+	try:
+		return(bool(device.is_alive().get('is_alive')))
+	except Exception:
+		return(False)
+
+
+def close(device):
+	try:
+		device.close()
+	except Exception:
+		pass
+	return()
+
+
+# an open napalm device, an idle one if we have it and it's still alive. driver is the napalm driver class
+# for platform (ios, junos..), hostname a name or address
+def acquire(driver, platform, hostname, username, password):
+	key = session_key(driver, hostname, username, password)
+	while True:
+		with lock:
+			entries = idle.get(key) or []
+			entry = entries.pop() if entries else None
+		if entry is None:
+			break
+		device, released = entry
+		if time.time() - released < config.session_idle_timeout and healthy(device):
+			with lock:
+				keys[id(device)] = key
+			return(device)
+		close(device)
+
+	device = driver(hostname, username, password, **connect_args(platform))
+	with metrics.getter("open"):
+		device.open()
+	with lock:
+		keys[id(device)] = key
+	return(device)
+
+
+# done with a device. kept for the next job if keep_devices is on and it's still usable, otherwise closed
+def release(device, reusable=True):
+	if device is None:
+		return()
+	with lock:
+		key = keys.pop(id(device), None)
+		if keep_devices and reusable and key is not None:
+			idle.setdefault(key, []).append((device, time.time()))
+			return()
+	close(device)
+	return()
+
+
+# close sessions idle for longer than config.session_idle_timeout (or all of them)
+def expire(everything=False):
+	now = time.time()
+	expired = []
+	with lock:
+		for key, entries in list(idle.items()):
+			keep = []
+			for device, released in entries:
+				if everything or now - released >= config.session_idle_timeout:
+					expired.append(device)
+				else:
+					keep.append((device, released))
+			if keep:
+				idle[key] = keep
+			else:
+				del idle[key]
+	for device in expired:
+		close(device)
+	return(len(expired))
+
+
+# in a forked child. the parent's sessions share its sockets, leave them alone and don't keep our own
+def forked():
+	global keep_devices, lock
+	keep_devices = False
+	# another thread may have held the lock when we forked
+	lock = threading.Lock()
+	apis.clear()
+	idle.clear()
+	keys.clear()
+	return()
+
+
+def idle_count():
+	with lock:
+		return(sum(len(entries) for entries in idle.values()))
@@ -0,0 +1,82 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	save what device-to-netbox.py collected from a device (device_dict) to a gzipped json file, and load it
+#	back so the netbox part of an import can be re-run without logging in to the device again.
+#	the snapshot also keeps the arguments it was collected with (minus the password) so it can be
+#	replayed on its own.
+
+import datetime
+import glob
+import gzip
+import json
+import os
+import tempfile
+
+# bump when the layout of the file changes. older versions are still read, newer ones are refused
+snapshot_version = 1
+
+snapshot_extension = ".json.gz"
+
+# arguments saved along with device_dict
+snapshot_args = ['device', 'model', 'site', 'tenant', 'os', 'role']
+
+
+# a directory (or something ending in /) gets one file per device in it, otherwise it is the file name.
+# with directory set (many devices) it's always a directory
+def snapshot_path(path, device, directory=False):
+	if directory or os.path.isdir(path) or path.endswith(os.sep):
+		return(os.path.join(path, device.lower() + snapshot_extension))
+	return(path)
+
+
+# device name from a snapshot file name made by snapshot_path(), for output before the snapshot is read
+def snapshot_device(path):
+	name = os.path.basename(path)
+	if name.endswith(snapshot_extension):
+		name = name[:-len(snapshot_extension)]
+	return(name)
+
+
+def is_snapshot_dir(path):
+	return(os.path.isdir(path))
+
+
+def save_snapshot(path, args, device_dict):
+	directory = os.path.dirname(path) or "."
+	os.makedirs(directory, exist_ok=True)
+
+	snapshot = dict(
+		version =	snapshot_version,
+		created =	datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+		args =		{key: args.get(key) for key in snapshot_args},
+		device_dict =	device_dict,
+	)
+
+	# write to a temp file of our own first so a half written snapshot never replaces a good one, and two
+	# writers never share one
+	fd, temp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+	try:
+		with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+			json.dump(snapshot, f)
+		os.replace(temp_path, path)
+	except BaseException:
+		os.remove(temp_path)
+		raise
+	return(path)
+
+
+# returns (args, device_dict)
+def load_snapshot(path):
+	with gzip.open(path, 'rt', encoding='utf-8') as f:
+		snapshot = json.load(f)
+
+	if snapshot.get('version', 0) > snapshot_version:
+		raise ValueError(path + " is snapshot version " + str(snapshot.get('version')) + ", this script only knows up to " + str(snapshot_version))
+
+	return(snapshot['args'], snapshot['device_dict'])
+
+
+def snapshot_files(directory):
+	return(sorted(glob.glob(os.path.join(directory, "*" + snapshot_extension))))
@@ -0,0 +1,101 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	config_sections: splitting configs in to sections and finding the ones that changed
+
+import unittest
+import config_sections
+
+
+ios_config = """!
+hostname r1
+!
+interface GigabitEthernet1
+ description uplink
+ ip address 192.0.2.1 255.255.255.0
+!
+interface GigabitEthernet2
+ shutdown
+!
+banner motd ^C
+line one
+line two
+^C
+ip route 0.0.0.0 0.0.0.0 192.0.2.254
+ip route 10.0.0.0 255.0.0.0 192.0.2.253
+end
+"""
+
+junos_config = """system {
+    host-name r1;
+}
+interfaces {
+    ge-0/0/0 {
+        description uplink;
+    }
+}
+"""
+
+set_config = """set system host-name r1
+set interfaces ge-0/0/0 description uplink
+set interfaces ge-0/0/0 unit 0 family inet address 192.0.2.1/24
+set interfaces ge-0/0/1 disable
+delete protocols lldp
+"""
+
+
+class ReadSectionsTest(unittest.TestCase):
+	def test_ios(self):
+		sections = config_sections.read_sections(ios_config.splitlines(True))
+		self.assertEqual([key for key, text in sections], [
+			"hostname r1",
+			"interface GigabitEthernet1",
+			"interface GigabitEthernet2",
+			"banner motd ^C",
+			"ip route 0.0.0.0 0.0.0.0 192.0.2.254",
+			"ip route 10.0.0.0 255.0.0.0 192.0.2.253",
+		])
+		self.assertEqual(sections[1][1], "interface GigabitEthernet1\n description uplink\n ip address 192.0.2.1 255.255.255.0\n")
+		self.assertEqual(sections[3][1], "banner motd ^C\nline one\nline two\n^C\n")
+
+	def test_braces(self):
+		sections = config_sections.read_sections(junos_config.splitlines(True))
+		self.assertEqual([key for key, text in sections], ["system", "interfaces"])
+		self.assertEqual(sections[1][1], "interfaces {\n    ge-0/0/0 {\n        description uplink;\n    }\n}\n")
+
+	def test_set_lines_group_by_two_words(self):
+		sections = config_sections.read_sections(set_config.splitlines(True))
+		self.assertEqual([key for key, text in sections], ["system host-name", "interfaces ge-0/0/0", "interfaces ge-0/0/1", "protocols lldp"])
+		self.assertEqual(sections[1][1].count("\n"), 2)
+
+	def test_one_line_banner(self):
+		sections = config_sections.read_sections(["banner login #hello#\n", "hostname r1\n"])
+		self.assertEqual([key for key, text in sections], ["banner login #hello#", "hostname r1"])
+
+
+class ChangedSectionsTest(unittest.TestCase):
+	def test_repeated_keys_are_numbered(self):
+		sections = [("ip route", "a\n"), ("ip route", "b\n")]
+		self.assertEqual(list(config_sections.section_hashes(sections)), ["ip route", "ip route #2"])
+
+	def test_nothing_changed(self):
+		sections = config_sections.read_sections(ios_config.splitlines(True))
+		hashes = config_sections.section_hashes(sections)
+		self.assertEqual(config_sections.changed_sections(sections, hashes), [])
+
+	def test_changed_and_new_sections_in_config_order(self):
+		before = config_sections.read_sections(ios_config.splitlines(True))
+		hashes = config_sections.section_hashes(before)
+		text = ios_config.replace(" shutdown", " no shutdown").replace("hostname r1", "hostname r1\n!\nntp server 192.0.2.123")
+		after = config_sections.read_sections(text.splitlines(True))
+		self.assertEqual([key for key, text in config_sections.changed_sections(after, hashes)], ["ntp server 192.0.2.123", "interface GigabitEthernet2"])
+
+	def test_second_of_a_repeated_key(self):
+		before = [("ip route", "a\n"), ("ip route", "b\n")]
+		after = [("ip route", "a\n"), ("ip route", "c\n")]
+		self.assertEqual(config_sections.changed_sections(after, config_sections.section_hashes(before)), [("ip route", "c\n")])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,104 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	interface_classifier: skip / type / role per interface name, on a fixed config rather than config.py
+
+import types
+import unittest
+import interface_classifier
+
+
+def make_config(interface_map):
+	return(types.SimpleNamespace(
+		bad_if_regex =		['^vlan1$', '^bme.*', 'em\\d\\.*', '^pim.*'],
+		interface_map =		interface_map,
+		interface_roles =	{'loopback': "^(lo0.0|loopback0)$"},
+	))
+
+
+class JunosTest(unittest.TestCase):
+	def setUp(self):
+		config = make_config({'junos': {'ge-': '1000base-x-sfp', 'xe-': '10gbase-x-sfpp', 'et-': '100gbase-x-qsfp28', 'ae': 'lag'}})
+		self.classifier = interface_classifier.compile_classifier(config, 'junos')
+
+	def test_types(self):
+		self.assertEqual(interface_classifier.interface_type(self.classifier, "ge-0/0/0"), '1000base-x-sfp')
+		self.assertEqual(interface_classifier.interface_type(self.classifier, "xe-1/2/3.100"), '10gbase-x-sfpp')
+		self.assertEqual(interface_classifier.interface_type(self.classifier, "ae12"), 'lag')
+		self.assertEqual(interface_classifier.interface_type(self.classifier, "irb.10"), 'other')
+
+	def test_type_is_case_insensitive(self):
+		self.assertEqual(interface_classifier.interface_type(self.classifier, "ET-0/0/1"), '100gbase-x-qsfp28')
+
+	def test_prefix_cache_gives_the_same_answers(self):
+		self.assertIsNotNone(self.classifier['prefix_cache'])
+		first = [interface_classifier.interface_type(self.classifier, name) for name in ["ge-0/0/0", "ge-0/0/1", "lo0.0", "lo0.1"]]
+		again = [interface_classifier.interface_type(self.classifier, name) for name in ["ge-0/0/0", "ge-0/0/1", "lo0.0", "lo0.1"]]
+		self.assertEqual(first, again)
+		self.assertEqual(first, ['1000base-x-sfp', '1000base-x-sfp', 'other', 'other'])
+
+	def test_skipped_interfaces(self):
+		self.assertFalse(interface_classifier.classify_interface(self.classifier, "bme0")['include'])
+		self.assertFalse(interface_classifier.classify_interface(self.classifier, "pimd")['include'])
+		self.assertFalse(interface_classifier.classify_interface(self.classifier, "em0.0")['include'])
+		self.assertFalse(interface_classifier.classify_interface(self.classifier, "vlan1")['include'])
+		self.assertTrue(interface_classifier.classify_interface(self.classifier, "vlan10")['include'])
+		self.assertTrue(interface_classifier.classify_interface(self.classifier, "ge-0/0/0")['include'])
+
+	def test_roles(self):
+		self.assertEqual(interface_classifier.interface_role(self.classifier, "lo0.0"), 'loopback')
+		self.assertEqual(interface_classifier.interface_role(self.classifier, "Loopback0"), 'loopback')
+		self.assertIsNone(interface_classifier.interface_role(self.classifier, "lo0.1"))
+
+	def test_classify_interfaces(self):
+		interfaces = {"ge-0/0/0": {}, "bme0": {}, "lo0.0": {}}
+		result = interface_classifier.classify_interfaces(self.classifier, interfaces)
+		self.assertEqual(result, {
+			"ge-0/0/0":	dict(include=True, type='1000base-x-sfp', role=None),
+			"bme0":		dict(include=False, type='other', role=None),
+			"lo0.0":	dict(include=True, type='other', role='loopback'),
+		})
+
+
+# a big junos box: units on ge / xe / et physicals plus the internal interfaces bad_if_regex skips
+class SyntheticListingTest(unittest.TestCase):
+	def test_20k_interfaces(self):
+		config = make_config({'junos': {'ge-': '1000base-x-sfp', 'xe-': '10gbase-x-sfpp', 'et-': '100gbase-x-qsfp28', 'ae': 'lag'}})
+		classifier = interface_classifier.compile_classifier(config, 'junos')
+
+		families = {'ge-': '1000base-x-sfp', 'xe-': '10gbase-x-sfpp', 'et-': '100gbase-x-qsfp28'}
+		expected = {'bme0': dict(include=False, type='other', role=None), 'em1.0': dict(include=False, type='other', role=None),
+			'pimd': dict(include=False, type='other', role=None), 'lo0.0': dict(include=True, type='other', role='loopback'),
+			'ae0': dict(include=True, type='lag', role=None)}
+		index = 0
+		while len(expected) < 20000:
+			family = list(families)[index % 3]
+			name = family + str(index // 400) + "/" + str((index // 40) % 10) + "/" + str(index % 40) + "." + str(index % 4000)
+			expected[name] = dict(include=True, type=families[family], role=None)
+			index += 1
+
+		self.assertEqual(interface_classifier.classify_interfaces(classifier, expected), expected)
+
+
+class MapOrderTest(unittest.TestCase):
+	def test_first_matching_entry_wins(self):
+		config = make_config({'ios': {'port-channel': 'lag', 'port': 'virtual'}})
+		classifier = interface_classifier.compile_classifier(config, 'ios')
+		self.assertEqual(interface_classifier.interface_type(classifier, "Port-channel1"), 'lag')
+		self.assertEqual(interface_classifier.interface_type(classifier, "Port1"), 'virtual')
+
+	def test_regex_entries_turn_off_the_prefix_cache(self):
+		config = make_config({'ios': {'gi\\d/0': 'virtual'}})
+		classifier = interface_classifier.compile_classifier(config, 'ios')
+		self.assertIsNone(classifier['prefix_cache'])
+		self.assertEqual(interface_classifier.interface_type(classifier, "Gi1/0"), 'virtual')
+		self.assertEqual(interface_classifier.interface_type(classifier, "Gi1/1"), 'other')
+
+	def test_os_without_a_map(self):
+		classifier = interface_classifier.compile_classifier(make_config({}), 'eos')
+		self.assertEqual(interface_classifier.interface_type(classifier, "Ethernet1"), 'other')
+
+
+if __name__ == "__main__":
+	unittest.main()
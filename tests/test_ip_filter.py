@@ -0,0 +1,87 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	ip_filter: merging networks in to ranges and looking addresses up in them
+
+from ipaddress import ip_address, ip_network
+import random
+import unittest
+import ip_filter
+
+
+class CompileIpRangesTest(unittest.TestCase):
+	def test_overlapping_and_adjacent_networks_merge(self):
+		compiled = ip_filter.compile_ip_ranges(["10.0.0.0/24", "10.0.1.0/24", "10.0.0.128/25", "192.168.0.0/16"])
+		starts, ends = compiled[4]
+		self.assertEqual(len(starts), 2)
+		self.assertEqual(ends[0], int(ip_address("10.0.1.255")))
+
+	def test_families_are_kept_apart(self):
+		compiled = ip_filter.compile_ip_ranges(["10.0.0.0/8", "2001:db8::/32"])
+		self.assertEqual(len(compiled[4][0]), 1)
+		self.assertEqual(len(compiled[6][0]), 1)
+
+	def test_host_bits_are_ignored(self):
+		compiled = ip_filter.compile_ip_ranges(["10.0.0.5/24"])
+		self.assertTrue(ip_filter.ip_in_ranges(compiled, "10.0.0.1"))
+
+
+class IpInRangesTest(unittest.TestCase):
+	def setUp(self):
+		self.compiled = ip_filter.compile_ip_ranges(["10.0.0.0/8", "172.16.0.0/12", "fe80::/10"])
+
+	def test_inside_and_outside(self):
+		self.assertTrue(ip_filter.ip_in_ranges(self.compiled, "10.255.255.255"))
+		self.assertTrue(ip_filter.ip_in_ranges(self.compiled, "172.31.0.1"))
+		self.assertFalse(ip_filter.ip_in_ranges(self.compiled, "172.32.0.1"))
+		self.assertFalse(ip_filter.ip_in_ranges(self.compiled, "9.255.255.255"))
+		self.assertFalse(ip_filter.ip_in_ranges(self.compiled, "192.0.2.1"))
+
+	def test_ipv6(self):
+		self.assertTrue(ip_filter.ip_in_ranges(self.compiled, "fe80::1"))
+		self.assertFalse(ip_filter.ip_in_ranges(self.compiled, "2001:db8::1"))
+
+	def test_takes_ip_address(self):
+		self.assertTrue(ip_filter.ip_in_ranges(self.compiled, ip_address("10.1.2.3")))
+
+	def test_empty_list(self):
+		compiled = ip_filter.compile_ip_ranges([])
+		self.assertFalse(ip_filter.ip_in_ranges(compiled, "10.0.0.1"))
+		self.assertFalse(ip_filter.ip_in_ranges(compiled, "::1"))
+
+
+# the same answers as checking every network in turn, on random (seeded) networks and addresses
+class AgainstScanTest(unittest.TestCase):
+	def test_random_networks(self):
+		rng = random.Random(1)
+		networks = [ip_network((rng.getrandbits(32), rng.randint(8, 30)), strict=False) for count in range(500)]
+		addresses = [ip_address(rng.getrandbits(32)) for count in range(2000)]
+		addresses += [network.network_address for network in networks[:100]] + [network.broadcast_address for network in networks[:100]]
+
+		compiled = ip_filter.compile_ip_ranges(networks)
+		for address in addresses:
+			self.assertEqual(ip_filter.ip_in_ranges(compiled, address), any(address in network for network in networks), str(address))
+
+
+class FilterInterfacesIpTest(unittest.TestCase):
+	def test_splits_in_the_same_shape(self):
+		compiled = ip_filter.compile_ip_ranges(["10.0.0.0/8"])
+		interfaces_ip = {
+			'Vlan1':	{'ipv4': {'10.0.0.1': {'prefix_length': 24}, '192.0.2.1': {'prefix_length': 24}}},
+			'Vlan2':	{'ipv4': {'10.0.1.1': {'prefix_length': 24}}},
+			'Loopback0':	{'ipv6': {'2001:db8::1': {'prefix_length': 128}}},
+		}
+		good, bad = ip_filter.filter_interfaces_ip(compiled, interfaces_ip)
+		self.assertEqual(good, {
+			'Vlan1':	{'ipv4': {'192.0.2.1': {'prefix_length': 24}}},
+			'Loopback0':	{'ipv6': {'2001:db8::1': {'prefix_length': 128}}},
+		})
+		self.assertEqual(bad, {
+			'Vlan1':	{'ipv4': {'10.0.0.1': {'prefix_length': 24}}},
+			'Vlan2':	{'ipv4': {'10.0.1.1': {'prefix_length': 24}}},
+		})
+
+
+if __name__ == "__main__":
+	unittest.main()
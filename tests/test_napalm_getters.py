@@ -0,0 +1,51 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	napalm_getters: which getters run for a device, and giving up on a stuck one
+
+import threading
+import types
+import unittest
+import napalm_getters
+
+
+class GettersTest(unittest.TestCase):
+	def setUp(self):
+		self.config = types.SimpleNamespace(
+			import_getters =		['interfaces', 'ips'],
+			import_getters_by_os =		{'junos': ['interfaces', 'ips', 'bgp']},
+			import_getters_by_role =	{'pe': ['interfaces']},
+		)
+
+	def test_parse_getters(self):
+		self.assertEqual(napalm_getters.parse_getters(" Facts, bgp ,"), ['facts', 'bgp'])
+		with self.assertRaises(ValueError):
+			napalm_getters.parse_getters("facts,routes")
+
+	def test_plan_is_in_run_order_and_always_has_facts(self):
+		self.assertEqual(napalm_getters.plan(self.config, 'ios', 'cpe'), ['facts', 'interfaces', 'ips'])
+		self.assertEqual(napalm_getters.plan(self.config, 'ios', 'cpe', ['ips', 'interfaces']), ['facts', 'interfaces', 'ips'])
+
+	def test_most_specific_plan_wins(self):
+		self.assertEqual(napalm_getters.plan(self.config, 'junos', 'cpe'), ['facts', 'interfaces', 'ips', 'bgp'])
+		self.assertEqual(napalm_getters.plan(self.config, 'junos', 'pe'), ['facts', 'interfaces'])
+		self.assertEqual(napalm_getters.plan(self.config, 'junos', 'pe', ['bgp']), ['facts', 'bgp'])
+
+	def test_run_getter(self):
+		device = types.SimpleNamespace(get_facts=lambda: {'hostname': "r1"})
+		self.assertEqual(napalm_getters.run_getter(device, 'facts', 5), {'hostname': "r1"})
+
+	# a stuck getter is given up on and the device closed under it
+	def test_run_getter_timeout(self):
+		stuck = threading.Event()
+		closed = threading.Event()
+		device = types.SimpleNamespace(get_facts=lambda: stuck.wait(5), close=closed.set)
+		with self.assertRaises(napalm_getters.GetterTimeout):
+			napalm_getters.run_getter(device, 'facts', 0.05)
+		stuck.set()
+		self.assertTrue(closed.is_set())
+
+
+if __name__ == "__main__":
+	unittest.main()
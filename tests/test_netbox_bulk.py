@@ -0,0 +1,23 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	netbox_bulk / netbox_async: chunking and de-duplicating netbox pages
+
+import unittest
+import netbox_async
+import netbox_bulk
+
+
+class PagesTest(unittest.TestCase):
+	def test_chunked(self):
+		self.assertEqual(list(netbox_bulk.chunked([1, 2, 3, 4, 5], 2)), [[1, 2], [3, 4], [5]])
+		self.assertEqual(list(netbox_bulk.chunked([], 2)), [])
+
+	def test_unique_results(self):
+		results = [{'id': 1, 'name': "a"}, {'id': 2, 'name': "b"}, {'id': 1, 'name': "a again"}]
+		self.assertEqual(netbox_async.unique_results(results), [{'id': 1, 'name': "a"}, {'id': 2, 'name': "b"}])
+
+
+if __name__ == "__main__":
+	unittest.main()
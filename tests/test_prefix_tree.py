@@ -0,0 +1,64 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	prefix_tree: longest prefix match
+
+from ipaddress import ip_address, ip_network
+import unittest
+import prefix_tree
+
+
+class LongestMatchTest(unittest.TestCase):
+	def setUp(self):
+		self.tree = prefix_tree.build_tree([
+			("10.0.0.0/8",		"ten"),
+			("10.1.0.0/16",		"ten-one"),
+			("10.1.2.0/24",		"ten-one-two"),
+			("2001:db8::/32",	"doc"),
+			("2001:db8:1::/48",	"doc-one"),
+		])
+
+	def test_most_specific_wins(self):
+		self.assertEqual(prefix_tree.longest_match(self.tree, "10.1.2.3"), "ten-one-two")
+		self.assertEqual(prefix_tree.longest_match(self.tree, "10.1.3.1"), "ten-one")
+		self.assertEqual(prefix_tree.longest_match(self.tree, "10.2.0.1"), "ten")
+
+	def test_no_match(self):
+		self.assertIsNone(prefix_tree.longest_match(self.tree, "192.0.2.1"))
+		self.assertIsNone(prefix_tree.longest_match(self.tree, "2001:db9::1"))
+
+	def test_ipv6(self):
+		self.assertEqual(prefix_tree.longest_match(self.tree, "2001:db8:1::1"), "doc-one")
+		self.assertEqual(prefix_tree.longest_match(self.tree, "2001:db8:2::1"), "doc")
+
+	def test_address_with_mask_and_ip_address(self):
+		self.assertEqual(prefix_tree.longest_match(self.tree, "10.1.2.3/32"), "ten-one-two")
+		self.assertEqual(prefix_tree.longest_match(self.tree, ip_address("10.1.2.3")), "ten-one-two")
+
+	def test_network_and_broadcast_addresses(self):
+		self.assertEqual(prefix_tree.longest_match(self.tree, "10.1.2.0"), "ten-one-two")
+		self.assertEqual(prefix_tree.longest_match(self.tree, "10.1.2.255"), "ten-one-two")
+		self.assertEqual(prefix_tree.longest_match(self.tree, "10.1.3.0"), "ten-one")
+
+
+class InsertTest(unittest.TestCase):
+	def test_default_route_matches_everything(self):
+		tree = prefix_tree.build_tree([("0.0.0.0/0", "default"), ("192.0.2.0/24", "doc")])
+		self.assertEqual(prefix_tree.longest_match(tree, "198.51.100.1"), "default")
+		self.assertEqual(prefix_tree.longest_match(tree, "192.0.2.1"), "doc")
+
+	def test_same_network_twice_keeps_the_last(self):
+		tree = prefix_tree.new_tree()
+		prefix_tree.insert(tree, "10.0.0.0/8", "first")
+		prefix_tree.insert(tree, ip_network("10.0.0.0/8"), "second")
+		self.assertEqual(prefix_tree.longest_match(tree, "10.0.0.1"), "second")
+
+	def test_host_route(self):
+		tree = prefix_tree.build_tree([("10.0.0.0/8", "ten"), ("10.0.0.1/32", "host")])
+		self.assertEqual(prefix_tree.longest_match(tree, "10.0.0.1"), "host")
+		self.assertEqual(prefix_tree.longest_match(tree, "10.0.0.2"), "ten")
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,46 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	role_maps: interface roles from the type's interface templates
+
+import types
+import unittest
+import role_maps
+import config as config
+
+
+class Template():
+	def __init__(self, name, type, description):
+		self.name = name
+		self.type = types.SimpleNamespace(value=type)
+		self.description = description
+
+	def __str__(self):
+		return(self.name)
+
+	def __iter__(self):
+		return(iter([('name', self.name), ('description', self.description)]))
+
+
+class RoleMapsTest(unittest.TestCase):
+	def test_template_role(self):
+		self.assertEqual(role_maps.template_role(Template("Gi0/0", "1000base-t", "uplink role:wan1")), "wan1")
+		self.assertIsNone(role_maps.template_role(Template("Gi0/1", "1000base-t", "uplink")))
+		self.assertIsNone(role_maps.template_role(Template("Gi0/2", "1000base-t", None)))
+
+	def test_compile_map(self):
+		templates = [Template("Gi0/0", "1000base-t", "role:wan1"), Template("Gi0/1", "1000base-t", ""), Template("Te0/0", "10gbase-x-sfpp", "role:lan1")]
+		self.assertEqual(role_maps.compile_map(templates), {
+			"Gi0/0":	{'role': "wan1", 'type': "1000base-t"},
+			"Te0/0":	{'role': "lan1", 'type': "10gbase-x-sfpp"},
+		})
+
+	def test_no_roles_is_none(self):
+		if not config.template_roles:
+			self.skipTest("template_roles is off in config.py")
+		self.assertIsNone(role_maps.role_map([Template("Gi0/0", "1000base-t", "")]))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,35 @@
+#! /usr/bin/env python3
+#
+#	https://github.com/falz/netbox-device-scripts
+#
+#	snapshot: where snapshot files go, and saving and loading them
+
+import os
+import tempfile
+import unittest
+import snapshot
+
+
+class SnapshotTest(unittest.TestCase):
+	def test_paths(self):
+		with tempfile.TemporaryDirectory() as directory:
+			self.assertEqual(snapshot.snapshot_path(directory, "R1"), os.path.join(directory, "r1.json.gz"))
+			self.assertEqual(snapshot.snapshot_path("snaps/", "R1"), os.path.join("snaps", "r1.json.gz"))
+			self.assertEqual(snapshot.snapshot_path("r1.gz", "R1"), "r1.gz")
+			self.assertEqual(snapshot.snapshot_path("missing", "R1", directory=True), os.path.join("missing", "r1.json.gz"))
+		self.assertEqual(snapshot.snapshot_device("snaps/r1.json.gz"), "r1")
+
+	def test_save_and_load(self):
+		args = dict(device="r1", model="M", site="S", tenant="T", os="ios", role="cpe", password="secret")
+		device_dict = {'facts': {'hostname': "r1"}, 'good_interfaces': {'Gi1': {'is_enabled': True}}}
+		with tempfile.TemporaryDirectory() as directory:
+			path = snapshot.save_snapshot(snapshot.snapshot_path(directory, "r1"), args, device_dict)
+			self.assertEqual(snapshot.snapshot_files(directory), [path])
+			loaded_args, loaded_dict = snapshot.load_snapshot(path)
+		self.assertEqual(loaded_dict, device_dict)
+		self.assertNotIn('password', loaded_args)
+		self.assertEqual(loaded_args['device'], "r1")
+
+
+if __name__ == "__main__":
+	unittest.main()